@@ -0,0 +1,121 @@
+"""
+Bookkeeping overhead of the single-mode evaluation loop, with model, judge and
+criteria calls replaced by instant stubs so only the orchestration is timed.
+
+    python benchmarks/bench_bookkeeping.py --rows 100000 --models 20
+
+"before" is the old loop (iterrows, per-row `tasks.loc[idx] = row`, scoring by
+summing grade columns); "after" is the current ResultBuffer path plus
+RunningScores. The old loop is timed on `--legacy-rows` rows and extrapolated
+linearly, since running it on 100k rows takes a very long time.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+from tqdm import tqdm
+
+from reval.reval import _evaluate_tasks, _load_tasks
+from reval.scoring import RunningScores
+
+
+class StubModel:
+    def __init__(self, name):
+        self.name = name
+        self.model_provider = "stub"
+
+    def get_generation(self, prompt):
+        return "output"
+
+
+def stub_judge(task, success_criteria, failure_criteria, model_output):
+    return 1
+
+
+def stub_criteria(task, success_criteria, failure_criteria, good_output, bad_output):
+    return "success", "failure"
+
+
+def make_tasks(rows, models):
+    return _load_tasks(
+        pd.DataFrame({"tasks": [f"task {i}" for i in range(rows)]}), models
+    )
+
+
+def legacy(tasks, models):
+    for idx, row in tasks.iterrows():
+        task = row.get("tasks")
+        success_criteria, failure_criteria = stub_criteria(
+            task,
+            row.get("success_criteria"),
+            row.get("failure_criteria"),
+            row.get("good_output"),
+            row.get("bad_output"),
+        )
+        row["success_criteria"] = success_criteria
+        row["failure_criteria"] = failure_criteria
+        for model in models:
+            model_output = model.get_generation(task)
+            row[f"{model.name}.output"] = model_output
+            row[f"{model.name}.grade"] = stub_judge(
+                task, success_criteria, failure_criteria, model_output
+            )
+        tasks.loc[idx] = row
+    return [tasks[f"{model.name}.grade"].sum() for model in models]
+
+
+def current(tasks, models):
+    _evaluate_tasks(
+        tasks,
+        models,
+        stub_judge,
+        stub_criteria,
+        "single",
+        None,
+        tqdm(disable=True),
+    )
+    scores = RunningScores(models, "single")
+    scores.update(tasks)
+    return scores.results()
+
+
+def timed(fn, tasks, models):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        fn(tasks, models)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--models", type=int, default=20)
+    parser.add_argument("--legacy-rows", type=int, default=2_000)
+    args = parser.parse_args()
+
+    models = [StubModel(f"model-{i}") for i in range(args.models)]
+
+    legacy_rows = min(args.legacy_rows, args.rows)
+    before = timed(legacy, make_tasks(legacy_rows, models), models)
+    before *= args.rows / legacy_rows
+    after = timed(current, make_tasks(args.rows, models), models)
+
+    cells = args.rows * args.models
+    print(f"{args.rows} rows x {args.models} models ({cells} cells)")
+    print(
+        f"before  {before:9.2f} s  ({before / cells * 1e6:7.2f} us/cell)"
+        f"{'  extrapolated from %d rows' % legacy_rows if legacy_rows < args.rows else ''}"
+    )
+    print(f"after   {after:9.2f} s  ({after / cells * 1e6:7.2f} us/cell)")
+    print(f"speedup {before / after:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
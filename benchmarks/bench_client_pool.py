@@ -0,0 +1,80 @@
+"""
+Per-call latency of a short judge-sized prompt with a fresh client per call (the
+old behaviour) versus the shared client from the pool.
+
+    python benchmarks/bench_client_pool.py --calls 500
+
+Runs against a local fake endpoint, so it measures client construction and
+connection setup only; against the real API each fresh client also pays a TLS
+handshake, which makes the gap larger.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openai import OpenAI
+
+from fake_openai_server import FakeOpenAIServer
+from reval.language_models import LanguageModel
+
+PROMPT = "Grade this output. " * 40
+
+
+def time_calls(call, calls):
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    print(
+        f"{label:<22} mean {statistics.mean(latencies):7.3f} ms   "
+        f"p50 {latencies[len(latencies) // 2]:7.3f} ms   "
+        f"p95 {latencies[int(len(latencies) * 0.95)]:7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    with FakeOpenAIServer() as server:
+
+        def fresh_client():
+            client = OpenAI(api_key="bench", base_url=server.base_url)
+            client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": PROMPT}],
+                max_tokens=4096,
+                temperature=1,
+            )
+            client.close()
+
+        model = LanguageModel("gpt-4o-mini", api_key="bench", base_url=server.base_url)
+
+        # warm up both paths once
+        fresh_client()
+        model.get_generation(PROMPT)
+
+        fresh = time_calls(fresh_client, args.calls)
+        pooled = time_calls(lambda: model.get_generation(PROMPT), args.calls)
+
+    report("client per call", fresh)
+    report("pooled client", pooled)
+    print(
+        f"speedup (mean)         {statistics.mean(fresh) / statistics.mean(pooled):.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold-start cost of importing reval, from `python -X importtime` in fresh
+interpreters.
+
+    python benchmarks/bench_import_time.py --runs 5
+
+Compares `import reval` and `import reval.reval` (what a Reval job imports) with
+the same imports plus all three provider SDKs, which is what they cost when the
+SDKs were imported at module load, and shows the slowest modules behind
+`import reval.reval` today. The SDKs are now imported the first time a
+LanguageModel for their provider is built.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+SDKS = "import openai, anthropic, together"
+
+
+def import_times(statement):
+    """(depth, module, cumulative microseconds) for every import of one fresh run."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        # nested imports are indented by two spaces per level
+        depth = (len(module) - len(module.lstrip())) // 2
+        imports.append((depth, module.strip(), int(cumulative)))
+    return imports
+
+
+def total_ms(statement, runs):
+    # the outermost imports add up to everything the statement imported
+    totals = [
+        sum(us for depth, _, us in import_times(statement) if depth == 0)
+        for _ in range(runs)
+    ]
+    return statistics.median(totals) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    # the interpreter's own startup imports, which every row pays
+    baseline = total_ms("pass", args.runs)
+    print(f"median of {args.runs} fresh interpreters, minus startup imports")
+    print(f"{'':<22}{'lazy SDKs':>12}{'eager SDKs':>12}")
+    for statement in ("import reval", "import reval.reval"):
+        lazy = total_ms(statement, args.runs) - baseline
+        eager = total_ms(f"{statement}; {SDKS}", args.runs) - baseline
+        print(f"{statement:<22}{lazy:>10.0f}ms{eager:>10.0f}ms")
+
+    packages = {}
+    for _, module, us in import_times("import reval.reval"):
+        if "." not in module:
+            packages[module] = max(packages.get(module, 0), us)
+    print("\nslowest packages behind import reval.reval:")
+    for module, us in sorted(packages.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {module:<20}{us / 1000:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Judge calls and prompt tokens per task with one binary_judge call per model
+output versus one binary_judge_many call per task.
+
+    python benchmarks/bench_judge_batching.py --tasks 200 --models 8
+
+Runs against a local fake endpoint. `--malformed` is the fraction of multi-output
+responses that come back without a grade for every output, to show the cost of
+the per-output fallback.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fake_openai_server import FakeOpenAIServer
+
+TASK = "Write a short poem about the sea. " * 4
+CRITERIA = "1. The poem mentions the sea.\n2. The poem is short.\n" * 4
+OUTPUT = "The sea is wide, the sea is deep, the sea sings me to sleep. " * 6
+
+
+def respond(malformed):
+    def respond(prompt):
+        ids = re.findall(r'<model_output id="(\d+)">', prompt)
+        if not ids:
+            return "<evaluation><reasoning>ok</reasoning><grade>1</grade></evaluation>"
+        if random.random() < malformed:
+            ids = ids[:-1]
+        evaluations = "".join(
+            f'<evaluation id="{i}"><reasoning>ok</reasoning><grade>1</grade>'
+            "</evaluation>"
+            for i in ids
+        )
+        return f"<evaluations>{evaluations}</evaluations>"
+
+    return respond
+
+
+def measure(server, judge, tasks):
+    requests, tokens = server.requests, server.prompt_tokens
+    for _ in range(tasks):
+        judge()
+    return (server.requests - requests) / tasks, (server.prompt_tokens - tokens) / tasks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--models", type=int, default=8)
+    parser.add_argument("--malformed", type=float, default=0.02)
+    args = parser.parse_args()
+    random.seed(0)
+
+    with FakeOpenAIServer(respond=respond(args.malformed)) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        from reval.functions import binary_judge, binary_judge_many
+
+        outputs = [f"{OUTPUT} ({i})" for i in range(args.models)]
+        per_output = measure(
+            server,
+            lambda: [binary_judge(TASK, CRITERIA, CRITERIA, o) for o in outputs],
+            args.tasks,
+        )
+        batched = measure(
+            server,
+            lambda: binary_judge_many(TASK, CRITERIA, CRITERIA, outputs),
+            args.tasks,
+        )
+
+    print(f"{args.tasks} tasks x {args.models} models")
+    print(f"{'':<16}{'calls/task':>12}{'prompt tokens/task':>22}")
+    for label, (calls, tokens) in (
+        ("per output", per_output),
+        ("one per task", batched),
+    ):
+        print(f"{label:<16}{calls:>12.2f}{tokens:>22.0f}")
+    print(f"token reduction {per_output[1] / batched[1]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
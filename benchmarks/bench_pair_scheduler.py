@@ -0,0 +1,85 @@
+"""
+Simulated arena: matches needed until the ranking is stable, and how often that
+ranking is the true one, with uniformly random pairs (the old behaviour) versus
+PairScheduler's adaptive pairs.
+
+    python benchmarks/bench_pair_scheduler.py --models 8 --runs 20
+
+Model strengths are synthetic Elo-scale ratings spaced `--spacing` points apart,
+and each match is won with the Bradley–Terry probability. Both strategies use
+the same stopping rule (PairScheduler.stable) so the match counts compare
+directly; every match is one generation pair plus one judge call in Reval.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from reval.scheduler import PairScheduler
+
+
+class SyntheticModel:
+    def __init__(self, name, rating):
+        self.name = name
+        self.rating = rating
+
+
+def simulate(models, adaptive, confidence, max_matches, seed):
+    rng = np.random.default_rng(seed)
+    scheduler = PairScheduler(
+        models, confidence=confidence, max_matches=max_matches, seed=seed
+    )
+    while not scheduler.stable():
+        if adaptive:
+            model1, model2 = scheduler.next_pair()
+        else:
+            player1, player2 = rng.choice(len(models), 2, replace=False)
+            model1, model2 = models[player1], models[player2]
+        expected = 1 / (1 + 10 ** ((model2.rating - model1.rating) / 400))
+        scheduler.record(model1, model2, rng.random() < expected)
+    truth = [model.name for model in sorted(models, key=lambda m: -m.rating)]
+    return scheduler.num_matches, scheduler.ranking() == truth
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", type=int, default=8)
+    parser.add_argument("--spacing", type=float, default=40)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--max-matches", type=int, default=50_000)
+    args = parser.parse_args()
+
+    models = [
+        SyntheticModel(f"model-{i}", 1000 + i * args.spacing)
+        for i in range(args.models)
+    ]
+    print(
+        f"{args.models} models {args.spacing:g} Elo apart, "
+        f"{args.confidence:.0%} confidence, {args.runs} runs"
+    )
+    print(f"{'':<10}{'matches (median)':>18}{'correct ranking':>18}{'time':>10}")
+    medians = {}
+    for label, adaptive in (("random", False), ("adaptive", True)):
+        start = time.perf_counter()
+        runs = [
+            simulate(models, adaptive, args.confidence, args.max_matches, seed)
+            for seed in range(args.runs)
+        ]
+        elapsed = time.perf_counter() - start
+        medians[label] = statistics.median(matches for matches, _ in runs)
+        correct = sum(ok for _, ok in runs) / len(runs)
+        print(f"{label:<10}{medians[label]:>18,.0f}{correct:>18.0%}{elapsed:>9.1f}s")
+    print(
+        f"adaptive needs {medians['adaptive'] / medians['random']:.0%} of the matches"
+    )
+
+
+if __name__ == "__main__":
+    main()
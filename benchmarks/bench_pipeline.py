@@ -0,0 +1,191 @@
+"""
+End-to-end Reval throughput on the in-process fake provider, so orchestration
+overhead can be measured offline and compared between commits.
+
+    python benchmarks/bench_pipeline.py --tasks 200 1000 --models 2 4 \
+        --concurrency 0 16 64 --latency 0.02
+
+Every combination of mode (single, arena), task count, model count and
+concurrency (0 is the sequential path) runs in a fresh subprocess and reports:
+
+- cells/s: graded model outputs per second (tasks x models in single mode,
+  tasks x 2 in arena mode)
+- peak RSS of that subprocess
+- per-stage overhead: the mean time spent in each traced stage outside the
+  stages nested in it, e.g. `llm` is LanguageModel's own cost per provider call
+  (cache lookup, rate limiter, and the fake client with any simulated latency
+  and retries), `judge` is the prompt building and parsing around a judge
+  call, and `bookkeeping` is per frame of tasks
+
+With the default zero latency, cells/s is a measure of pure orchestration cost.
+Responses are deterministic, so the processed tasks are identical from run to
+run; `--error-rate` and `--requests-per-minute` add retried 500s and 429s.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+
+from reval.functions.binary_judge import judge_prompt_parts, parse_grade
+from reval.functions.criteria_generator import criteria_prompt_parts, parse_criteria
+from reval.language_models import (
+    LanguageModel,
+    RateLimiter,
+    configure_fake_provider,
+    get_model,
+    lognormal_latency,
+    set_rate_limiter,
+)
+from reval.reval import Reval
+from reval.tracing import span
+
+JUDGE = "fake:judge"
+
+
+# binary_judge and criteria_generator call gpt-4o-mini; these are the same
+# prompts and parsers pointed at the fake provider
+def judge(task, success_criteria, failure_criteria, model_output):
+    with span("judge", model=JUDGE):
+        query = judge_prompt_parts(
+            task, success_criteria, failure_criteria, model_output
+        )
+        return parse_grade(get_model(JUDGE, role="judge").get_generation(query))
+
+
+def arena_judge(task, success_criteria, failure_criteria, output1, output2):
+    with span("judge", model=JUDGE):
+        output = f"Response 1:\n{output1}\n\nResponse 2:\n{output2}"
+        query = judge_prompt_parts(task, success_criteria, failure_criteria, output)
+        raw_response = get_model(JUDGE, role="judge").get_generation(query)
+        return 1 if parse_grade(raw_response) else 2
+
+
+def criteria(task, success_criteria, failure_criteria, good_example, bad_example):
+    query = criteria_prompt_parts(
+        task, success_criteria, failure_criteria, good_example, bad_example
+    )
+    if query is None:
+        return success_criteria, failure_criteria
+    with span("criteria", model=JUDGE):
+        raw_response = get_model(JUDGE, role="criteria").get_generation(query)
+        return parse_criteria(raw_response, success_criteria, failure_criteria)
+
+
+def run(config):
+    configure_fake_provider(
+        latency=lognormal_latency(config["latency"]) if config["latency"] else 0.0,
+        error_rate=config["error_rate"],
+        requests_per_minute=config["requests_per_minute"],
+    )
+    set_rate_limiter(RateLimiter(base_delay=0.05))
+    models = [LanguageModel(f"fake:model-{i}") for i in range(config["models"])]
+    tasks = pd.DataFrame(
+        {"tasks": [f"Task {i}: explain topic {i}." for i in range(config["tasks"])]}
+    )
+    single = config["mode"] == "single"
+
+    with tempfile.TemporaryDirectory() as directory:
+        trace_path = os.path.join(directory, "trace.jsonl")
+        start = time.perf_counter()
+        Reval(
+            tasks,
+            models,
+            judge if single else arena_judge,
+            criteria,
+            mode=config["mode"],
+            processed_tasks_path=os.path.join(directory, "processed.csv"),
+            results_path=os.path.join(directory, "results.json"),
+            concurrency=config["concurrency"] or None,
+            criteria_store=False,
+            trace_path=trace_path if config["trace"] else None,
+        )
+        elapsed = time.perf_counter() - start
+        overhead = _self_times(trace_path) if config["trace"] else {}
+
+    cells = config["tasks"] * (config["models"] if single else 2)
+    return {
+        "cells_per_s": cells / elapsed,
+        "seconds": elapsed,
+        # kilobytes on linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "overhead_us": overhead,
+    }
+
+
+def _self_times(trace_path):
+    # mean time per span outside its child spans, by stage
+    spans = pd.read_json(trace_path, lines=True)
+    children = spans.groupby("parent")["wall_ms"].sum()
+    own = spans["wall_ms"] - spans["id"].map(children).fillna(0)
+    return (own.groupby(spans["stage"]).mean() * 1000).round(1).to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", default=["single", "arena"])
+    parser.add_argument("--tasks", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--models", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[0, 16, 64])
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-minute", type=float, default=None)
+    parser.add_argument("--no-trace", dest="trace", action="store_false")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(json.loads(args.run))))
+        return
+
+    print(
+        f"fake provider, median latency {args.latency * 1000:g} ms, "
+        f"error rate {args.error_rate:g}, "
+        f"{args.requests_per_minute or 'unlimited'} requests/min"
+    )
+    print(
+        f"{'mode':<8}{'tasks':>7}{'models':>7}{'conc':>6}"
+        f"{'cells/s':>10}{'seconds':>9}{'peak MB':>9}  overhead per span (us)"
+    )
+    for mode, tasks, models, concurrency in itertools.product(
+        args.modes, args.tasks, args.models, args.concurrency
+    ):
+        config = {
+            "mode": mode,
+            "tasks": tasks,
+            "models": models,
+            "concurrency": concurrency,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "requests_per_minute": args.requests_per_minute,
+            "trace": args.trace,
+        }
+        # a fresh process per run, so peak memory and caches don't carry over
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", json.dumps(config)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        overhead = " ".join(
+            f"{stage}={us:g}" for stage, us in result["overhead_us"].items()
+        )
+        print(
+            f"{mode:<8}{tasks:>7}{models:>7}{concurrency:>6}"
+            f"{result['cells_per_s']:>10,.0f}{result['seconds']:>9.2f}"
+            f"{result['peak_rss_mb']:>9.0f}  {overhead}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Sustained throughput against a rate-limited endpoint.
+
+    python benchmarks/bench_rate_limit.py --rpm 1200 --threads 32 --seconds 20
+
+Starts a local fake endpoint that enforces `--rpm` and answers excess requests
+with 429s, then hammers it from many threads through LanguageModel. Reports the
+achieved request rate as a fraction of the limit, how many 429s were received and
+how many calls failed outright (should be none).
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fake_openai_server import FakeOpenAIServer
+from reval.language_models import LanguageModel, RateLimiter, set_rate_limiter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rpm", type=int, default=1200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    limiter = RateLimiter(base_delay=0.1, max_delay=5.0)
+    set_rate_limiter(limiter)
+
+    with FakeOpenAIServer(
+        requests_per_minute=args.rpm, error_rate=args.error_rate
+    ) as server:
+        model = LanguageModel(
+            "gpt-4o-mini", max_tokens=16, api_key="bench", base_url=server.base_url
+        )
+        completed = []
+        failed = []
+        deadline = time.monotonic() + args.seconds
+
+        def worker():
+            while time.monotonic() < deadline:
+                try:
+                    model.get_generation("Grade this output.")
+                    completed.append(time.monotonic())
+                except Exception as error:
+                    failed.append(error)
+
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+    # skip the first few seconds while the limiter learns the limit
+    settled = [t for t in completed if t - start > min(5, args.seconds / 4)]
+    settled_rate = len(settled) / (elapsed - min(5, args.seconds / 4)) * 60
+
+    print(f"limit                 {args.rpm} requests/min")
+    print(f"completed             {len(completed)} in {elapsed:.1f}s")
+    print(
+        f"sustained rate        {settled_rate:.0f} requests/min "
+        f"({settled_rate / args.rpm:.0%} of limit)"
+    )
+    print(
+        f"429s received         {server.rejected} "
+        f"({server.rejected / max(server.requests, 1):.1%} of requests)"
+    )
+    print(f"500s injected         {server.errors}")
+    print(f"retries               {limiter.retries}")
+    print(f"failed calls          {len(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Time the arena rating steps on a synthetic match table, and check that the
+Bradley–Terry fit recovers the ratings the matches were simulated from.
+
+    python benchmarks/bench_ratings.py --matches 10000000 --models 50
+
+Sequential Elo is timed on `--elo-matches` matches (it is a per-match loop) and
+extrapolated to the full table.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from reval.ratings import (
+    bootstrap_intervals,
+    bradley_terry,
+    elo,
+    pair_counts,
+    to_elo_scale,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--matches", type=int, default=10_000_000)
+    parser.add_argument("--models", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--elo-matches", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    true_ratings = rng.normal(1000, 150, args.models)
+    model1 = rng.integers(0, args.models, args.matches)
+    model2 = (model1 + rng.integers(1, args.models, args.matches)) % args.models
+    expected = 1 / (1 + 10 ** ((true_ratings[model2] - true_ratings[model1]) / 400))
+    model1_won = rng.random(args.matches) < expected
+
+    start = time.perf_counter()
+    wins = pair_counts(
+        np.where(model1_won, model1, model2),
+        np.where(model1_won, model2, model1),
+        args.models,
+    )
+    counted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ratings = to_elo_scale(bradley_terry(wins))
+    fitted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    low, high = bootstrap_intervals(wins, args.rounds, seed=0)
+    bootstrapped = time.perf_counter() - start
+
+    n = min(args.elo_matches, args.matches)
+    start = time.perf_counter()
+    elo(model1[:n], model2[:n], model1_won[:n], [1000] * args.models)
+    sequential = (time.perf_counter() - start) * args.matches / n
+
+    truth = true_ratings - true_ratings.mean() + 1000
+    print(f"{args.matches:,} matches, {args.models} models")
+    print(f"count wins matrix        {counted:8.2f} s")
+    print(f"Bradley-Terry fit        {fitted:8.2f} s")
+    print(f"bootstrap CIs ({args.rounds} rounds) {bootstrapped:8.2f} s")
+    print(f"sequential Elo (extrap.) {sequential:8.2f} s")
+    print(
+        f"BT vs true ratings: max abs error {np.abs(ratings - truth).max():.2f}, "
+        f"CI covers truth for {np.mean((low <= truth) & (truth <= high)):.0%} "
+        f"of models, mean CI width {np.mean(high - low):.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
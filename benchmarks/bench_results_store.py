@@ -0,0 +1,112 @@
+"""
+Writing processed tasks and rescoring them from disk, CSV against Parquet.
+
+    python benchmarks/bench_results_store.py --rows 20000 --models 4 \
+        --output-bytes 4000
+
+Builds a synthetic processed tasks frame (task, criteria, and an output of
+`--output-bytes` characters plus a grade per model), writes it with ResultWriter
+in frames of `--chunksize` rows, then times:
+
+- score: recomputing the results from the file, the old way (reading the whole
+  CSV) and with score_results (only the grade columns)
+- read grades: read_results of just the grade columns
+
+and reports the file sizes.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+from reval.scoring import RunningScores
+from reval.streaming import ResultWriter, grade_columns, read_results, score_results
+
+
+class _Model:
+    def __init__(self, name):
+        self.name = name
+
+
+def processed_tasks(rows, models, output_bytes, seed=0):
+    rng = np.random.default_rng(seed)
+    # random words from a made-up vocabulary, which compress about as well as
+    # real outputs
+    vocabulary = np.array([f"w{i:x}" for i in range(5_000)])
+    words_per_output = output_bytes // 5
+    tasks = pd.DataFrame(
+        {
+            "tasks": [f"Task {i}: explain topic {i}." for i in range(rows)],
+            "success_criteria": "1. The response explains the topic.",
+            "failure_criteria": "1. The response is off topic.",
+        }
+    )
+    for model in models:
+        words = rng.choice(vocabulary, (rows, words_per_output))
+        tasks[f"{model.name}.output"] = [" ".join(output) for output in words]
+        tasks[f"{model.name}.grade"] = pd.array(rng.integers(0, 2, rows), dtype="Int8")
+    return tasks
+
+
+def timed(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--models", type=int, default=4)
+    parser.add_argument("--output-bytes", type=int, default=4_000)
+    parser.add_argument("--chunksize", type=int, default=5_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    models = [_Model(f"model-{i}") for i in range(args.models)]
+    tasks = processed_tasks(args.rows, models, args.output_bytes)
+
+    def csv_score(path):
+        scores = RunningScores(models)
+        scores.update(pd.read_csv(path))
+        return scores.results()
+
+    print(
+        f"{args.rows} rows, {args.models} models, "
+        f"{args.output_bytes} byte outputs, best of {args.runs}"
+    )
+    print(f"{'format':<9}{'write s':>9}{'MB':>8}{'score s':>9}{'grades s':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ("csv", "parquet"):
+            path = os.path.join(directory, f"processed.{extension}")
+
+            def write():
+                with ResultWriter(path) as writer:
+                    for start in range(0, len(tasks), args.chunksize):
+                        writer.write(tasks.iloc[start : start + args.chunksize])
+
+            write_s = timed(write, args.runs)
+            if extension == "csv":
+                score_s = timed(lambda: csv_score(path), args.runs)
+            else:
+                score_s = timed(lambda: score_results(path, models), args.runs)
+            grades_s = timed(lambda: read_results(path, grade_columns(path)), args.runs)
+            size = os.path.getsize(path) / 2**20
+            print(
+                f"{extension:<9}{write_s:>9.2f}{size:>8.0f}"
+                f"{score_s:>9.3f}{grades_s:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+A minimal local stand-in for the OpenAI chat completions endpoint, used by the
+benchmarks so they can run offline. Point a client at `server.base_url`.
+
+With `requests_per_minute` set the server enforces that limit with a token bucket
+and answers excess requests with 429s carrying retry-after and x-ratelimit
+headers, like the real API. `error_rate` injects random 500s.
+
+It also serves the parts of the files and Batch APIs that batch mode uses
+(upload a JSONL file, create a batch, poll it, download its output), so batch
+runs can be tested offline too. Batches complete `batch_delay` seconds after
+they are created.
+
+Requests with `"stream": true` are answered with server-sent events, one word
+per chunk, after `first_token_delay` seconds and then every `token_delay`
+seconds, so streaming latency metrics have something to measure.
+"""
+
+import email.parser
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.startswith("/v1/files"):
+            self._upload_file(data)
+            return
+        if self.path.startswith("/v1/batches"):
+            self._create_batch(json.loads(data))
+            return
+        body = json.loads(data)
+        self.server.requests += 1
+        headers = self.server.rate_limit_headers()
+
+        allowed, retry_after = self.server.admit()
+        if not allowed:
+            self.server.rejected += 1
+            headers["retry-after-ms"] = str(int(retry_after * 1000))
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                headers,
+            )
+            return
+        if random.random() < self.server.error_rate:
+            self.server.errors += 1
+            self._send_json(500, {"error": {"message": "Internal error"}})
+            return
+        if body.get("stream"):
+            self._send_stream(body, headers)
+            return
+        self._send_json(200, self.server.completion(body), headers)
+
+    def _send_stream(self, body, headers):
+        completion = self.server.completion(body)
+        text = completion["choices"][0]["message"]["content"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        def chunk(choices, usage=None):
+            return {
+                "id": completion["id"],
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": completion["model"],
+                "choices": choices,
+                "usage": usage,
+            }
+
+        events = [
+            chunk([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            for piece in re.findall(r"\S+\s*|\s+", text)
+        ]
+        events.append(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append(chunk([], completion["usage"]))
+        try:
+            time.sleep(self.server.first_token_delay)
+            for i, event in enumerate(events):
+                if i:
+                    time.sleep(self.server.token_delay)
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped reading early
+            self.close_connection = True
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts[1:2] == ["batches"] and len(parts) == 3:
+            batch = self.server.batch(parts[2])
+            if batch is None:
+                self._send_json(404, {"error": {"message": "No such batch"}})
+            else:
+                self._send_json(200, batch)
+        elif parts[1:2] == ["files"] and parts[3:] == ["content"]:
+            content = self.server.files.get(parts[2])
+            if content is None:
+                self._send_json(404, {"error": {"message": "No such file"}})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def _upload_file(self, data):
+        # multipart/form-data with a "file" part, parsed as a MIME message
+        message = email.parser.BytesParser().parsebytes(
+            b"Content-Type: "
+            + self.headers["Content-Type"].encode()
+            + b"\r\n\r\n"
+            + data
+        )
+        content = b""
+        for part in message.get_payload():
+            if part.get_param("name", header="content-disposition") == "file":
+                content = part.get_payload(decode=True)
+        file_id = self.server.add_file(content)
+        self._send_json(
+            200,
+            {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": "batch.jsonl",
+                "purpose": "batch",
+            },
+        )
+
+    def _create_batch(self, body):
+        self._send_json(200, self.server.create_batch(body))
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        respond=None,
+        port=0,
+        requests_per_minute=None,
+        error_rate=0.0,
+        batch_delay=0.0,
+        first_token_delay=0.0,
+        token_delay=0.0,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.respond = respond or (
+            lambda prompt: "<evaluation><reasoning>ok</reasoning><grade>1</grade></evaluation>"
+        )
+        self.requests_per_minute = requests_per_minute
+        self.error_rate = error_rate
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.batch_delay = batch_delay
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.files = {}
+        self.batches = {}
+        self.batch_requests = 0
+        self._lock = threading.Lock()
+        self._allowance = 0.0
+        self._updated = time.monotonic()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def completion(self, body):
+        prompt = body["messages"][-1]["content"]
+        self.prompt_tokens += len(prompt) // 4
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self.respond(prompt)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": 8,
+                "total_tokens": len(prompt) // 4 + 8,
+            },
+        }
+
+    def add_file(self, content):
+        with self._lock:
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = content
+        return file_id
+
+    def create_batch(self, body):
+        with self._lock:
+            batch_id = f"batch_{len(self.batches)}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": body["endpoint"],
+                "input_file_id": body["input_file_id"],
+                "completion_window": body["completion_window"],
+                "status": "in_progress",
+                "output_file_id": None,
+                "error_file_id": None,
+                "created_at": int(time.time()),
+                "_created": time.monotonic(),
+            }
+        return self.batch(batch_id)
+
+    def batch(self, batch_id):
+        """The batch as the API returns it, running it once its delay is up."""
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            ready = time.monotonic() - batch["_created"] >= self.batch_delay
+            if batch["status"] == "in_progress" and ready:
+                self._run_batch(batch)
+            return {k: v for k, v in batch.items() if not k.startswith("_")}
+
+    def _run_batch(self, batch):
+        lines = []
+        for line in self.files[batch["input_file_id"]].decode().splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            self.batch_requests += 1
+            lines.append(
+                json.dumps(
+                    {
+                        "id": f"batch_req_{self.batch_requests}",
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "request_id": "fake",
+                            "body": self.completion(request["body"]),
+                        },
+                        "error": None,
+                    }
+                )
+            )
+        output_file_id = f"file-{len(self.files)}"
+        self.files[output_file_id] = ("\n".join(lines) + "\n").encode()
+        batch["status"] = "completed"
+        batch["output_file_id"] = output_file_id
+        batch["request_counts"] = {
+            "total": len(lines),
+            "completed": len(lines),
+            "failed": 0,
+        }
+
+    def admit(self):
+        """Returns (allowed, seconds until the next request would be allowed)."""
+        if self.requests_per_minute is None:
+            return True, 0.0
+        per_second = self.requests_per_minute / 60
+        with self._lock:
+            now = time.monotonic()
+            # allow a one second burst
+            self._allowance = min(
+                per_second, self._allowance + (now - self._updated) * per_second
+            )
+            self._updated = now
+            if self._allowance >= 1:
+                self._allowance -= 1
+                return True, 0.0
+            return False, (1 - self._allowance) / per_second
+
+    def rate_limit_headers(self):
+        if self.requests_per_minute is None:
+            return {}
+        return {
+            "x-ratelimit-limit-requests": str(self.requests_per_minute),
+            "x-ratelimit-remaining-requests": str(int(self._allowance)),
+        }
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
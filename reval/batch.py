@@ -0,0 +1,159 @@
+import io
+import json
+import time
+
+from .language_models import get_model
+
+# most requests a single provider batch may hold
+MAX_BATCH_SIZE = {"openai": 50_000, "claude": 100_000}
+
+
+def run_batch(requests, poll_interval=60):
+    """
+    Answer (custom_id, model, prompt) requests through the provider batch APIs
+    and return {custom_id: response text}.
+
+    Requests are grouped into one batch per provider, model and client, submitted
+    together and polled every `poll_interval` seconds until all have ended.
+    Prompts already in the response cache are answered from it, and results are
+    written back to it. Providers without a batch API (together), models that
+    aren't LanguageModels, and requests that failed or expired inside a batch
+    are sent one at a time with `get_generation` instead.
+    """
+    responses = {}
+    direct = []
+    groups = {}
+    for custom_id, model, prompt in requests:
+        backend = _BACKENDS.get(getattr(model, "model_provider", None))
+        if backend is None or not hasattr(model, "request_params"):
+            direct.append((custom_id, model, prompt))
+            continue
+        cached = model.cached_generation(prompt)
+        if cached is not None:
+            responses[custom_id] = cached
+            continue
+        key = (model.model_provider, model.model, id(model.client))
+        groups.setdefault(key, []).append((custom_id, model, prompt))
+
+    jobs = []
+    for (provider, _, _), group in groups.items():
+        backend = _BACKENDS[provider]
+        size = MAX_BATCH_SIZE[provider]
+        for start in range(0, len(group), size):
+            part = group[start : start + size]
+            client = part[0][1].client
+            jobs.append((backend, client, backend.submit(client, part), part))
+
+    while jobs:
+        running = []
+        for job in jobs:
+            backend, client, batch_id, part = job
+            state = backend.state(client, batch_id)
+            if state == "running":
+                running.append(job)
+                continue
+            texts = backend.results(client, batch_id, state)
+            for custom_id, model, prompt in part:
+                text = texts.get(custom_id)
+                if text is None:
+                    direct.append((custom_id, model, prompt))
+                else:
+                    model.store_generation(prompt, text)
+                    responses[custom_id] = text
+        jobs = running
+        if jobs:
+            time.sleep(poll_interval)
+
+    for custom_id, model, prompt in direct:
+        responses[custom_id] = model.get_generation(prompt)
+    return responses
+
+
+def batch_model(fn):
+    """
+    The LanguageModel a batchable function (one with `prompt`, `parse` and
+    `model_name`, like binary_judge) calls, so batched requests use its settings
+    and share its cache entries.
+    """
+    if hasattr(fn, "language_model"):
+        return fn.language_model()
+    return get_model(fn.model_name)
+
+
+class _OpenAIBatches:
+    """OpenAI Batch API: a JSONL file of chat completion requests."""
+
+    def submit(self, client, requests):
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": model.request_params(prompt),
+                }
+            )
+            for custom_id, model, prompt in requests
+        ]
+        data = ("\n".join(lines) + "\n").encode()
+        batch_file = client.files.create(
+            file=("batch.jsonl", io.BytesIO(data), "application/jsonl"),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def state(self, client, batch_id):
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in ("completed", "failed", "expired", "cancelled"):
+            return batch
+        return "running"
+
+    def results(self, client, batch_id, batch):
+        texts = {}
+        # expired and cancelled batches still have results for what finished
+        if batch.output_file_id is None:
+            return texts
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                continue
+            body = response["body"]
+            texts[record["custom_id"]] = body["choices"][0]["message"]["content"]
+        return texts
+
+
+class _AnthropicBatches:
+    """Anthropic Message Batches API: a list of Messages requests."""
+
+    def submit(self, client, requests):
+        batch = client.messages.batches.create(
+            requests=[
+                {"custom_id": custom_id, "params": model.request_params(prompt)}
+                for custom_id, model, prompt in requests
+            ]
+        )
+        return batch.id
+
+    def state(self, client, batch_id):
+        batch = client.messages.batches.retrieve(batch_id)
+        if batch.processing_status == "ended":
+            return batch
+        return "running"
+
+    def results(self, client, batch_id, batch):
+        texts = {}
+        for entry in client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                texts[entry.custom_id] = entry.result.message.content[0].text
+        return texts
+
+
+_BACKENDS = {"openai": _OpenAIBatches(), "claude": _AnthropicBatches()}
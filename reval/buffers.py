@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+from .language_models import GENERATION_METRICS
+
+INPUT_COLUMNS = ["tasks", "good_output", "bad_output"]
+
+
+class ResultBuffer:
+    """
+    Preallocated column buffers for one frame of tasks.
+
+    Rows are read from plain arrays instead of `iterrows`, and results are written
+    into one array per column (object arrays for text, int8 plus a "filled" mask
+    for grades), addressed by column index and row position. `materialize` then
+    writes every column back into the frame in a single assignment each, instead
+    of patching the frame row by row.
+    """
+
+    def __init__(self, tasks, models_to_eval, metrics=False):
+        self.tasks = tasks
+        self.size = tasks.shape[0]
+        self._inputs = [
+            (
+                tasks[column].to_numpy(dtype=object)
+                if column in tasks.columns
+                else np.full(self.size, None, dtype=object)
+            )
+            for column in INPUT_COLUMNS
+        ]
+
+        text_columns = ["success_criteria", "failure_criteria"] + [
+            f"{model.name}.output" for model in models_to_eval
+        ]
+        if metrics:
+            # latency metrics are mixed numbers and None, so kept like text
+            text_columns += [
+                f"{model.name}.{metric}"
+                for model in models_to_eval
+                for metric in GENERATION_METRICS
+            ]
+        grade_columns = [f"{model.name}.grade" for model in models_to_eval]
+
+        self.columns = text_columns + grade_columns
+        self._index = {column: i for i, column in enumerate(self.columns)}
+        self._is_grade = [False] * len(text_columns) + [True] * len(grade_columns)
+
+        # start from what's already in the frame, so rows we skip keep their values
+        self._values = []
+        self._filled = []
+        for column, is_grade in zip(self.columns, self._is_grade):
+            existing = tasks[column]
+            if is_grade:
+                filled = existing.notna().to_numpy()
+                values = np.zeros(self.size, dtype=np.int8)
+                values[filled] = existing[filled].astype(np.int8).to_numpy()
+            else:
+                filled = None
+                values = existing.to_numpy(dtype=object, copy=True)
+            self._values.append(values)
+            self._filled.append(filled)
+
+    def rows(self, order=None):
+        """Yield (position, index, task, success_criteria, failure_criteria,
+        good_output, bad_output) for every row, in `order` if given."""
+        success_criteria = self._values[self._index["success_criteria"]]
+        failure_criteria = self._values[self._index["failure_criteria"]]
+        tasks, good_output, bad_output = self._inputs
+        index = self.tasks.index
+        for i in range(self.size) if order is None else order:
+            yield (
+                i,
+                index[i],
+                tasks[i],
+                success_criteria[i],
+                failure_criteria[i],
+                good_output[i],
+                bad_output[i],
+            )
+
+    def set(self, i, column, value):
+        column_index = self._index[column]
+        if self._is_grade[column_index]:
+            filled = value is not None and not pd.isna(value)
+            self._filled[column_index][i] = filled
+            self._values[column_index][i] = value if filled else 0
+        else:
+            self._values[column_index][i] = value
+
+    def update(self, i, values):
+        for column, value in values.items():
+            self.set(i, column, value)
+
+    def materialize(self):
+        """Write the buffers back into the frame and return it."""
+        for column, values, filled in zip(self.columns, self._values, self._filled):
+            if filled is None:
+                self.tasks[column] = values
+            else:
+                self.tasks[column] = pd.arrays.IntegerArray(values, ~filled)
+        return self.tasks
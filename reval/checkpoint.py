@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# returned by Checkpoint.get for cells that still need to be computed
+MISSING = object()
+
+
+def task_hash(task):
+    return hashlib.sha256(str(task).encode("utf-8")).hexdigest()[:16]
+
+
+def _to_builtin(value):
+    # pandas hands us numpy scalars for indices and grades
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class CheckpointLog:
+    """
+    Append-only JSONL write-ahead log of completed cells.
+
+    `record` only puts the entry on a queue; a background thread writes entries in
+    batches and fsyncs once `flush_every` entries have accumulated or
+    `flush_interval` seconds have passed, whichever comes first. A crash loses at
+    most that window, and a torn final line is skipped when the log is read back.
+    """
+
+    def __init__(self, path, flush_every=256, flush_interval=1.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        torn = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            # terminate a line torn by a crash so the next entry starts clean
+            self._file.write("\n")
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def record(self, entry):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(entry)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def _write_loop(self):
+        pending = 0
+        last_sync = time.monotonic()
+        while True:
+            timeout = None
+            if pending:
+                elapsed = time.monotonic() - last_sync
+                timeout = max(0.0, self.flush_interval - elapsed)
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                entry = MISSING
+
+            if entry is not None and entry is not MISSING:
+                try:
+                    line = json.dumps(entry, default=_to_builtin, ensure_ascii=False)
+                    self._file.write(line + "\n")
+                except Exception as error:
+                    self._error = error
+                    return
+                pending += 1
+
+            if pending and (
+                entry is None
+                or pending >= self.flush_every
+                or time.monotonic() - last_sync >= self.flush_interval
+            ):
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                pending = 0
+                last_sync = time.monotonic()
+
+            if entry is None:
+                return
+
+    @staticmethod
+    def read(path):
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # a line torn by a crash mid-write; everything before it is intact
+                    continue
+        return entries
+
+
+class Checkpoint:
+    """
+    Tracks which (row, model, stage) cells of a Reval run are done.
+
+    Stages are "criteria", "pair" (arena opponents), "output" and "grade". With
+    `resume=True` the cells already in the log at `path` are loaded and served by
+    `get`, as long as the task text of the row still matches. Without it a new
+    log is started, and an existing non-empty log at `path` raises
+    FileExistsError rather than losing the cells in it, unless `overwrite=True`.
+    """
+
+    def __init__(self, path, resume=False, overwrite=False, **log_kwargs):
+        self.path = path
+        self.done = {}
+        if resume:
+            for entry in CheckpointLog.read(path):
+                key = (entry["row"], entry.get("model"), entry["stage"])
+                self.done[key] = (entry["task"], entry["value"])
+        elif os.path.exists(path):
+            if os.path.getsize(path) > 0 and not overwrite:
+                raise FileExistsError(
+                    f"Checkpoint {path} already has completed cells; pass "
+                    "resume=True to continue from it, or delete it to start over"
+                )
+            os.remove(path)
+        self._log = CheckpointLog(path, **log_kwargs)
+
+    def get(self, row, task, stage, model=None):
+        entry = self.done.get((_to_key(row), model, stage))
+        if entry is None or entry[0] != task_hash(task):
+            return MISSING
+        return entry[1]
+
+    def record(self, row, task, stage, value, model=None):
+        self._log.record(
+            {
+                "row": _to_key(row),
+                "task": task_hash(task),
+                "stage": stage,
+                "model": model,
+                "value": value,
+            }
+        )
+
+    def close(self):
+        self._log.close()
+
+
+def _to_key(row):
+    # json round-trips numpy ints as plain ints, so normalise before lookups
+    return _to_builtin(row) if isinstance(row, np.generic) else row
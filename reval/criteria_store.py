@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .batch import batch_model, run_batch
+from .streaming import iter_task_chunks
+
+
+def criteria_store_path(processed_tasks_path):
+    """The default store, a sidecar next to the processed tasks file."""
+    return os.path.splitext(processed_tasks_path)[0] + ".criteria.sqlite"
+
+
+class CriteriaStore:
+    """
+    Success and failure criteria by task, stored in a single SQLite file.
+
+    Criteria only depend on the task and its examples, not on the models being
+    evaluated, so once a suite's criteria are in the store, reruns and runs with
+    new models make no criteria calls at all. Entries are keyed by a hash of the
+    task, any criteria and examples it came with, and the criteria generator:
+    its name, model, code and, for batchable generators, its prompt, so editing
+    a generator or its instructions starts fresh entries. Generators without
+    code to hash (e.g. functools.partial) can't be stored, see `can_store`.
+    Criteria are only stored when both came out non-empty.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS criteria (
+                key TEXT PRIMARY KEY,
+                success_criteria TEXT,
+                failure_criteria TEXT,
+                created_at REAL NOT NULL
+            )""")
+        self._db.commit()
+
+    @staticmethod
+    def can_store(criteria_model):
+        """Whether `criteria_model` has a stable identity to key its criteria by."""
+        return _generator_id(criteria_model) is not None
+
+    @staticmethod
+    def key(criteria_model, task, success_criteria, failure_criteria, good, bad):
+        generator = _generator_id(criteria_model)
+        if generator is None:
+            raise ValueError(
+                f"Can't store the criteria of {criteria_model!r}: it has no code "
+                "to identify it by; use a function or pass criteria_store=False"
+            )
+        payload = json.dumps(
+            [generator]
+            + [
+                None if _missing(value) else str(value)
+                for value in (task, success_criteria, failure_criteria, good, bad)
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: (success_criteria, failure_criteria)} for the stored keys."""
+        keys = list(set(keys))
+        found = {}
+        with self._lock:
+            # stay under SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                part = keys[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                for key, success_criteria, failure_criteria in self._db.execute(
+                    "SELECT key, success_criteria, failure_criteria FROM criteria "
+                    f"WHERE key IN ({placeholders})",
+                    part,
+                ):
+                    # rows from older versions may hold a missing criterion
+                    if success_criteria is not None and failure_criteria is not None:
+                        found[key] = (success_criteria, failure_criteria)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Store (key, criteria) items, skipping any with a missing criterion."""
+        now = time.time()
+        rows = [
+            (key, _text(success_criteria), _text(failure_criteria), now)
+            for key, (success_criteria, failure_criteria) in items
+        ]
+        rows = [row for row in rows if row[1] is not None and row[2] is not None]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO criteria VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+
+    def put(self, key, criteria):
+        self.put_many([(key, criteria)])
+
+    def wrap(self, criteria_model):
+        """
+        Return `criteria_model` with the store in front of it: stored criteria
+        are returned without a call, and new ones are stored.
+        """
+
+        def stored_criteria(task, success_criteria, failure_criteria, good, bad):
+            task, success_criteria, failure_criteria, good, bad = map(
+                _value, (task, success_criteria, failure_criteria, good, bad)
+            )
+            if not (_missing(success_criteria) or _missing(failure_criteria)):
+                return criteria_model(
+                    task, success_criteria, failure_criteria, good, bad
+                )
+            key = self.key(
+                criteria_model, task, success_criteria, failure_criteria, good, bad
+            )
+            criteria = self.get(key)
+            if criteria is None:
+                criteria = tuple(
+                    criteria_model(task, success_criteria, failure_criteria, good, bad)
+                )
+                self.put(key, criteria)
+            return criteria
+
+        return stored_criteria
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fill_criteria(tasks, criteria_model, store, concurrency=16, poll_interval=None):
+    """
+    Fill the success_criteria and failure_criteria columns of `tasks` from the
+    store, generating and storing whatever is missing first.
+
+    Missing criteria are generated `concurrency` at a time, or, with
+    `poll_interval` set and a criteria generator that can be batched (see
+    reval/batch.py), in one provider batch. Rows with the same task and examples
+    share one call. Returns the number of criteria generated.
+    """
+    columns = {
+        column: (
+            tasks[column].to_numpy(dtype=object)
+            if column in tasks.columns
+            else [None] * len(tasks)
+        )
+        for column in (
+            "tasks",
+            "success_criteria",
+            "failure_criteria",
+            "good_output",
+            "bad_output",
+        )
+    }
+    rows = [tuple(map(_value, row)) for row in zip(*columns.values())]
+
+    keys = [None] * len(rows)
+    needed = {}
+    for i, args in enumerate(rows):
+        task, success_criteria, failure_criteria = args[:3]
+        if _missing(task) or not (
+            _missing(success_criteria) or _missing(failure_criteria)
+        ):
+            continue
+        keys[i] = store.key(criteria_model, *args)
+        needed.setdefault(keys[i], args)
+
+    found = store.get_many(needed)
+    missing = [(key, args) for key, args in needed.items() if key not in found]
+    generated = _generate(missing, criteria_model, concurrency, poll_interval)
+    store.put_many(generated.items())
+    found.update(generated)
+
+    success_column = list(columns["success_criteria"])
+    failure_column = list(columns["failure_criteria"])
+    for i, key in enumerate(keys):
+        if key is not None:
+            success_column[i], failure_column[i] = found[key]
+    tasks["success_criteria"] = success_column
+    tasks["failure_criteria"] = failure_column
+    return len(generated)
+
+
+def _generate(missing, criteria_model, concurrency, poll_interval):
+    batchable = all(
+        hasattr(criteria_model, name) for name in ("prompt", "parse", "model_name")
+    )
+    if poll_interval is not None and batchable:
+        generated = {}
+        requests = []
+        for key, args in missing:
+            prompt = criteria_model.prompt(*args)
+            if prompt is None:
+                generated[key] = tuple(criteria_model(*args))
+            else:
+                requests.append((key, batch_model(criteria_model), prompt))
+        responses = run_batch(requests, poll_interval)
+        for key, args in missing:
+            if key in responses:
+                try:
+                    criteria = criteria_model.parse(responses[key], args[1], args[2])
+                except ValueError:
+                    # a malformed response, called again directly like in
+                    # reval._BatchStage
+                    criteria = getattr(criteria_model, "fallback", criteria_model)(
+                        *args
+                    )
+                generated[key] = tuple(criteria)
+        return generated
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = executor.map(lambda item: criteria_model(*item[1]), missing)
+        return {key: tuple(criteria) for (key, _), criteria in zip(missing, results)}
+
+
+def compile_criteria(
+    task_location,
+    criteria_model,
+    store_path="processed_tasks.criteria.sqlite",
+    concurrency=16,
+    chunksize=10_000,
+    batch=False,
+    batch_poll_interval=60,
+):
+    """
+    Precompute the criteria for every task in `task_location` into a criteria
+    store, as a stage of its own.
+
+    Run this ahead of (or alongside) generation; `Reval` then finds the criteria
+    in the store instead of generating them. Tasks are read `chunksize` rows at
+    a time, and criteria are generated `concurrency` at a time or, with
+    `batch=True`, through the provider batch APIs. Returns the number of criteria
+    generated.
+    """
+    generated = 0
+    with CriteriaStore(store_path) as store:
+        for chunk in iter_task_chunks(task_location, chunksize):
+            generated += fill_criteria(
+                chunk,
+                criteria_model,
+                store,
+                concurrency,
+                batch_poll_interval if batch else None,
+            )
+    return generated
+
+
+def _missing(value):
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+def _value(value):
+    # NaN from sparse columns goes to criteria generators as None
+    return None if _missing(value) else value
+
+
+def _text(value):
+    return None if _missing(value) else str(value)
+
+
+def _generator_id(criteria_model):
+    # the function, the model behind it and a hash of the function's code and
+    # prompt, e.g. "criteria_generator:gpt-4o-mini:3f2a...", or None if there
+    # is no code to tell generators apart by (two lambdas share a name)
+    code = getattr(criteria_model, "__code__", None)
+    if code is None:
+        code = getattr(
+            getattr(type(criteria_model), "__call__", None), "__code__", None
+        )
+    if code is None:
+        return None
+    version = hashlib.sha256(_code_text(code).encode("utf-8"))
+    prompt = getattr(criteria_model, "prompt", None)
+    if prompt is not None:
+        # the instructions, which live outside the code, as a bare task sees them
+        version.update(repr(prompt("{task}", None, None, None, None)).encode("utf-8"))
+    name = getattr(criteria_model, "__qualname__", type(criteria_model).__qualname__)
+    model_name = getattr(criteria_model, "model_name", None)
+    parts = [name, version.hexdigest()[:16]]
+    if model_name is not None:
+        parts.insert(1, model_name)
+    return ":".join(parts)
+
+
+def _code_text(code):
+    # a stable rendering of a code object; repr(code) includes its address
+    consts = [
+        _code_text(const) if isinstance(const, types.CodeType) else repr(const)
+        for const in code.co_consts
+    ]
+    return repr((code.co_code, consts, code.co_names))
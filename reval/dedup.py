@@ -0,0 +1,235 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# column Reval adds to processed tasks when deduplicating: for a duplicate, the
+# row index of the task whose results it was given
+DUPLICATE_OF_COLUMN = "duplicate_of"
+
+# a Mersenne prime for the MinHash permutations (a * x + b) mod p
+_PRIME = np.uint64((1 << 61) - 1)
+
+
+class TaskDeduplicator:
+    """
+    Finds exact and near-duplicate tasks with MinHash and LSH, so that Reval can
+    evaluate one representative per group of duplicates.
+
+    Task texts are case folded and whitespace collapsed, split into character
+    `shingle_size`-grams, and summarized by a `num_perm` value MinHash
+    signature. Signatures are split into LSH bands chosen for `threshold`, rows
+    that share a band bucket are compared on their whole signatures, and those
+    with an estimated Jaccard similarity of at least `threshold` are grouped.
+    Each group is represented by its first row. Everything is linear in the
+    number of rows apart from sorting the band hashes, and only the signatures
+    (4 * `num_perm` bytes per row) are kept, not the texts.
+
+    Use `add` for each frame of tasks in order, then `representatives`.
+    """
+
+    def __init__(self, threshold=0.9, num_perm=64, shingle_size=5, seed=0):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.band_rows = _lsh_bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self._powers = np.uint64(257) ** np.arange(
+            shingle_size - 1, -1, -1, dtype=np.uint64
+        )
+        self._signatures = []
+        self._digests = []
+        self._valid = []
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def add(self, texts):
+        """Add the next task texts; missing tasks are never duplicates."""
+        signatures = np.zeros((len(texts), self.num_perm), dtype=np.uint32)
+        digests = np.zeros(len(texts), dtype=np.uint64)
+        valid = np.zeros(len(texts), dtype=bool)
+        for i, text in enumerate(texts):
+            if not isinstance(text, str):
+                continue
+            text = " ".join(text.casefold().split())
+            signatures[i] = self.signature(text)
+            digests[i] = int.from_bytes(
+                hashlib.blake2b(text.encode(), digest_size=8).digest(), "big"
+            )
+            valid[i] = True
+        self._signatures.append(signatures)
+        self._digests.append(digests)
+        self._valid.append(valid)
+
+    def signature(self, text):
+        """The MinHash signature of an already normalized text."""
+        data = np.frombuffer(text.encode(), dtype=np.uint8).astype(np.uint64)
+        if len(data) < self.shingle_size:
+            data = np.pad(data, (0, self.shingle_size - len(data)))
+        windows = np.lib.stride_tricks.sliding_window_view(data, self.shingle_size)
+        # a polynomial hash per shingle, folded to 32 bits
+        shingles = np.unique(windows @ self._powers)
+        shingles = (shingles ^ (shingles >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+        # (a * x + b) mod p wraps around 2**64 first, as in the usual MinHash
+        # implementations, which still spreads the values well
+        hashes = (np.outer(shingles, self._a) + self._b) % _PRIME
+        return (hashes & np.uint64(0xFFFFFFFF)).min(axis=0).astype(np.uint32)
+
+    def representatives(self):
+        """
+        For every row added, the position of the row that represents it: its
+        own position, or that of the first row of its group of duplicates.
+        """
+        signatures = np.concatenate(self._signatures)
+        digests = np.concatenate(self._digests)
+        valid = np.concatenate(self._valid)
+        positions = np.flatnonzero(valid)
+        parent = np.arange(len(signatures))
+
+        def find(i):
+            root = i
+            while parent[root] != root:
+                root = parent[root]
+            while parent[i] != root:
+                parent[i], i = root, parent[i]
+            return root
+
+        for band in range(self.bands):
+            columns = slice(band * self.band_rows, (band + 1) * self.band_rows)
+            keys = _band_hashes(signatures[positions, columns])
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            starts = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+            # the first row of each bucket, for every row in it
+            first = positions[order[np.flatnonzero(starts)[np.cumsum(starts) - 1]]]
+            rows = positions[order]
+            candidates = rows != first
+            rows, first = rows[candidates], first[candidates]
+            similarity = (signatures[rows] == signatures[first]).mean(axis=1)
+            for row, other in zip(
+                rows[similarity >= self.threshold],
+                first[similarity >= self.threshold],
+            ):
+                a, b = find(row), find(other)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        representatives = np.array([find(i) for i in range(len(parent))])
+        duplicates = representatives != np.arange(len(parent))
+        exact = duplicates & (digests == digests[representatives])
+        self.exact_duplicates = int(exact.sum())
+        self.near_duplicates = int(duplicates.sum()) - self.exact_duplicates
+        return representatives
+
+    def report(self):
+        return {
+            "threshold": self.threshold,
+            "rows": int(sum(len(valid) for valid in self._valid)),
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+        }
+
+
+class DuplicateFanOut:
+    """
+    Reval's side of deduplication. Given every row's representative (from
+    `deduplicator`) and index label, `select`
+    cuts a frame of tasks down to its representatives for evaluation, and
+    `fan_out` copies their results back onto the duplicates, including those of
+    later frames, and marks the duplicates in DUPLICATE_OF_COLUMN. Frames must
+    come in the order the representatives were computed in.
+    """
+
+    def __init__(self, deduplicator, representatives, labels, result_columns):
+        self.deduplicator = deduplicator
+        self.representatives = representatives
+        self.labels = labels
+        self.result_columns = result_columns
+        positions = np.arange(len(representatives))
+        duplicates = positions[representatives != positions]
+        # results are kept only for rows with duplicates, until their last one
+        self._last_duplicate = dict(
+            pd.Series(duplicates).groupby(representatives[duplicates]).max()
+        )
+        self._saved = {}
+        self._offset = 0
+
+    def select(self, tasks):
+        positions = np.arange(self._offset, self._offset + len(tasks))
+        self._positions = positions
+        self._offset += len(tasks)
+        return tasks[self.representatives[positions] == positions].copy()
+
+    def fan_out(self, tasks, evaluated):
+        positions = self._positions
+        representatives = self.representatives[positions]
+        own = representatives == positions
+        columns = [column for column in self.result_columns if column in tasks]
+
+        for position, row in zip(
+            positions[own], evaluated[columns].itertuples(index=False)
+        ):
+            if position in self._last_duplicate:
+                self._saved[position] = tuple(row)
+
+        tasks = tasks.copy()
+        for j, column in enumerate(columns):
+            values = tasks[column].to_numpy(dtype=object, copy=True)
+            values[own] = evaluated[column].to_numpy(dtype=object)
+            for i in np.flatnonzero(~own):
+                values[i] = self._saved[representatives[i]][j]
+            if isinstance(evaluated[column].dtype, pd.Int8Dtype):
+                values = pd.array(
+                    [None if pd.isna(value) else value for value in values],
+                    dtype="Int8",
+                )
+            tasks[column] = values
+
+        duplicate_of = np.full(len(tasks), None, dtype=object)
+        duplicate_of[~own] = self.labels[representatives[~own]]
+        if self.labels.dtype.kind in "iu":
+            duplicate_of = pd.array(duplicate_of, dtype="Int64")
+        tasks[DUPLICATE_OF_COLUMN] = duplicate_of
+
+        for position in [
+            p for p in self._saved if self._last_duplicate[p] < self._offset
+        ]:
+            del self._saved[position]
+        return tasks
+
+
+def _band_hashes(band):
+    # one 64-bit hash per row of a band of signature values
+    keys = np.zeros(len(band), dtype=np.uint64)
+    for column in band.T:
+        keys = keys * np.uint64(1_000_003) + column.astype(np.uint64)
+    return keys
+
+
+def _lsh_bands(threshold, num_perm):
+    """
+    The (bands, rows per band) for `num_perm` signature values that minimize
+    the chance of missing pairs above `threshold` plus that of matching pairs
+    below it.
+    """
+    similarity = np.linspace(0, 1, 201)
+    best, best_error = None, None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            match = 1 - (1 - similarity**rows) ** bands
+            below = similarity < threshold
+            error = _area(match[below], similarity[below]) + _area(
+                1 - match[~below], similarity[~below]
+            )
+            if best_error is None or error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+def _area(y, x):
+    # trapezoidal integral of y over x
+    return float(np.sum((y[1:] + y[:-1]) / 2 * np.diff(x)))
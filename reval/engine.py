@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .language_models import set_inflight_limits
+
+
+class Engine:
+    """
+    Runs blocking model calls (LanguageModel.get_generation, judges, criteria
+    generators) on a thread pool so that independent calls overlap.
+
+    Args:
+        concurrency (int): Maximum number of calls in flight across all providers.
+        provider_limits (Dict[str, int]): Optional per-provider caps, e.g.
+            {"openai": 32, "claude": 8}. These are enforced inside LanguageModel, so
+            calls made by the judge and criteria functions are counted as well.
+            The limits in place before are restored by `close`.
+    """
+
+    def __init__(self, concurrency=64, provider_limits=None):
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="reval"
+        )
+        self._previous_limits = set_inflight_limits(provider_limits)
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def map_rows(self, rows, evaluate_row, on_done=None, window=None):
+        """
+        Evaluate rows concurrently, keeping at most `window` rows in flight.
+
+        `rows` is an iterable of (idx, row) pairs and `evaluate_row` a coroutine
+        function taking (idx, row). `on_done(idx, result)` is called as each row
+        finishes, in completion order.
+        """
+        if window is None:
+            window = 2 * self.concurrency
+
+        pending = set()
+        try:
+            for idx, row in rows:
+                pending.add(asyncio.ensure_future(self._tagged(idx, row, evaluate_row)))
+                if len(pending) >= window:
+                    pending = await self._drain(pending, on_done)
+            while pending:
+                pending = await self._drain(pending, on_done)
+        except BaseException:
+            # cancel the rows still running and collect every outcome, so rows
+            # that failed alongside this one aren't reported as never retrieved
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+    @staticmethod
+    async def _tagged(idx, row, evaluate_row):
+        return idx, await evaluate_row(idx, row)
+
+    @staticmethod
+    async def _drain(pending, on_done):
+        done, still_pending = await asyncio.wait(
+            pending, return_when=asyncio.FIRST_COMPLETED
+        )
+        for future in done:
+            idx, result = future.result()
+            pending.discard(future)
+            if on_done is not None:
+                on_done(idx, result)
+        return still_pending
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        set_inflight_limits(self._previous_limits)
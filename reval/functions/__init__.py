@@ -1,2 +1,12 @@
-from .binary_judge import binary_judge
+from .binary_judge import binary_judge, binary_judge_many
 from .criteria_generator import criteria_generator
+from .cascade import (
+    GradingCascade,
+    CHECKERS,
+    exact_match,
+    normalized_match,
+    regex_match,
+    numeric_match,
+    json_schema_match,
+)
+from .tiered_judge import TieredJudge, grade_confidence
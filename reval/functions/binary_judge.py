@@ -1,20 +1,49 @@
-from reval.language_models import LanguageModel
+import re
 
+from reval.language_models import get_model
+from reval.tracing import span
 
-def binary_judge(task, success_criteria, failure_criteria, model_output):
-    query = f"""You are tasked with grading a language model's output based on a given prompt, success criteria, and failure criteria. Your goal is to provide an objective assessment of how well the model's output meets the specified criteria.
+JUDGE_MODEL = "gpt-4o-mini"
 
-First, review the following information:
 
-Prompt:
-<prompt>
-{task}
-</prompt>
+def judge_model():
+    """The judge LanguageModel, with the "judge" role's generation settings."""
+    return get_model(JUDGE_MODEL, role="judge")
+
+
+def multi_judge_model():
+    # one evaluation per output, so stop after the last rather than the first grade
+    return get_model(JUDGE_MODEL, role="judge", stop=("</evaluations>",))
+
+
+def judge_prompt(task, success_criteria, failure_criteria, model_output):
+    return "".join(
+        judge_prompt_parts(task, success_criteria, failure_criteria, model_output)
+    )
 
-Model Output:
+
+def judge_prompt_parts(task, success_criteria, failure_criteria, model_output):
+    """
+    The judge query as [instructions, task and criteria, model output]. Every
+    query starts with the same instructions, and the queries for one task's
+    outputs also share the task and criteria, so providers can serve both from
+    their prompt cache, see LanguageModel.request_params.
+    """
+    return [
+        _JUDGE_INSTRUCTIONS,
+        _task_block(task, success_criteria, failure_criteria),
+        f"""Model Output:
 <model_output>
 {model_output}
-</model_output>
+</model_output>""",
+    ]
+
+
+def _task_block(task, success_criteria, failure_criteria):
+    return f"""Prompt:
+<prompt>
+{task}
+</prompt>
 
 Success Criteria:
 <success_criteria>
@@ -26,6 +55,13 @@ Failure Criteria:
 {failure_criteria}
 </failure_criteria>
 
+"""
+
+
+_JUDGE_INSTRUCTIONS = """You are tasked with grading a language model's output based on a given prompt, success criteria, and failure criteria. Your goal is to provide an objective assessment of how well the model's output meets the specified criteria.
+
+The prompt, success criteria, failure criteria, and model output are given at the end of this message.
+
 Carefully analyze the model's output in relation to the prompt, success criteria, and failure criteria. Consider how well the output addresses the prompt and meets the success criteria, as well as whether it exhibits any of the failure criteria.
 
 Provide your reasoning for the grade you will assign. Consider both the strengths and weaknesses of the output, and explain how it aligns with or deviates from the given criteria. Be specific and reference parts of the output, success criteria, and failure criteria in your explanation.
@@ -43,9 +79,150 @@ Present your evaluation in the following format:
 </grade>
 </evaluation>
 
-Ensure that your evaluation is impartial, thorough, and based solely on the provided information and criteria."""
+Ensure that your evaluation is impartial, thorough, and based solely on the provided information and criteria.
+
+Now, review the following information:
+
+"""
+
+
+def parse_grade(raw_response):
+    # the judge role's stop sequence leaves off the closing tag
+    return int(raw_response.split("<grade>")[1].split("</grade>")[0])
+
+
+def binary_judge(task, success_criteria, failure_criteria, model_output):
+    with span("judge", model=JUDGE_MODEL):
+        query = judge_prompt_parts(
+            task, success_criteria, failure_criteria, model_output
+        )
+        raw_response = judge_model().get_generation(query)
+        with span("parse"):
+            return parse_grade(raw_response)
+
+
+# batch mode (reval/batch.py) builds and parses the requests itself
+binary_judge.prompt = judge_prompt_parts
+binary_judge.parse = parse_grade
+binary_judge.model_name = JUDGE_MODEL
+binary_judge.language_model = judge_model
+
+
+def multi_judge_prompt(task, success_criteria, failure_criteria, model_outputs):
+    return "".join(
+        multi_judge_prompt_parts(
+            task, success_criteria, failure_criteria, model_outputs
+        )
+    )
+
+
+def multi_judge_prompt_parts(task, success_criteria, failure_criteria, model_outputs):
+    """The multi-output judge query as [instructions, task and criteria, outputs]."""
+    outputs = "\n\n".join(
+        f'<model_output id="{i}">\n{output}\n</model_output>'
+        for i, output in enumerate(model_outputs, 1)
+    )
+    return [
+        _MULTI_JUDGE_INSTRUCTIONS,
+        _task_block(task, success_criteria, failure_criteria),
+        f"""Model Outputs:
+<model_outputs>
+{outputs}
+</model_outputs>""",
+    ]
+
+
+_MULTI_JUDGE_INSTRUCTIONS = """You are tasked with grading several language models' outputs for the same prompt, based on the given success criteria and failure criteria. Your goal is to provide an objective assessment of how well each output meets the specified criteria.
+
+The prompt, success criteria, failure criteria, and model outputs are given at the end of this message.
+
+Grade each output on its own. Do not compare the outputs with each other; judge every output only against the prompt, success criteria, and failure criteria. Consider how well the output addresses the prompt and meets the success criteria, as well as whether it exhibits any of the failure criteria.
+
+For each output, provide your reasoning for the grade you will assign. Consider both the strengths and weaknesses of the output, and explain how it aligns with or deviates from the given criteria. Be specific and reference parts of the output, success criteria, and failure criteria in your explanation.
+
+After providing your reasoning, assign a binary grade, either 0 if the task was unsuccessful or 1 if the task was successful.
+
+Present one evaluation for every output, in order, using the output's id, in the following format:
+
+<evaluations>
+<evaluation id="1">
+<reasoning>
+[Your detailed reasoning for the grade]
+</reasoning>
+<grade>
+[Numerical grade, either 0 or 1]
+</grade>
+</evaluation>
+[One evaluation for each remaining output]
+</evaluations>
+
+Ensure that your evaluation is impartial, thorough, and based solely on the provided information and criteria.
+
+Now, review the following information:
+
+"""
+
+
+_EVALUATION = re.compile(
+    r"<evaluation\s+id\s*=\s*[\"']?(\d+)[\"']?\s*>(.*?)</evaluation>",
+    re.DOTALL | re.IGNORECASE,
+)
+_GRADE = re.compile(r"<grade>\s*([01])\s*</grade>", re.IGNORECASE)
+
+
+def parse_grades(raw_response, num_outputs):
+    """
+    Grades from a multi-output evaluation, in output order. Raises ValueError
+    unless there is exactly one valid 0/1 grade for every output id.
+    """
+    grades = {}
+    for output_id, evaluation in _EVALUATION.findall(raw_response):
+        output_id = int(output_id)
+        grade = _GRADE.findall(evaluation)
+        if len(grade) != 1 or output_id in grades:
+            raise ValueError(f"Malformed evaluation for output {output_id}")
+        grades[output_id] = int(grade[0])
+    if sorted(grades) != list(range(1, num_outputs + 1)):
+        raise ValueError(
+            f"Expected grades for outputs 1-{num_outputs}, got {sorted(grades)}"
+        )
+    return [grades[i] for i in range(1, num_outputs + 1)]
+
+
+def binary_judge_many(task, success_criteria, failure_criteria, model_outputs):
+    """
+    Grade every model's output for a task in one judge call, returning a list of
+    grades in the order of `model_outputs`. If the response can't be parsed into
+    one grade per output, each output is judged on its own with binary_judge.
+    """
+    model_outputs = list(model_outputs)
+    if len(model_outputs) == 1:
+        return [binary_judge(task, success_criteria, failure_criteria, *model_outputs)]
+
+    with span("judge", model=JUDGE_MODEL, outputs=len(model_outputs)) as s:
+        query = multi_judge_prompt_parts(
+            task, success_criteria, failure_criteria, model_outputs
+        )
+        raw_response = multi_judge_model().get_generation(query)
+        try:
+            with span("parse"):
+                return parse_grades(raw_response, len(model_outputs))
+        except ValueError:
+            s.set(fallback=True)
+            return judge_each(task, success_criteria, failure_criteria, model_outputs)
+
+
+def judge_each(task, success_criteria, failure_criteria, model_outputs):
+    return [
+        binary_judge(task, success_criteria, failure_criteria, model_output)
+        for model_output in model_outputs
+    ]
 
-    raw_response = LanguageModel("gpt-4o-mini").get_generation(query)
-    score = int(raw_response.split("<grade>")[1].split("</grade>")[0])
 
-    return score
+# Reval passes all of a task's outputs at once to judges with multi_output set
+binary_judge_many.multi_output = True
+binary_judge_many.prompt = multi_judge_prompt_parts
+binary_judge_many.parse = parse_grades
+binary_judge_many.fallback = judge_each
+binary_judge_many.model_name = JUDGE_MODEL
+binary_judge_many.language_model = multi_judge_model
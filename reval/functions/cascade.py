@@ -0,0 +1,351 @@
+import json
+import math
+import re
+import string
+import threading
+from collections import Counter
+
+from reval.tracing import span
+
+from .binary_judge import binary_judge
+
+# task columns checkers read their references from; any column starting with
+# "reference" is passed on, so custom checkers can add their own
+REFERENCE_PREFIX = "reference"
+
+
+def exact_match(model_output, references):
+    """Pass if the output is exactly `reference`, ignoring surrounding whitespace."""
+    reference = references.get("reference")
+    if reference is None:
+        return None
+    return True if str(model_output).strip() == str(reference).strip() else None
+
+
+def normalized_match(model_output, references):
+    """
+    Pass if the output equals `reference` after case folding and dropping
+    punctuation, articles and extra whitespace, e.g. "Paris." for "paris".
+    """
+    reference = references.get("reference")
+    if reference is None:
+        return None
+    return True if _normalize(model_output) == _normalize(reference) else None
+
+
+def regex_match(model_output, references):
+    """Pass if `reference_regex` matches anywhere in the output, else fail."""
+    pattern = references.get("reference_regex")
+    if pattern is None:
+        return None
+    return re.search(str(pattern), str(model_output)) is not None
+
+
+def numeric_match(model_output, references):
+    """
+    Compare the last number in the output with `reference_number`, within an
+    absolute `reference_tolerance` (default: equal up to float rounding). No
+    verdict if the output has no number.
+    """
+    reference = references.get("reference_number")
+    if reference is None:
+        return None
+    numbers = _NUMBER.findall(str(model_output))
+    if not numbers:
+        return None
+    value = float(numbers[-1].replace(",", ""))
+    tolerance = float(references.get("reference_tolerance", 0.0))
+    return math.isclose(value, float(reference), rel_tol=1e-9, abs_tol=tolerance)
+
+
+def json_schema_match(model_output, references):
+    """
+    Pass if the output (optionally in a ```json fence) is JSON that validates
+    against the JSON Schema in `reference_schema`, else fail. Needs jsonschema.
+    """
+    schema = references.get("reference_schema")
+    if schema is None:
+        return None
+    try:
+        import jsonschema
+    except ImportError as e:
+        raise ImportError(
+            "reference_schema checks need jsonschema: pip install jsonschema"
+        ) from e
+
+    if isinstance(schema, str):
+        schema = json.loads(schema)
+    fenced = _FENCE.search(str(model_output))
+    text = fenced.group(1) if fenced else str(model_output)
+    try:
+        jsonschema.validate(json.loads(text), schema)
+    except (ValueError, jsonschema.ValidationError):
+        # json.JSONDecodeError is a ValueError
+        return False
+    return True
+
+
+# tried in order; the first verdict that isn't None decides
+CHECKERS = [
+    exact_match,
+    normalized_match,
+    regex_match,
+    numeric_match,
+    json_schema_match,
+]
+
+
+class GradingCascade:
+    """
+    A judge that tries cheap deterministic checkers before the LLM judge, for
+    tasks whose answers can be checked mechanically.
+
+    Checkers are functions `(model_output, references) -> True | False | None`,
+    where references are the task's non-empty `reference*` columns, such as
+    `reference` (exact and normalized match), `reference_regex`,
+    `reference_number` with `reference_tolerance`, and `reference_schema` (see
+    CHECKERS). The first checker with a verdict grades the output and `judge` is
+    only called when none has one. Reval hands each frame of tasks to
+    `set_references` before grading it and grades each row with `for_row`, so
+    every row is checked against its own references from the task file. Called
+    directly, pass them as `references=`.
+
+    Works as a single-output, arena and multi-output judge, whichever `judge`
+    is. In arena mode the checkers decide only when exactly one output passes.
+    A multi-output judge gets just the outputs no checker decided. With
+    batch=True, cases the checkers decide are graded right away, and the batch
+    request of the rest (see `batch_request`) covers only the outputs no
+    checker decided.
+
+    `stats` counts graded outputs ("outputs"), outputs graded by each checker
+    (by name), judge calls made ("judge_calls") and judge calls avoided
+    ("judge_calls_avoided"); `report()` adds the judge's own report, if it has
+    one, and Reval writes it next to the results. Reval resets them with
+    `reset_stats()` at the start of every run.
+    """
+
+    def __init__(self, judge=binary_judge, checkers=None):
+        self.judge = judge
+        self.checkers = list(CHECKERS if checkers is None else checkers)
+        self.multi_output = getattr(judge, "multi_output", False)
+        self.stats = Counter()
+        self._references = {}
+        self._lock = threading.Lock()
+        self._batchable = all(
+            hasattr(judge, name) for name in ("prompt", "parse", "model_name")
+        )
+        if self._batchable:
+            # batched through the judge's model, see reval._BatchStage
+            self.model_name = judge.model_name
+            if hasattr(judge, "language_model"):
+                self.language_model = judge.language_model
+
+    def __getstate__(self):
+        # locks don't pickle, e.g. into run_sharded workers
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def set_references(self, tasks):
+        """
+        Take the references of a frame of tasks by row index, replacing the
+        previous ones.
+        """
+        columns = [c for c in tasks.columns if c.startswith(REFERENCE_PREFIX)]
+        references = {}
+        if columns:
+            for idx, values in zip(tasks.index, tasks[columns].itertuples(index=False)):
+                references[idx] = {
+                    column: value
+                    for column, value in zip(columns, values)
+                    if not _missing(value)
+                }
+        self._references = references
+
+    def for_row(self, idx):
+        """The cascade for the task in row `idx`, checking against its references."""
+        return _RowCascade(self, self._references.get(idx, {}))
+
+    def report(self):
+        with self._lock:
+            report = dict(self.stats)
+        if hasattr(self.judge, "report"):
+            report["judge"] = self.judge.report()
+        return report
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = Counter()
+        if hasattr(self.judge, "reset_stats"):
+            self.judge.reset_stats()
+
+    def __call__(
+        self, task, success_criteria, failure_criteria, *model_outputs, references=None
+    ):
+        references = references or {}
+        if self.multi_output:
+            (outputs,) = model_outputs
+            return self._grade_many(
+                task, success_criteria, failure_criteria, outputs, references
+            )
+        verdicts = self._check_all(references, model_outputs)
+        grade = _decision(verdicts)
+        self._count(verdicts, judged=grade is None)
+        if grade is not None:
+            return grade
+        return self.judge(task, success_criteria, failure_criteria, *model_outputs)
+
+    def batch_request(
+        self, task, success_criteria, failure_criteria, *model_outputs, references=None
+    ):
+        """
+        The judge's batch request for the outputs no checker decided, and a
+        function parsing its response into the cascade's grade(s), with the
+        checkers' verdicts merged back in for a multi-output judge. (None, None)
+        when the checkers settle the case or the judge can't be batched, and
+        the cascade should be called instead.
+        """
+        if not self._batchable:
+            return None, None
+        references = references or {}
+        if self.multi_output:
+            (outputs,) = model_outputs
+            outputs = list(outputs)
+            verdicts = self._check_all(references, outputs)
+            todo = [i for i, verdict in enumerate(verdicts) if verdict is None]
+            if not todo:
+                return None, None
+            self._count(verdicts, judged=True)
+            undecided = [outputs[i] for i in todo]
+
+            def parse(raw):
+                try:
+                    judged = self.judge.parse(raw, len(undecided))
+                except ValueError:
+                    # e.g. not one grade per output
+                    judged = getattr(self.judge, "fallback", self.judge)(
+                        task, success_criteria, failure_criteria, undecided
+                    )
+                return _merge(verdicts, todo, judged)
+
+            prompt = self.judge.prompt(
+                task, success_criteria, failure_criteria, undecided
+            )
+            return prompt, parse
+
+        verdicts = self._check_all(references, model_outputs)
+        if _decision(verdicts) is not None:
+            return None, None
+        self._count(verdicts, judged=True)
+
+        def parse(raw):
+            try:
+                return self.judge.parse(raw)
+            except ValueError:
+                return self.judge(
+                    task, success_criteria, failure_criteria, *model_outputs
+                )
+
+        prompt = self.judge.prompt(
+            task, success_criteria, failure_criteria, *model_outputs
+        )
+        return prompt, parse
+
+    def _grade_many(
+        self, task, success_criteria, failure_criteria, outputs, references
+    ):
+        outputs = list(outputs)
+        verdicts = self._check_all(references, outputs)
+        todo = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        self._count(verdicts, judged=bool(todo))
+        judged = []
+        if todo:
+            judged = self.judge(
+                task, success_criteria, failure_criteria, [outputs[i] for i in todo]
+            )
+        return _merge(verdicts, todo, judged)
+
+    def _check_all(self, references, model_outputs):
+        # (checker name, passed) for each output, or None where no checker decided
+        if not references:
+            return [None] * len(model_outputs)
+        verdicts = []
+        for model_output in model_outputs:
+            with span("precheck") as s:
+                verdict = self._check(model_output, references)
+                s.set(checker=None if verdict is None else verdict[0])
+            verdicts.append(verdict)
+        return verdicts
+
+    def _check(self, model_output, references):
+        if _missing(model_output):
+            return None
+        for checker in self.checkers:
+            verdict = checker(model_output, references)
+            if verdict is not None:
+                return checker.__name__, bool(verdict)
+        return None
+
+    def _count(self, verdicts, judged):
+        with self._lock:
+            self.stats["outputs"] += len(verdicts)
+            for verdict in verdicts:
+                if verdict is not None:
+                    self.stats[verdict[0]] += 1
+            self.stats["judge_calls" if judged else "judge_calls_avoided"] += 1
+
+
+class _RowCascade:
+    """A GradingCascade bound to the references of one task row, see for_row."""
+
+    def __init__(self, cascade, references):
+        self.cascade = cascade
+        self.references = references
+        self.multi_output = cascade.multi_output
+        for name in ("model_name", "language_model"):
+            if hasattr(cascade, name):
+                setattr(self, name, getattr(cascade, name))
+
+    def __call__(self, *args):
+        return self.cascade(*args, references=self.references)
+
+    def batch_request(self, *args):
+        return self.cascade.batch_request(*args, references=self.references)
+
+
+def _merge(verdicts, todo, judged):
+    # the checkers' grades, with the judge's for the outputs at positions `todo`
+    grades = [None if verdict is None else int(verdict[1]) for verdict in verdicts]
+    for i, grade in zip(todo, judged):
+        grades[i] = grade
+    return grades
+
+
+def _decision(verdicts):
+    # the grade, or in arena mode the winner, if the checkers settle it
+    if len(verdicts) == 1:
+        (verdict,) = verdicts
+        return None if verdict is None else int(verdict[1])
+    first, second = verdicts
+    if first is None or second is None or first[1] == second[1]:
+        return None
+    return 1 if first[1] else 2
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _normalize(text):
+    text = str(text).casefold().translate(_PUNCTUATION)
+    return " ".join(word for word in text.split() if word not in _ARTICLES)
+
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+_ARTICLES = {"a", "an", "the"}
+_NUMBER = re.compile(r"-?\d[\d,]*(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
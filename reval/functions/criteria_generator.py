@@ -1,16 +1,49 @@
-from reval.language_models import LanguageModel
+import pandas as pd
 
+from reval.language_models import get_model
+from reval.tracing import span
 
-def criteria_generator(
+CRITERIA_MODEL = "gpt-4o-mini"
+
+
+def criteria_model():
+    """The criteria LanguageModel, with the "criteria" role's generation settings."""
+    return get_model(CRITERIA_MODEL, role="criteria")
+
+
+def criteria_prompt(
     task,
     success_criteria=None,
     failure_criteria=None,
     good_example=None,
     bad_example=None,
 ):
+    """Build the criteria query for a task, or None if both criteria are given."""
+    parts = criteria_prompt_parts(
+        task, success_criteria, failure_criteria, good_example, bad_example
+    )
+    return None if parts is None else "".join(parts)
+
+
+def criteria_prompt_parts(
+    task,
+    success_criteria=None,
+    failure_criteria=None,
+    good_example=None,
+    bad_example=None,
+):
+    """
+    The criteria query as [instructions, task]: the fixed instructions come first
+    so providers can cache them as a prefix shared by every task, see
+    LanguageModel.request_params. None if both criteria are given. Missing
+    values (None or NaN, as sparse CSV columns give) count as not given.
+    """
+    success_criteria, failure_criteria, good_example, bad_example = map(
+        _given, (success_criteria, failure_criteria, good_example, bad_example)
+    )
     # if success_crtiera and failure_criteria are provided then we don't need to do anything and we should warn the user
     if success_criteria is not None and failure_criteria is not None:
-        return success_criteria, failure_criteria
+        return None
 
     if (
         good_example is None
@@ -18,17 +51,118 @@ def criteria_generator(
         and success_criteria is None
         and failure_criteria is None
     ):
-        query = f"""You are an AI assistant tasked with generating success and failure criteria for a given task. This will help in evaluating how well other models perform on the task. Here's what you need to do:
+        return [
+            _CRITERIA_INSTRUCTIONS,
+            f"""Here is the task query:
+<task>
+{task}
+</task>""",
+        ]
 
-1. I will provide you with a task description.
-2. Your job is to generate clear, specific, and measurable success and failure criteria for this task.
-3. The criteria should be detailed enough to allow for objective evaluation of task performance.
+    elif bad_example is None and success_criteria is None and failure_criteria is None:
+        return [
+            _EXAMPLE_INSTRUCTIONS.format(examples="a good example", example="example"),
+            f"""Here is the task query:
+<task>
+{task}
+</task>
 
-Here is the task query:
+Here is a good example of completing the task:
+<example>
+{good_example}
+</example>""",
+        ]
+
+    elif good_example is None and success_criteria is None and failure_criteria is None:
+        return [
+            _EXAMPLE_INSTRUCTIONS.format(examples="a bad example", example="example"),
+            f"""Here is the task query:
+<task>
+{task}
+</task>
+
+Here is a bad example of completing the task:
+<example>
+{bad_example}
+</example>""",
+        ]
+
+    elif success_criteria is None and failure_criteria is None:
+        return [
+            _EXAMPLE_INSTRUCTIONS.format(
+                examples="a good and a bad example", example="examples"
+            ),
+            f"""Here is the task query:
 <task>
 {task}
 </task>
 
+Here is a good example of completing the task:
+<example>
+{good_example}
+</example>
+
+Here is a bad example of completing the task:
+<example>
+{bad_example}
+</example>""",
+        ]
+
+    # we can just check for success and failure criteria now
+    if success_criteria is not None:
+        # failure criteria is None
+        return [
+            _FAILURE_INSTRUCTIONS,
+            f"""Here is the task prompt:
+<task_prompt>
+{task}
+</task_prompt>
+
+And here are the success criteria for this task:
+<success_criteria>
+{success_criteria}
+</success_criteria>
+""",
+        ]
+
+    if failure_criteria is not None:
+        return [
+            _SUCCESS_INSTRUCTIONS,
+            f"""Here is the task prompt:
+
+<task_prompt>
+{task}
+</task_prompt>
+
+And here are the failure criteria for this task:
+
+<failure_criteria>
+{failure_criteria}
+</failure_criteria>
+""",
+        ]
+
+    raise ValueError(
+        f"Can't build a criteria query for {task!r} with the criteria and examples given"
+    )
+
+
+def _given(value):
+    # None for a missing value, including the NaN of a sparse CSV column
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value
+
+
+# the fixed part of each criteria query; the task and any examples or criteria
+# it came with follow at the end
+
+_CRITERIA_INSTRUCTIONS = """You are an AI assistant tasked with generating success and failure criteria for a given task. This will help in evaluating how well other models perform on the task. Here's what you need to do:
+
+1. I will provide you with a task description, at the end of this message.
+2. Your job is to generate clear, specific, and measurable success and failure criteria for this task.
+3. The criteria should be detailed enough to allow for objective evaluation of task performance.
+
 To generate the success and failure criteria, follow these steps:
 
 1. Carefully analyze the task description.
@@ -56,92 +190,16 @@ Present your results in the following format:
 </failure_criteria>
 </output>
 
-Ensure that your criteria are specific, measurable, and directly related to the given task. Avoid vague or subjective statements. Each criterion should be a complete sentence that clearly describes a specific aspect of task performance."""
-
-        raw_response = LanguageModel("gpt-4o-mini").get_generation(query)
-        success_criteria = raw_response.split("<success_criteria>")[1].split(
-            "</success_criteria>"
-        )[0]
-        failure_criteria = raw_response.split("<failure_criteria>")[1].split(
-            "</failure_criteria>"
-        )[0]
-
-        return success_criteria, failure_criteria
-
-    elif bad_example is None and success_criteria is None and failure_criteria is None:
-        query = f"""You are an AI assistant tasked with generating success and failure criteria for a given task. This will help in evaluating how well other models perform on the task. You will be provided with a task description and a good example of completing the task.
-
-Here is the task query:
-<task>
-{task}
-</task>
+Ensure that your criteria are specific, measurable, and directly related to the given task. Avoid vague or subjective statements. Each criterion should be a complete sentence that clearly describes a specific aspect of task performance.
 
-Here is a good example of completing the task:
-<example>
-{good_example}
-</example>
-
-Your job is to generate clear, specific, and measurable success and failure criteria for this task. These criteria should help in objectively evaluating the performance of other models on this task.
-
-To generate success criteria:
-1. Analyze the task description and the provided example carefully.
-2. Identify key elements that contribute to successfully completing the task.
-3. Create 3-5 specific, measurable criteria that would indicate a high-quality response to the task.
-4. Ensure that the criteria are directly related to the task objectives and cover different aspects of performance.
-
-To generate failure criteria:
-1. Consider potential ways the task could be misunderstood or poorly executed.
-2. Identify common mistakes or shortcomings that would result in an inadequate response.
-3. Create 3-5 specific, measurable criteria that would indicate a low-quality or incorrect response to the task.
-4. Ensure that the failure criteria are distinct from simply not meeting the success criteria.
-
-Present your response in the following format:
-
-<criteria>
-<success_criteria>
-1. [First success criterion]
-2. [Second success criterion]
-3. [Third success criterion]
-[Additional criteria if necessary]
-</success_criteria>
-
-<failure_criteria>
-1. [First failure criterion]
-2. [Second failure criterion]
-3. [Third failure criterion]
-[Additional criteria if necessary]
-</failure_criteria>
-</criteria>
-
-Ensure that each criterion is clear, specific, and can be objectively measured or observed in a response to the task."""
-
-        raw_response = LanguageModel("gpt-4o-mini")(query)
-        success_criteria = raw_response.split("<success_criteria>")[1].split(
-            "</success_criteria>"
-        )[0]
-        failure_criteria = raw_response.split("<failure_criteria>")[1].split(
-            "</failure_criteria>"
-        )[0]
-
-        return success_criteria, failure_criteria
-
-    elif good_example is None and success_criteria is None and failure_criteria is None:
-        query = f"""You are an AI assistant tasked with generating success and failure criteria for a given task. This will help in evaluating how well other models perform on the task. You will be provided with a task description and a bad example of completing the task.
+"""
 
-Here is the task query:
-<task>
-{task}
-</task>
-
-Here is a bad example of completing the task:
-<example>
-{bad_example}
-</example>
+_EXAMPLE_INSTRUCTIONS = """You are an AI assistant tasked with generating success and failure criteria for a given task. This will help in evaluating how well other models perform on the task. You will be provided with a task description and {examples} of completing the task, at the end of this message.
 
 Your job is to generate clear, specific, and measurable success and failure criteria for this task. These criteria should help in objectively evaluating the performance of other models on this task.
 
 To generate success criteria:
-1. Analyze the task description and the provided example carefully.
+1. Analyze the task description and the provided {example} carefully.
 2. Identify key elements that contribute to successfully completing the task.
 3. Create 3-5 specific, measurable criteria that would indicate a high-quality response to the task.
 4. Ensure that the criteria are directly related to the task objectives and cover different aspects of performance.
@@ -170,34 +228,13 @@ Present your response in the following format:
 </failure_criteria>
 </criteria>
 
-Ensure that each criterion is clear, specific, and can be objectively measured or observed in a response to the task."""
-
-        raw_response = LanguageModel("gpt-4o-mini")(query)
-        success_criteria = raw_response.split("<success_criteria>")[1].split(
-            "</success_criteria>"
-        )[0]
-        failure_criteria = raw_response.split("<failure_criteria>")[1].split(
-            "</failure_criteria>"
-        )[0]
+Ensure that each criterion is clear, specific, and can be objectively measured or observed in a response to the task.
 
-        return success_criteria, failure_criteria
-
-    # we can just check for success and failure criteria now
-    if success_criteria is not None:
-        # failure criteria is None
-        query = f"""You are an AI assistant tasked with generating failure criteria for a given task or prompt. These failure criteria will be used to evaluate how well other AI models perform when responding to the prompt. Your goal is to create a set of specific, measurable criteria that indicate when a response fails to meet the task's objectives or violates important principles.
-
-Here is the task prompt:
-<task_prompt>
-{task}
-</task_prompt>
+"""
 
-And here are the success criteria for this task:
-<success_criteria>
-{success_criteria}
-</success_criteria>
+_FAILURE_INSTRUCTIONS = """You are an AI assistant tasked with generating failure criteria for a given task or prompt. These failure criteria will be used to evaluate how well other AI models perform when responding to the prompt. Your goal is to create a set of specific, measurable criteria that indicate when a response fails to meet the task's objectives or violates important principles.
 
-Your job is to generate a set of failure criteria that complement the success criteria. These failure criteria should identify specific ways in which a response could fall short of the task's requirements or expectations.
+You will be given the task prompt and its success criteria at the end of this message. Your job is to generate a set of failure criteria that complement the success criteria. These failure criteria should identify specific ways in which a response could fall short of the task's requirements or expectations.
 
 To generate effective failure criteria:
 
@@ -221,28 +258,10 @@ Present your criteria in the following format:
 <failure_criteria>
 [failure_criteria]
 </failure_criteria>
-"""
-
-        raw_response = LanguageModel("gpt-4o-mini")(query)
-        failure_criteria = raw_response.split("<failure_criteria>")[1].split(
-            "</failure_criteria>"
-        )[0]
-        return success_criteria, failure_criteria
-
-    if failure_criteria is not None:
-        query = f"""You are tasked with creating success criteria for a given task based on its prompt and failure criteria. These success criteria will be used to evaluate how well other AI models perform in response to the task prompt.
-
-First, carefully review the following task prompt:
-
-<task_prompt>
-{task}
-</task_prompt>
 
-Now, consider the failure criteria for this task:
+"""
 
-<failure_criteria>
-{failure_criteria}
-</failure_criteria>
+_SUCCESS_INSTRUCTIONS = """You are tasked with creating success criteria for a given task based on its prompt and failure criteria. These success criteria will be used to evaluate how well other AI models perform in response to the task prompt. The task prompt and its failure criteria are given at the end of this message.
 
 Your goal is to create a set of success criteria that complement and expand upon the failure criteria. Success criteria should:
 
@@ -270,10 +289,56 @@ Format your response as follows:
 
 [Continue with additional criteria as needed]
 </success_criteria>
+
 """
 
-        raw_response = LanguageModel("gpt-4o-mini")(query)
-        success_criteria = raw_response.split("<success_criteria>")[1].split(
-            "</success_criteria>"
-        )[0]
+
+def parse_criteria(raw_response, success_criteria=None, failure_criteria=None):
+    """
+    Pull whichever criteria were missing out of a criteria response. Raises
+    ValueError if one of them isn't in it.
+    """
+    success_criteria, failure_criteria = map(
+        _given, (success_criteria, failure_criteria)
+    )
+    if success_criteria is None:
+        success_criteria = _between(raw_response, "success_criteria")
+    if failure_criteria is None:
+        failure_criteria = _between(raw_response, "failure_criteria")
+    return success_criteria, failure_criteria
+
+
+def _between(raw_response, tag):
+    parts = raw_response.split(f"<{tag}>")
+    if len(parts) < 2:
+        raise ValueError(f"No <{tag}> in the criteria response")
+    return parts[1].split(f"</{tag}>")[0]
+
+
+def criteria_generator(
+    task,
+    success_criteria=None,
+    failure_criteria=None,
+    good_example=None,
+    bad_example=None,
+):
+    success_criteria, failure_criteria = map(
+        _given, (success_criteria, failure_criteria)
+    )
+    query = criteria_prompt_parts(
+        task, success_criteria, failure_criteria, good_example, bad_example
+    )
+    if query is None:
         return success_criteria, failure_criteria
+
+    with span("criteria", model=CRITERIA_MODEL):
+        raw_response = criteria_model().get_generation(query)
+        with span("parse"):
+            return parse_criteria(raw_response, success_criteria, failure_criteria)
+
+
+# batch mode (reval/batch.py) builds and parses the requests itself
+criteria_generator.prompt = criteria_prompt_parts
+criteria_generator.parse = parse_criteria
+criteria_generator.model_name = CRITERIA_MODEL
+criteria_generator.language_model = criteria_model
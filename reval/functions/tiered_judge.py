@@ -0,0 +1,170 @@
+import math
+import random
+import threading
+from collections import Counter
+
+from reval.language_models import LOGPROB_PROVIDERS, get_model
+from reval.tracing import span
+
+from .binary_judge import JUDGE_MODEL, judge_prompt_parts, parse_grade
+
+STRONG_JUDGE_MODEL = "gpt-4o"
+
+
+def grade_confidence(logprobs, grade):
+    """
+    The probability of `grade` at the grade token, from (token, logprob,
+    {alternative: logprob}) entries, normalized over the 0 and 1 alternatives.
+    0.0 if there is no grade token.
+    """
+    text = ""
+    for token, _, alternatives in logprobs:
+        if token.strip() in ("0", "1") and text.rstrip().endswith("<grade>"):
+            p = {"0": 0.0, "1": 0.0}
+            for alternative, logprob in alternatives.items():
+                if alternative.strip() in p:
+                    p[alternative.strip()] += math.exp(logprob)
+            total = p["0"] + p["1"]
+            return p[str(grade)] / total if total else 0.0
+        text += token
+    return 0.0
+
+
+class TieredJudge:
+    """
+    A binary judge that grades with a cheap model first and sends only the
+    outputs it is unsure about to a strong model.
+
+    The cheap model's confidence is the probability of its grade token where
+    its provider returns log probabilities (see LOGPROB_PROVIDERS), and
+    otherwise the share of `samples` temperature 1 samples that agree, sampling
+    stopping at the first disagreement. Grades with a confidence of at least
+    `threshold` are accepted; the rest, and any the cheap model doesn't grade
+    in the expected format, are judged again by the strong model, whose grade
+    is used. Both use the "judge" role's settings, see ROLE_PARAMS.
+
+    With `audit_rate`, that fraction of accepted grades is also sent to the
+    strong model, to measure how often the accepted grades are right.
+
+    `stats` counts calls per tier, accepted, escalated and audited outputs, and
+    agreements with the strong model; `report()` summarizes them, and Reval
+    writes it next to the results. Reval resets them with `reset_stats()` at
+    the start of every run.
+    """
+
+    def __init__(
+        self,
+        cheap_model=JUDGE_MODEL,
+        strong_model=STRONG_JUDGE_MODEL,
+        threshold=0.9,
+        samples=3,
+        audit_rate=0.0,
+        seed=0,
+    ):
+        self.cheap_model = cheap_model
+        self.strong_model = strong_model
+        self.threshold = threshold
+        self.samples = samples
+        self.audit_rate = audit_rate
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks don't pickle, e.g. into run_sharded workers
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __call__(self, task, success_criteria, failure_criteria, model_output):
+        query = judge_prompt_parts(
+            task, success_criteria, failure_criteria, model_output
+        )
+        with span("judge", model=self.cheap_model, tier="cheap") as s:
+            grade, confidence = self.cheap_grade(query)
+            s.set(confidence=confidence)
+
+        confident = grade is not None and confidence >= self.threshold
+        with self._lock:
+            audit = confident and self._rng.random() < self.audit_rate
+            if confident and not audit:
+                self.stats["accepted"] += 1
+                return grade
+            self.stats["audited" if audit else "escalated"] += 1
+
+        with span("judge", model=self.strong_model, tier="strong"):
+            model = get_model(self.strong_model, role="judge")
+            strong_grade = parse_grade(model.get_generation(query))
+        with self._lock:
+            self.stats["strong_calls"] += 1
+            if grade is not None and grade == strong_grade:
+                self.stats["audit_agreed" if audit else "escalated_agreed"] += 1
+        return strong_grade
+
+    def cheap_grade(self, query):
+        """The cheap model's grade for a judge query, or None, and its confidence."""
+        model = get_model(self.cheap_model, role="judge")
+        if model.model_provider in LOGPROB_PROVIDERS:
+            text, logprobs = model.generate_with_logprobs(query)
+            self._count("cheap_calls")
+            grade = _parse(text)
+            if grade is None:
+                return None, 0.0
+            return grade, grade_confidence(logprobs, grade)
+
+        # without cache, or every sample would be the first one again
+        model = get_model(self.cheap_model, role="judge", temperature=1, cache=False)
+        grades = []
+        for _ in range(self.samples):
+            grades.append(_parse(model.get_generation(query)))
+            self._count("cheap_calls")
+            if None in grades or len(set(grades)) > 1:
+                break
+        if None in grades:
+            return None, 0.0
+        grade = max(set(grades), key=grades.count)
+        return grade, grades.count(grade) / self.samples
+
+    def report(self):
+        """
+        Calls per tier, accepted, escalated and audited outputs, and how often
+        the cheap model agreed with the strong one on escalated and audited
+        outputs (None if there were none).
+        """
+        with self._lock:
+            stats = Counter(self.stats)
+        graded = stats["accepted"] + stats["escalated"] + stats["audited"]
+        return {
+            "outputs": graded,
+            "cheap_calls": stats["cheap_calls"],
+            "strong_calls": stats["strong_calls"],
+            "accepted": stats["accepted"],
+            "escalated": stats["escalated"],
+            "audited": stats["audited"],
+            "escalated_agreement": _rate(stats["escalated_agreed"], stats["escalated"]),
+            "audit_agreement": _rate(stats["audit_agreed"], stats["audited"]),
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = Counter()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+def _parse(text):
+    try:
+        grade = parse_grade(text)
+    except (IndexError, ValueError):
+        return None
+    return grade if grade in (0, 1) else None
+
+
+def _rate(count, total):
+    return count / total if total else None
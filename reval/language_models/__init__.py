@@ -1 +1,16 @@
-from .language_models import LanguageModel
+from .language_models import (
+    LanguageModel,
+    get_model,
+    enable_cache,
+    disable_cache,
+    set_rate_limiter,
+    set_role_params,
+    GENERATION_METRICS,
+    ROLE_PARAMS,
+    LOGPROB_PROVIDERS,
+    MULTI_SAMPLE_PROVIDERS,
+)
+from .cache import ResponseCache
+from .clients import get_client, register_provider, set_pool_size
+from .rate_limit import RateLimiter, TokenBucket, set_inflight_limits
+from .fake import FakeClient, configure_fake_provider, lognormal_latency
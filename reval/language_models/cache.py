@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    On-disk cache of model responses, stored in a single SQLite file.
+
+    Entries are keyed by a hash of everything that determines a response
+    (provider, resolved model id, system prompt, prompt, max_tokens, temperature),
+    so any change to a prompt simply misses. Least recently used entries are
+    evicted once the cache grows past `max_size_bytes`, and entries older than
+    `max_age` seconds are treated as misses and dropped.
+
+    Args:
+        path (str): Location of the SQLite file.
+        max_size_bytes (int): Optional cap on the total size of cached responses.
+        max_age (float): Optional maximum age of an entry, in seconds.
+        read_only (bool): Serve hits but never write, update or evict anything.
+    """
+
+    def __init__(
+        self,
+        path="reval_cache.sqlite",
+        max_size_bytes=None,
+        max_age=None,
+        read_only=False,
+    ):
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.max_age = max_age
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if read_only:
+            self._db = sqlite3.connect(
+                f"file:{os.path.abspath(path)}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            for column in ("accessed_at", "created_at"):
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS responses_{column} "
+                    f"ON responses ({column})"
+                )
+            self._db.commit()
+
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    @staticmethod
+    def key(
+        provider,
+        model,
+        system_prompt,
+        prompt,
+        max_tokens,
+        temperature,
+        stop=None,
+        n=None,
+    ):
+        fields = [provider, model, system_prompt, prompt, max_tokens, temperature]
+        if stop is not None:
+            # only when set, so entries written before stop sequences still match
+            fields.append(list(stop))
+        if n is not None:
+            # several samples, cached together as a JSON list
+            fields.append({"n": n})
+        payload = json.dumps(fields, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and self._expired(row[1], now):
+                if not self.read_only:
+                    self._drop(
+                        "DELETE FROM responses WHERE key = ? RETURNING size", (key,)
+                    )
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if not self.read_only:
+                self._db.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                self._db.commit()
+            return row[0]
+
+    def put(self, key, response):
+        if self.read_only:
+            return
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+            self._evict(now)
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "size_bytes": self._size,
+        }
+
+    def clear(self):
+        if self.read_only:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _expired(self, created_at, now):
+        return self.max_age is not None and now - created_at > self.max_age
+
+    def _drop(self, query, params):
+        sizes = self._db.execute(query, params).fetchall()
+        self._size -= sum(size for (size,) in sizes)
+        return len(sizes)
+
+    def _evict(self, now):
+        if self.max_age is not None:
+            self._drop(
+                "DELETE FROM responses WHERE created_at < ? RETURNING size",
+                (now - self.max_age,),
+            )
+
+        if self.max_size_bytes is None or self._size <= self.max_size_bytes:
+            return
+
+        # evict down to 90% of the cap so we don't evict again on the next put,
+        # least recently used first and no more than that takes
+        excess = self._size - int(self.max_size_bytes * 0.9)
+        victims = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ):
+            if excess <= 0:
+                break
+            victims.append(key)
+            excess -= size
+        # stay under SQLite's limit on bound parameters
+        for start in range(0, len(victims), 500):
+            part = victims[start : start + 500]
+            self._drop(
+                "DELETE FROM responses WHERE key IN "
+                f"({','.join('?' * len(part))}) RETURNING size",
+                part,
+            )
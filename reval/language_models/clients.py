@@ -0,0 +1,92 @@
+import importlib
+import os
+import threading
+
+from .fake import get_fake_client
+
+# provider -> (sdk module, client class name, env var holding the api key). The
+# SDKs are only imported when a provider is first used, so `import reval`
+# doesn't pay for all of them and only the SDKs a run uses need be installed.
+_PROVIDERS = {
+    "openai": ("openai", "OpenAI", "OPENAI_API_KEY"),
+    "claude": ("anthropic", "Anthropic", "ANTHROPIC_API_KEY"),
+    "together": ("together", "Together", "TOGETHER_API_KEY"),
+}
+
+# one client per (provider, credentials, endpoint), shared by every LanguageModel
+# in the process so that keep-alive connections are reused across calls
+_clients = {}
+_clients_lock = threading.Lock()
+_pool_size = 100
+
+
+def set_pool_size(max_connections):
+    """
+    Set the maximum number of pooled HTTP connections per client.
+
+    Only affects LanguageModels created afterwards, so call this before building
+    the models for a run.
+    """
+    global _pool_size
+    with _clients_lock:
+        _pool_size = max_connections
+        _clients.clear()
+
+
+def register_provider(provider, module, client_class, api_key_env):
+    """
+    Add a provider whose SDK client, `module.client_class`, takes the same
+    constructor arguments as openai.OpenAI. The module is imported on first use.
+    """
+    _PROVIDERS[provider] = (module, client_class, api_key_env)
+
+
+def load_sdk(provider):
+    """Import and return the SDK module of `provider`."""
+    module = _PROVIDERS[provider][0]
+    try:
+        return importlib.import_module(module)
+    except ImportError as error:
+        raise ImportError(
+            f"The {provider} provider needs the {module} package "
+            f"(pip install {module})"
+        ) from error
+
+
+def get_client(provider, api_key=None, base_url=None):
+    if provider == "fake":
+        # in-process simulated provider, see fake.py
+        return get_fake_client()
+    if provider not in _PROVIDERS:
+        raise NameError(f"Provider {provider} not recognized")
+    _, client_class, api_key_env = _PROVIDERS[provider]
+    if api_key is None:
+        api_key = os.getenv(api_key_env)
+
+    key = (provider, api_key, base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            import httpx
+
+            sdk = load_sdk(provider)
+            http_client = sdk.DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=_pool_size,
+                    max_keepalive_connections=_pool_size,
+                )
+            )
+            # retries are handled by the RateLimiter, which knows about every
+            # request to the provider rather than just this one
+            client = getattr(sdk, client_class)(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=http_client,
+                max_retries=0,
+            )
+            _clients[key] = client
+        return client
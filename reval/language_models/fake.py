@@ -0,0 +1,321 @@
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from .rate_limit import estimate_tokens
+
+# LanguageModel names starting with this prefix are served by the fake provider,
+# e.g. LanguageModel("fake:model-a")
+FAKE_PREFIX = "fake:"
+
+
+def lognormal_latency(median, sigma=0.5):
+    """A latency distribution for FakeClient: lognormal seconds around `median`."""
+
+    def latency(rng):
+        return median * rng.lognormvariate(0, sigma)
+
+    return latency
+
+
+class FakeProviderError(Exception):
+    """An error response from the fake provider, shaped like the SDK errors."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"Fake provider returned {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FakeClient:
+    """
+    An in-process stand-in for a provider client, with the OpenAI chat
+    completions interface LanguageModel uses, so the whole pipeline can run
+    offline and without keys.
+
+    Responses are a deterministic function of the prompt: judge prompts get a
+    well-formed `<evaluation>` (one per `<model_output id=...>` for multi-output
+    prompts) with a grade drawn from a hash of the prompt, criteria prompts get
+    `<success_criteria>`/`<failure_criteria>` blocks, and anything else gets
+    `output_tokens` words of filler. Pass `respond(prompt) -> str` to override.
+
+    Every grade also has a confidence drawn from the hash, between 0.5 and 1:
+    with `logprobs=True` it is the probability of the grade token (the other
+    grade gets the rest), and at a temperature above 0 the grade is sampled,
+    flipping with probability 1 - confidence. With `n`, the response has `n`
+    choices, the later ones answering variants of the prompt.
+
+    Latency, errors, 429s and sampled grades are drawn from a generator seeded
+    with `seed`, so they repeat exactly for a sequential run. With `requests_per_minute` the
+    client also enforces that limit like a real provider, answering excess
+    requests with 429s and reporting the limit in x-ratelimit headers.
+
+    Args:
+        latency (float | Callable): Seconds per request, or a function of a
+            random.Random returning them, e.g. lognormal_latency(0.5).
+        error_rate (float): Fraction of requests that fail with a 500.
+        rate_limit_rate (float): Fraction of requests that fail with a 429
+            regardless of load.
+        retry_after (float): Seconds sent in the retry-after-ms header of those.
+        requests_per_minute (float): Optional request limit to enforce.
+        pass_rate (float): Fraction of judge grades that are 1.
+        output_tokens (int): Length of generated answers, in words.
+        respond (Callable[[str], str]): Optional response function.
+        seed (int): Seed for latency and error draws.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        retry_after=None,
+        requests_per_minute=None,
+        pass_rate=0.5,
+        output_tokens=50,
+        respond=None,
+        seed=0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.requests_per_minute = requests_per_minute
+        self._allowance = (
+            0.0 if requests_per_minute is None else requests_per_minute / 60
+        )
+        self._updated = time.monotonic()
+        self.pass_rate = pass_rate
+        self.output_tokens = output_tokens
+        self.respond = respond or self.canned_response
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(
+                with_raw_response=SimpleNamespace(create=self._create)
+            )
+        )
+
+    def canned_response(self, prompt):
+        ids = _OUTPUT_ID.findall(prompt)
+        if ids:
+            evaluations = "".join(
+                f'<evaluation id="{i}"><reasoning>{self._reasoning}</reasoning>'
+                f"<grade>{self._grade(prompt, i)}</grade></evaluation>\n"
+                for i in ids
+            )
+            return f"<evaluations>\n{evaluations}</evaluations>"
+        if "<grade>" in prompt:
+            return (
+                f"<evaluation>\n<reasoning>{self._reasoning}</reasoning>\n"
+                f"<grade>{self._grade(prompt)}</grade>\n</evaluation>"
+            )
+        if "<success_criteria>" in prompt or "<failure_criteria>" in prompt:
+            return (
+                "<success_criteria>\n1. The response completes the task.\n"
+                "</success_criteria>\n<failure_criteria>\n1. The response "
+                "ignores the task.\n</failure_criteria>"
+            )
+        digest = _digest(prompt)
+        return " ".join(
+            f"word{digest[i % len(digest)]}" for i in range(self.output_tokens)
+        )
+
+    _reasoning = "The output was checked against the criteria."
+
+    def _grade(self, prompt, output_id=""):
+        digest = _digest(f"{prompt}\0{output_id}")
+        return int(int.from_bytes(digest[:4], "big") / 2**32 < self.pass_rate)
+
+    def _create(
+        self,
+        model,
+        messages,
+        stream=False,
+        stream_options=None,
+        stop=None,
+        temperature=1,
+        logprobs=False,
+        top_logprobs=None,
+        n=None,
+        **params,
+    ):
+        with self._lock:
+            self.requests += 1
+            latency = self.latency
+            if callable(latency):
+                latency = latency(self._rng)
+            draw = self._rng.random()
+            wait = self._admit()
+            headers = self._rate_limit_headers()
+
+        if wait is not None:
+            with self._lock:
+                self.rate_limited += 1
+            headers["retry-after-ms"] = str(int(wait * 1000))
+            raise FakeProviderError(429, headers)
+        if latency:
+            time.sleep(latency)
+        if draw < self.rate_limit_rate:
+            with self._lock:
+                self.rate_limited += 1
+            if self.retry_after is not None:
+                headers["retry-after-ms"] = str(int(self.retry_after * 1000))
+            raise FakeProviderError(429, headers)
+        if draw < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise FakeProviderError(500, headers)
+
+        prompt = messages[-1]["content"]
+        texts = []
+        for i in range(n or 1):
+            # further samples answer a variant of the prompt, so they differ
+            text = self.respond(prompt if i == 0 else f"{prompt}\0sample {i}")
+            if temperature:
+                with self._lock:
+                    text = _GRADE.sub(
+                        lambda match: self._sample_grade(prompt, match), text
+                    )
+            for sequence in stop or ():
+                # like providers, end the text before the first stop sequence
+                text = text.split(sequence, 1)[0]
+            texts.append(text)
+        text = texts[0]
+        usage = SimpleNamespace(
+            prompt_tokens=sum(estimate_tokens(m["content"]) for m in messages),
+            completion_tokens=sum(estimate_tokens(text) for text in texts),
+        )
+        if stream:
+            include_usage = (stream_options or {}).get("include_usage")
+            stream = _FakeStream(text, usage if include_usage else None)
+            return _FakeRaw(stream, headers)
+        choices = [
+            SimpleNamespace(message=SimpleNamespace(content=text)) for text in texts
+        ]
+        if logprobs:
+            choices[0].logprobs = SimpleNamespace(content=self._logprobs(prompt, text))
+        completion = SimpleNamespace(choices=choices, usage=usage)
+        return _FakeRaw(completion, headers)
+
+    def confidence(self, prompt, grade_number=0):
+        """The probability of the `grade_number`th grade in the response to `prompt`."""
+        digest = _digest(f"{prompt}\0confidence\0{grade_number}")
+        return 0.5 + 0.5 * int.from_bytes(digest[:4], "big") / 2**32
+
+    def _sample_grade(self, prompt, match):
+        grade = int(match.group(1))
+        number = match.string.count("<grade>", 0, match.start())
+        if self._rng.random() >= self.confidence(prompt, number):
+            grade = 1 - grade
+        return f"<grade>{grade}"
+
+    def _logprobs(self, prompt, text):
+        entries = []
+        grades = 0
+        tokens = _TOKEN.findall(text)
+        for i, token in enumerate(tokens):
+            top = {token: 0.0}
+            if token in ("0", "1") and i and tokens[i - 1] == "<grade>":
+                # as sampled, the most likely token isn't always the one chosen
+                p = self.confidence(prompt, grades)
+                grades += 1
+                other = str(1 - int(token))
+                top = {token: math.log(p), other: math.log1p(-p)}
+            entry = SimpleNamespace(
+                token=token,
+                logprob=top[token],
+                top_logprobs=[
+                    SimpleNamespace(token=alternative, logprob=logprob)
+                    for alternative, logprob in top.items()
+                ],
+            )
+            entries.append(entry)
+        return entries
+
+    def _admit(self):
+        # None if the request is within requests_per_minute, else the seconds
+        # until it would be; a token bucket with a one second burst
+        if self.requests_per_minute is None:
+            return None
+        per_second = self.requests_per_minute / 60
+        now = time.monotonic()
+        self._allowance = min(
+            per_second, self._allowance + (now - self._updated) * per_second
+        )
+        self._updated = now
+        if self._allowance >= 1:
+            self._allowance -= 1
+            return None
+        return (1 - self._allowance) / per_second
+
+    def _rate_limit_headers(self):
+        if self.requests_per_minute is None:
+            return {}
+        return {
+            "x-ratelimit-limit-requests": str(self.requests_per_minute),
+            "x-ratelimit-remaining-requests": str(int(self._allowance)),
+        }
+
+
+class _FakeRaw:
+    # the with_raw_response wrapper: headers plus parse()
+
+    def __init__(self, parsed, headers):
+        self._parsed = parsed
+        self.headers = headers
+
+    def parse(self):
+        return self._parsed
+
+
+class _FakeStream:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage = usage
+
+    def __iter__(self):
+        for piece in re.findall(r"\S+\s*", self.text):
+            delta = SimpleNamespace(content=piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        if self.usage is not None:
+            yield SimpleNamespace(choices=[], usage=self.usage)
+
+    def close(self):
+        pass
+
+
+_OUTPUT_ID = re.compile(r'<model_output id="(\d+)">')
+_GRADE = re.compile(r"<grade>([01])")
+_TOKEN = re.compile(r"<[^<>]*>|\w+|\s+|[^\w\s]")
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+# the client every fake: model uses, replaced by configure_fake_provider()
+_fake_client = FakeClient()
+
+
+def configure_fake_provider(**kwargs):
+    """
+    Replace the fake provider with a new FakeClient(**kwargs) and return it.
+
+    Affects LanguageModels created afterwards, as the client is picked when the
+    model is built.
+    """
+    global _fake_client
+    _fake_client = FakeClient(**kwargs)
+    return _fake_client
+
+
+def get_fake_client():
+    return _fake_client
@@ -1,12 +1,166 @@
-from anthropic import Anthropic
-from openai import OpenAI
-from together import Together
-import os
+import json
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from ..tracing import estimate_cost, span
+from .cache import ResponseCache
+from .clients import get_client
+from .fake import FAKE_PREFIX
+from .rate_limit import RateLimiter, estimate_tokens, inflight_slot
+
+# process-wide scheduler for provider calls: rate limits, adaptive backoff and
+# retries of transient errors. set_rate_limiter(None) turns it off.
+_rate_limiter = RateLimiter()
+
+
+def set_rate_limiter(limiter):
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+# process-wide response cache used by every LanguageModel that doesn't set its own,
+# which is how binary_judge and criteria_generator pick it up
+_default_cache = None
+
+
+def enable_cache(path="reval_cache.sqlite", **kwargs):
+    """
+    Turn on the on-disk response cache for every LanguageModel in the process.
+
+    Keyword arguments are passed to ResponseCache (max_size_bytes, max_age,
+    read_only). Returns the cache so hit/miss counters can be inspected.
+    """
+    global _default_cache
+    disable_cache()
+    _default_cache = ResponseCache(path, **kwargs)
+    return _default_cache
+
+
+def disable_cache():
+    global _default_cache
+    if _default_cache is not None:
+        _default_cache.close()
+    _default_cache = None
+
+
+# generation settings by role, used by get_model(..., role=...). Candidates keep
+# LanguageModel's defaults; a judge writes one reasoning paragraph and a grade,
+# so its output is capped and cut at the closing grade tag, and both judges and
+# criteria generation run at temperature 0 so repeated calls agree.
+ROLE_PARAMS = {
+    "candidate": {},
+    "judge": {"max_tokens": 1024, "temperature": 0, "stop": ("</grade>",)},
+    "criteria": {"max_tokens": 2048, "temperature": 0},
+}
+
+
+def set_role_params(role, **params):
+    """
+    Set LanguageModel keyword arguments (max_tokens, temperature, stop, ...) for
+    a role, on top of its current ones. Models that get_model builds for the role
+    afterwards use them.
+    """
+    ROLE_PARAMS[role] = {**ROLE_PARAMS.get(role, {}), **params}
+
+
+# LanguageModel instances handed out by get_model, so helpers like binary_judge
+# don't rebuild a model on every call
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(model_name, role=None, **kwargs):
+    """
+    Return a shared LanguageModel for `model_name`, creating it on first use.
+
+    Keyword arguments are passed to LanguageModel and are part of the lookup key.
+    With `role` ("candidate", "judge" or "criteria"), the role's ROLE_PARAMS are
+    used for any that aren't given.
+    """
+    if role is not None:
+        if role not in ROLE_PARAMS:
+            raise ValueError(
+                f"Unknown role {role!r}, expected one of {list(ROLE_PARAMS)}"
+            )
+        kwargs = {**ROLE_PARAMS[role], **kwargs}
+    if kwargs.get("stop") is not None:
+        # part of the lookup key, so it has to be hashable
+        kwargs["stop"] = tuple(kwargs["stop"])
+    key = (model_name, tuple(sorted(kwargs.items())))
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = LanguageModel(model_name, **kwargs)
+                _models[key] = model
+    return model
+
+
+# columns of the record returned by LanguageModel.generate_with_metrics
+GENERATION_METRICS = (
+    "ttft_ms",
+    "latency_ms",
+    "output_tokens",
+    "tokens_per_s",
+    "retries",
+)
+
+# one provider response: its text, input, output and cached input token counts,
+# the perf_counter times at which the request started, the first token arrived
+# and it finished, and the token log probabilities and all sampled texts if
+# they were asked for
+_Response = namedtuple(
+    "_Response",
+    "text input_tokens output_tokens cached_tokens started first_token finished "
+    "stopped_early logprobs samples",
+    defaults=(None, None),
+)
+
+# providers whose models can return token log probabilities
+LOGPROB_PROVIDERS = ("openai", "together", "fake")
+
+# providers that can return several samples for one request (the `n` parameter)
+MULTI_SAMPLE_PROVIDERS = ("openai", "together", "fake")
+
+
+def prompt_text(prompt):
+    """
+    The text of a prompt, which is either a string or a list of parts: a prefix
+    that is the same across many calls, such as fixed instructions, followed by
+    the parts that vary. See LanguageModel.request_params.
+    """
+    return prompt if isinstance(prompt, str) else "".join(prompt)
 
 
 class LanguageModel:
-    def __init__(self, model_name, name=None, system_prompt=None):
+    def __init__(
+        self,
+        model_name,
+        name=None,
+        system_prompt=None,
+        max_tokens=4096,
+        temperature=1,
+        cache=None,
+        api_key=None,
+        base_url=None,
+        stream=False,
+        stop=None,
+    ):
         self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        # stop sequences: the provider ends the generation before the first of
+        # them, and a streamed one is no longer read once one has arrived
+        self.stop = None if stop is None else tuple(stop)
+        # a ResponseCache; falls back to the one set with enable_cache(), and
+        # False turns caching off for this model
+        self.cache = cache
+        # stream responses, which measures time-to-first-token and allows
+        # stopping a generation early
+        self.stream = stream
         claude_disambiguations = {
             "claude-3-haiku": "claude-3-haiku-20240307",
             "claude-3-sonnet": "claude-3-sonnet-20240307",
@@ -19,100 +173,466 @@ class LanguageModel:
             self.name = name
 
         # get model_provider
-        if "/" in model_name:
+        if model_name.startswith(FAKE_PREFIX):
+            self.model_provider = "fake"
+            self.model = model_name[len(FAKE_PREFIX) :]
+        elif "/" in model_name:
             self.model_provider = "together"
             self.model = model_name
-            self.client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
         elif "claude" in model_name:
             self.model_provider = "claude"
             if model_name in claude_disambiguations:
                 self.model = claude_disambiguations[model_name]
             else:
                 self.model = model_name
-            self.client = Anthropic()
         elif "gpt" in model_name:
             self.model_provider = "openai"
             self.model = model_name
-            self.client = OpenAI()
         else:
             raise (NameError(f"Model {model_name} not recognized"))
 
-    def get_generation(self, prompt) -> str:
-        if self.system_prompt is not None:
-            if self.model_provider == "claude":
-                return (
-                    self.client.messages.create(
-                        model=self.model,
-                        system_prompt=self.system_prompt,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=4096,
-                        temperature=1,
-                    )
-                    .content[0]
-                    .text
-                )
-            elif self.model_provider == "openai":
-                return (
-                    self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": prompt},
-                        ],
-                        max_tokens=4096,
-                        temperature=1,
-                    )
-                    .choices[0]
-                    .message.content
+        # clients are shared per provider and credentials, see clients.py
+        self._client_args = (api_key, base_url)
+        self.client = get_client(self.model_provider, api_key, base_url)
+
+    def __getstate__(self):
+        # clients hold sockets and locks; a copy in another process (such as a
+        # shard worker, see sharding.py) gets that process's shared client
+        state = self.__dict__.copy()
+        del state["client"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.client = get_client(self.model_provider, *self._client_args)
+
+    def get_generation(self, prompt, stop_when=None) -> str:
+        # prompt is a string or a list of parts, see prompt_text
+        return self.generate_with_metrics(prompt, stop_when)[0]
+
+    def generate_with_metrics(self, prompt, stop_when=None):
+        """
+        Return (text, metrics) for `prompt`, where metrics has the keys in
+        GENERATION_METRICS:
+
+        - ttft_ms: time to the first token of the successful attempt (streaming
+          only, else None)
+        - latency_ms: wall time of the whole call, including rate limit waits
+          and retries
+        - output_tokens: as reported by the provider, or estimated
+        - tokens_per_s: output tokens over the time spent producing them
+        - retries: attempts that failed with a transient error
+
+        With `stop_when`, a streamed generation is cut off as soon as
+        `stop_when(text_so_far)` is true. Cut-off responses aren't cached.
+        Cache hits return the cached text with only latency_ms and retries set.
+        """
+        with span("llm", provider=self.model_provider, model=self.model) as s:
+            start = time.perf_counter()
+            cached = self.cached_generation(prompt)
+            if cached is not None:
+                s.set(cached=True)
+                return cached, _metrics(start, None, 0)
+
+            response, retries = self._send(
+                prompt, lambda: self._request(prompt, stop_when)
+            )
+            if not response.stopped_early:
+                self.store_generation(prompt, response.text)
+            metrics = _metrics(start, response, retries)
+            _record_call(s, self.model, start, response, metrics)
+            return response.text, metrics
+
+    def generate_with_logprobs(self, prompt, top_logprobs=5):
+        """
+        Return (text, logprobs) for `prompt`, where logprobs has a (token,
+        logprob, {alternative: logprob}) for every output token, with its
+        `top_logprobs` likeliest alternatives.
+
+        Only for providers that return log probabilities (LOGPROB_PROVIDERS;
+        Anthropic doesn't). These calls aren't streamed or cached.
+        """
+        if self.model_provider not in LOGPROB_PROVIDERS:
+            raise NotImplementedError(
+                f"{self.model_provider} models don't return log probabilities"
+            )
+        with span("llm", provider=self.model_provider, model=self.model) as s:
+            start = time.perf_counter()
+            response, retries = self._send(
+                prompt, lambda: self._request(prompt, top_logprobs=top_logprobs)
+            )
+            metrics = _metrics(start, response, retries)
+            _record_call(s, self.model, start, response, metrics)
+            return response.text, response.logprobs
+
+    def get_generations(self, prompt, n):
+        """
+        Return `n` independent samples for `prompt`, e.g. for pass@k.
+
+        Providers in MULTI_SAMPLE_PROVIDERS return all of them from one request
+        with their `n` parameter, so the prompt is sent and billed once; for
+        the others (Anthropic) the `n` requests are sent concurrently, as are
+        the missing ones when a server returns fewer than `n` choices (some
+        OpenAI-compatible servers ignore `n`). The samples are cached together,
+        under a key that includes `n`.
+        """
+        cache = self._cache()
+        key = None
+        if cache is not None:
+            key = self._cache_key(cache, prompt, n)
+            cached = cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+
+        def request(samples):
+            # one request for `samples` outputs, or for one with samples=None
+            with span(
+                "llm", provider=self.model_provider, model=self.model, n=samples
+            ) as s:
+                start = time.perf_counter()
+                response, retries = self._send(
+                    prompt,
+                    lambda: self._request(prompt, n=samples),
+                    outputs=samples or 1,
                 )
-            elif self.model_provider == "together":
-                # uses same schema as open
-                return (
-                    self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": prompt},
-                        ],
-                        max_tokens=4096,
-                        temperature=1,
-                    )
-                    .choices[0]
-                    .message.content
+                _record_call(
+                    s, self.model, start, response, _metrics(start, response, retries)
                 )
+            return response
+
+        samples = []
+        if self.model_provider in MULTI_SAMPLE_PROVIDERS:
+            samples = request(n).samples or []
+        # the rest one request each, concurrently: all of them for providers
+        # without `n`, and those a server that ignores `n` didn't send
+        missing = n - len(samples)
+        if missing > 0:
+            with ThreadPoolExecutor(max_workers=missing) as executor:
+                samples += [
+                    response.text
+                    for response in executor.map(request, [None] * missing)
+                ]
+        samples = samples[:n]
+
+        if key is not None:
+            cache.put(key, json.dumps(samples))
+        return samples
 
+    def _send(self, prompt, request, outputs=1):
+        """
+        Make one call with `request()`, which sends a request and returns
+        (_Response, headers) with up to `outputs` samples, through the in-flight
+        slots and the rate limiter. Returns the _Response and the number of
+        retries.
+        """
+        attempts = 0
+
+        def attempt():
+            # each attempt takes its own slot, so requests backing off between
+            # retries or waiting on a bucket don't hold one
+            nonlocal attempts
+            attempts += 1
+            with inflight_slot(self.model_provider):
+                return request()
+
+        if _rate_limiter is None:
+            response, _ = attempt()
         else:
+            # providers count max_tokens against the token budget up front
+            tokens = (
+                estimate_tokens(self.system_prompt)
+                + estimate_tokens(prompt_text(prompt))
+                + self.max_tokens * outputs
+            )
+            response = _rate_limiter.call(
+                self.model_provider, self.model, tokens, attempt
+            )
+        return response, attempts - 1
+
+    def _cache(self):
+        if self.cache is False:
+            return None
+        return self.cache if self.cache is not None else _default_cache
+
+    def _cache_key(self, cache, prompt, n=None):
+        return cache.key(
+            self.model_provider,
+            self.model,
+            self.system_prompt,
+            prompt_text(prompt),
+            self.max_tokens,
+            self.temperature,
+            self.stop,
+            n,
+        )
+
+    def cached_generation(self, prompt):
+        """Return the cached response to `prompt`, or None."""
+        cache = self._cache()
+        if cache is None:
+            return None
+        return cache.get(self._cache_key(cache, prompt))
+
+    def store_generation(self, prompt, generation):
+        cache = self._cache()
+        if cache is not None:
+            cache.put(self._cache_key(cache, prompt), generation)
+
+    def request_params(self, prompt):
+        """
+        Keyword arguments of the provider request for `prompt`; these are also
+        the bodies of batch requests (see reval/batch.py).
+
+        A prompt given as a list of parts is sent so that providers can cache
+        its shared prefix: Anthropic gets a `cache_control` breakpoint after
+        each part but the last (up to four), and OpenAI caches the longest previously seen
+        prefix (of at least 1024 tokens) on its own, so the text is just joined.
+        """
+        if isinstance(prompt, str):
+            content = prompt
+        elif self.model_provider == "claude":
+            content = [{"type": "text", "text": part} for part in prompt]
+            # anthropic allows at most four breakpoints per request
+            for block in content[:-1][:4]:
+                block["cache_control"] = _EPHEMERAL
+        else:
+            content = prompt_text(prompt)
+        messages = [{"role": "user", "content": content}]
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
+        if self.stop is not None:
             if self.model_provider == "claude":
-                return (
-                    self.client.messages.create(
-                        model=self.model,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=4096,
-                        temperature=1,
-                    )
-                    .content[0]
-                    .text
-                )
-            elif self.model_provider == "openai":
-                return (
-                    self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=4096,
-                        temperature=1,
-                    )
-                    .choices[0]
-                    .message.content
-                )
-            elif self.model_provider == "together":
-                # uses same schema as open
-                return (
-                    self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=4096,
-                        temperature=1,
-                    )
-                    .choices[0]
-                    .message.content
-                )
+                params["stop_sequences"] = list(self.stop)
+            else:
+                params["stop"] = list(self.stop)
+        if self.system_prompt is not None:
+            if self.model_provider == "claude":
+                params["system"] = self.system_prompt
+            else:
+                # together uses the same schema as openai
+                messages.insert(0, {"role": "system", "content": self.system_prompt})
+        return params
+
+    def _request(self, prompt, stop_when=None, top_logprobs=None, n=None):
+        """Send one request and return (_Response, response headers)."""
+        params = self.request_params(prompt)
+        if n is not None:
+            params["n"] = n
+        if top_logprobs is not None:
+            params.update(_logprob_params(self.model_provider, top_logprobs))
+        elif self.stream and n is None:
+            return self._stream(params, stop_when)
+
+        started = time.perf_counter()
+        if self.model_provider == "claude":
+            raw = self.client.messages.with_raw_response.create(**params)
+            message = raw.parse()
+            text = message.content[0].text
+            usage = message.usage
+        else:
+            raw = self.client.chat.completions.with_raw_response.create(**params)
+            completion = raw.parse()
+            text = completion.choices[0].message.content
+            usage = completion.usage
+        finished = time.perf_counter()
+        logprobs = samples = None
+        if top_logprobs is not None:
+            logprobs = _logprobs(completion.choices[0])
+        if n is not None:
+            samples = [choice.message.content for choice in completion.choices]
+        return (
+            _Response(
+                text,
+                *_usage(self.model_provider, usage),
+                started,
+                None,
+                finished,
+                False,
+                logprobs,
+                samples,
+            ),
+            raw.headers,
+        )
+
+    def _stream(self, params, stop_when):
+        started = time.perf_counter()
+        if self.model_provider == "claude":
+            raw = self.client.messages.with_raw_response.create(**params, stream=True)
+        else:
+            if self.model_provider in ("openai", "fake"):
+                # the last chunk then carries the token usage
+                params["stream_options"] = {"include_usage": True}
+            raw = self.client.chat.completions.with_raw_response.create(
+                **params, stream=True
+            )
+
+        pieces = []
+        first_token = None
+        # input, output and cached tokens, as they arrive
+        usage = [None, None, None]
+        stopped_early = False
+        stream = raw.parse()
+        try:
+            for event in stream:
+                piece, counts = _stream_event(self.model_provider, event)
+                for i, count in enumerate(counts):
+                    if count is not None:
+                        usage[i] = count
+                if not piece:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter()
+                pieces.append(piece)
+                if self.stop is not None:
+                    text = _cut_at_stop("".join(pieces), self.stop)
+                    if text is not None:
+                        # what the provider would have returned, so it's cached
+                        pieces = [text]
+                        break
+                if stop_when is not None and stop_when("".join(pieces)):
+                    stopped_early = True
+                    break
+        finally:
+            stream.close()
+
+        response = _Response(
+            "".join(pieces),
+            *usage,
+            started,
+            first_token,
+            time.perf_counter(),
+            stopped_early,
+        )
+        return response, raw.headers
+
+
+_EPHEMERAL = {"type": "ephemeral"}
+
+
+def _record_call(s, model, start, response, metrics):
+    # the attributes of an llm span for a call that reached the provider
+    s.set(
+        cached=False,
+        # slot and rate limit waits plus failed attempts
+        queue_ms=(response.started - start) * 1000,
+        input_tokens=response.input_tokens,
+        cached_tokens=response.cached_tokens,
+        output_tokens=metrics["output_tokens"],
+        cost_usd=estimate_cost(
+            model,
+            response.input_tokens,
+            metrics["output_tokens"],
+            response.cached_tokens,
+        ),
+        retries=metrics["retries"],
+    )
+
+
+def _logprob_params(provider, top_logprobs):
+    # together takes the number of alternatives as `logprobs`; openai (and the
+    # fake provider) a flag plus `top_logprobs`
+    if provider == "together":
+        return {"logprobs": top_logprobs}
+    return {"logprobs": True, "top_logprobs": top_logprobs}
+
+
+def _logprobs(choice):
+    """(token, logprob, {alternative: logprob}) per token of a completion choice."""
+    logprobs = getattr(choice, "logprobs", None)
+    if logprobs is None:
+        return []
+    content = getattr(logprobs, "content", None)
+    if content is not None:
+        return [
+            (
+                entry.token,
+                entry.logprob,
+                {top.token: top.logprob for top in entry.top_logprobs or ()},
+            )
+            for entry in content
+        ]
+    # together's older shape: parallel lists, alternatives as dicts per token
+    tokens = getattr(logprobs, "tokens", None) or []
+    token_logprobs = getattr(logprobs, "token_logprobs", None) or []
+    top_logprobs = getattr(logprobs, "top_logprobs", None)
+    if not isinstance(top_logprobs, list):
+        # without alternatives per token there is no confidence to read off
+        top_logprobs = [{}] * len(tokens)
+    return [
+        (token, logprob, dict(top or {}))
+        for token, logprob, top in zip(tokens, token_logprobs, top_logprobs)
+    ]
+
+
+def _cut_at_stop(text, stop):
+    """`text` up to the first of the `stop` sequences in it, or None."""
+    cuts = [i for i in (text.find(sequence) for sequence in stop) if i != -1]
+    return text[: min(cuts)] if cuts else None
+
+
+def _usage(provider, usage):
+    """(input, output, cached input) token counts from a response's usage."""
+    if usage is None:
+        return None, None, None
+    if provider == "claude":
+        # anthropic counts cache reads and writes apart from the other input
+        cached = getattr(usage, "cache_read_input_tokens", None) or 0
+        written = getattr(usage, "cache_creation_input_tokens", None) or 0
+        input_tokens = getattr(usage, "input_tokens", None)
+        if input_tokens is not None:
+            input_tokens += cached + written
+        return input_tokens, getattr(usage, "output_tokens", None), cached
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (
+        getattr(usage, "prompt_tokens", None),
+        getattr(usage, "completion_tokens", None),
+        getattr(details, "cached_tokens", None),
+    )
+
+
+def _stream_event(provider, event):
+    """
+    The text and the (input, output, cached input) token counts, each None if
+    absent, carried by a stream event.
+    """
+    if provider == "claude":
+        if event.type == "content_block_delta" and event.delta.type == "text_delta":
+            return event.delta.text, (None, None, None)
+        if event.type == "message_start":
+            input_tokens, _, cached = _usage(provider, event.message.usage)
+            return None, (input_tokens, None, cached)
+        if event.type == "message_delta":
+            return None, (None, event.usage.output_tokens, None)
+        return None, (None, None, None)
+
+    usage = _usage(provider, getattr(event, "usage", None))
+    if event.choices:
+        return event.choices[0].delta.content, usage
+    return None, usage
+
+
+def _metrics(start, response, retries):
+    metrics = dict.fromkeys(GENERATION_METRICS)
+    metrics["latency_ms"] = (time.perf_counter() - start) * 1000
+    metrics["retries"] = retries
+    if response is None:
+        return metrics
+
+    output_tokens = response.output_tokens
+    if output_tokens is None or response.stopped_early:
+        # usage only arrives at the end of a stream we didn't finish
+        output_tokens = estimate_tokens(response.text)
+    metrics["output_tokens"] = output_tokens
+    producing_since = response.started
+    if response.first_token is not None:
+        metrics["ttft_ms"] = (response.first_token - response.started) * 1000
+        producing_since = response.first_token
+    elapsed = response.finished - producing_since
+    if elapsed > 0:
+        metrics["tokens_per_s"] = output_tokens / elapsed
+    return metrics
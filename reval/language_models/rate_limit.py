@@ -0,0 +1,340 @@
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# status codes worth retrying: timeouts, conflicts, rate limits, server errors and
+# anthropic's 529 "overloaded"
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+# exception class names the provider SDKs use for network-level failures
+TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+# per-provider caps on the number of requests in flight at once, shared by every
+# LanguageModel in the process (so judge and criteria calls count too)
+_inflight_limits = {}
+_inflight_lock = threading.Lock()
+
+
+def set_inflight_limits(limits):
+    """
+    Cap concurrent requests per provider, e.g. {"openai": 32, "claude": 8}.
+
+    Providers that are not listed are unbounded. Passing None clears all limits.
+    Returns the limits this replaced; passing them back restores them, along
+    with the requests still holding their slots.
+    """
+    with _inflight_lock:
+        previous = dict(_inflight_limits)
+        _inflight_limits.clear()
+        for provider, limit in (limits or {}).items():
+            if isinstance(limit, int):
+                limit = threading.BoundedSemaphore(limit)
+            _inflight_limits[provider] = limit
+    return previous
+
+
+@contextmanager
+def inflight_slot(provider):
+    semaphore = _inflight_limits.get(provider)
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for english text, which is all a rate limiter needs
+    return len(text) // 4 + 1 if text else 0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `rate` units per minute.
+
+    A rate of None means unlimited. Callers may overdraw the bucket; they then
+    sleep until the deficit has been refilled, so large requests are delayed
+    rather than starved.
+    """
+
+    def __init__(self, rate=None, burst_seconds=1.0):
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+        self._updated = time.monotonic()
+        self.rate = None
+        self._tokens = 0.0
+        self.set_rate(rate)
+
+    @property
+    def capacity(self):
+        return self.rate / 60 * self.burst_seconds
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.rate is None and rate is not None:
+                # start with a full burst rather than an empty bucket
+                self._tokens = rate / 60 * self.burst_seconds
+            self.rate = rate
+            if rate is not None:
+                self._tokens = min(self._tokens, self.capacity)
+
+    def acquire(self, amount=1):
+        """Take `amount` tokens, sleeping if needed. Returns the seconds waited."""
+        with self._lock:
+            if self.rate is None:
+                return 0.0
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            wait = -self._tokens / (self.rate / 60) if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Hold back all callers for `seconds`, e.g. after a retry-after header."""
+        with self._lock:
+            if self.rate is None:
+                return
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -self.rate / 60 * seconds)
+
+    def _refill(self, now):
+        if self.rate is not None:
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate / 60
+            )
+        self._updated = now
+
+
+class AdaptiveBucket(TokenBucket):
+    """
+    A TokenBucket whose rate follows AIMD: every successful request adds back the
+    units it used (additive increase, roughly doubling the rate per minute of
+    clean traffic), and a 429 cuts the rate (multiplicative decrease): in half while
+    the real limit is unknown, and by `backoff_factor` once rate-limit headers
+    have told us the ceiling. Like TCP, the rate is cut at most once per
+    `cooldown` seconds, since a burst of concurrent requests all see the same
+    overload.
+
+    The rate never exceeds `headroom` times the ceiling learned from the provider's
+    rate-limit headers, so throughput settles just under the real limit.
+    """
+
+    def __init__(
+        self, rate=None, headroom=0.95, min_rate=1.0, cooldown=2.0, backoff_factor=0.8
+    ):
+        super().__init__(rate)
+        self.headroom = headroom
+        self.backoff_factor = backoff_factor
+        self.min_rate = min_rate
+        self.cooldown = cooldown
+        self.ceiling = None
+        self._last_decrease = None
+        self._recent = deque()  # (timestamp, units) over the last minute
+
+    def record(self, units):
+        now = time.monotonic()
+        with self._lock:
+            self._recent.append((now, units))
+            while self._recent and now - self._recent[0][0] > 60:
+                self._recent.popleft()
+
+    def observed_rate(self):
+        with self._lock:
+            if not self._recent:
+                return None
+            span = max(time.monotonic() - self._recent[0][0], 1.0)
+            return sum(units for _, units in self._recent) * 60 / min(span, 60)
+
+    def on_success(self, units):
+        if self.rate is None:
+            return
+        target = self.rate + units
+        if self.ceiling is not None:
+            target = min(target, self.ceiling * self.headroom)
+        self.set_rate(target)
+
+    def on_throttle(self):
+        now = time.monotonic()
+        if (
+            self._last_decrease is not None
+            and now - self._last_decrease < self.cooldown
+        ):
+            return
+        current = self.rate if self.rate is not None else self.observed_rate()
+        if current is None:
+            return
+        self._last_decrease = now
+        factor = 0.5 if self.ceiling is None else self.backoff_factor
+        self.set_rate(max(self.min_rate, current * factor))
+
+    def on_limit(self, limit):
+        self.ceiling = limit
+        if self.rate is None or self.rate > limit * self.headroom:
+            self.set_rate(limit * self.headroom)
+
+
+class _Limits:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, headroom=0.95):
+        self.requests = AdaptiveBucket(requests_per_minute, headroom)
+        self.tokens = AdaptiveBucket(tokens_per_minute, headroom)
+
+
+class RateLimiter:
+    """
+    Schedules provider calls under per-provider and per-model request-per-minute
+    and token-per-minute buckets, and retries transient failures.
+
+    Model buckets start unlimited and adapt on their own: rate-limit headers set
+    a ceiling, 429s halve the rate and successes grow it back. Provider buckets
+    are only enforced when configured, e.g.
+    RateLimiter(limits={"openai": {"requests_per_minute": 5000}}); keys may also
+    be (provider, model) tuples to seed a model's buckets.
+
+    Transient errors (429, 5xx, timeouts, connection errors) are retried up to
+    `max_retries` times with full-jitter exponential backoff, waiting at least as
+    long as any retry-after header asks.
+    """
+
+    def __init__(
+        self,
+        limits=None,
+        max_retries=6,
+        base_delay=1.0,
+        max_delay=60.0,
+        headroom=0.95,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.headroom = headroom
+        self.retries = 0
+        self.throttled = 0
+        self._limits = {}
+        self._lock = threading.Lock()
+        for key, config in (limits or {}).items():
+            self._limits[key] = _Limits(headroom=headroom, **config)
+
+    def call(self, provider, model, tokens, request):
+        """
+        Run `request()` under the buckets for `provider` and `model`.
+
+        `tokens` is the estimated token cost of the request and `request` must
+        return a (result, headers) pair. Returns the result.
+        """
+        buckets = [self._get(provider, create=False), self._get((provider, model))]
+        buckets = [bucket for bucket in buckets if bucket is not None]
+
+        for attempt in range(self.max_retries + 1):
+            for limits in buckets:
+                limits.requests.acquire(1)
+                limits.tokens.acquire(tokens)
+                limits.requests.record(1)
+                limits.tokens.record(tokens)
+
+            try:
+                result, headers = request()
+            except Exception as error:
+                if attempt == self.max_retries or not is_transient(error):
+                    raise
+                headers = _error_headers(error)
+                retry_after = _retry_after(headers)
+                if getattr(error, "status_code", None) == 429:
+                    with self._lock:
+                        self.throttled += 1
+                    # only the model buckets adapt; provider caps are fixed config
+                    limits = buckets[-1]
+                    bucket = (
+                        limits.tokens if _out_of_tokens(headers) else limits.requests
+                    )
+                    bucket.on_throttle()
+                    if retry_after:
+                        bucket.pause(retry_after)
+                self._update_from_headers(buckets[-1], headers)
+                with self._lock:
+                    self.retries += 1
+                time.sleep(max(retry_after or 0.0, self._backoff(attempt)))
+                continue
+
+            self._update_from_headers(buckets[-1], headers)
+            for limits in buckets:
+                limits.requests.on_success(1)
+                limits.tokens.on_success(tokens)
+            return result
+
+    def _get(self, key, create=True):
+        limits = self._limits.get(key)
+        if limits is None and create:
+            with self._lock:
+                limits = self._limits.setdefault(key, _Limits(headroom=self.headroom))
+        return limits
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    @staticmethod
+    def _update_from_headers(limits, headers):
+        if not headers:
+            return
+        requests_limit = _header_number(
+            headers,
+            "x-ratelimit-limit-requests",
+            "anthropic-ratelimit-requests-limit",
+        )
+        tokens_limit = _header_number(
+            headers,
+            "x-ratelimit-limit-tokens",
+            "anthropic-ratelimit-tokens-limit",
+            "anthropic-ratelimit-input-tokens-limit",
+        )
+        if requests_limit:
+            limits.requests.on_limit(requests_limit)
+        if tokens_limit:
+            limits.tokens.on_limit(tokens_limit)
+
+
+def is_transient(error):
+    if getattr(error, "status_code", None) in TRANSIENT_STATUS_CODES:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def _error_headers(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None)
+
+
+def _out_of_tokens(headers):
+    remaining = _header_number(
+        headers or {},
+        "x-ratelimit-remaining-tokens",
+        "anthropic-ratelimit-tokens-remaining",
+        "anthropic-ratelimit-input-tokens-remaining",
+    )
+    return remaining is not None and remaining <= 0
+
+
+def _header_number(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                continue
+    return None
+
+
+def _retry_after(headers):
+    if not headers:
+        return None
+    retry_after_ms = _header_number(headers, "retry-after-ms")
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    # retry-after may also be an HTTP date, which we ignore in favour of backoff
+    return _header_number(headers, "retry-after")
@@ -0,0 +1,108 @@
+import numpy as np
+
+
+def pair_counts(winners, losers, num_models):
+    """
+    Count matches into a (num_models, num_models) matrix where wins[i, j] is the
+    number of times model i beat model j. `winners` and `losers` are arrays of
+    model positions, one entry per match.
+    """
+    winners = np.asarray(winners, dtype=np.int64)
+    losers = np.asarray(losers, dtype=np.int64)
+    counts = np.bincount(winners * num_models + losers, minlength=num_models**2)
+    return counts.reshape(num_models, num_models)
+
+
+def elo(model1, model2, model1_won, ratings, k_factor=32):
+    """
+    Sequential Elo over matches in order, starting from `ratings` (one per
+    model). Returns the updated ratings as a list.
+
+    Elo depends on match order, so this is a loop, but one over plain floats:
+    the match table comes in as arrays and no per-row lookups are left in it.
+    """
+    ratings = list(ratings)
+    for player1, player2, score1 in zip(
+        np.asarray(model1).tolist(),
+        np.asarray(model2).tolist(),
+        np.asarray(model1_won, dtype=bool).tolist(),
+    ):
+        model1_rating = ratings[player1]
+        model2_rating = ratings[player2]
+        model_1_expected_score = 1 / (1 + 10 ** ((model2_rating - model1_rating) / 400))
+        model_2_expected_score = 1 / (1 + 10 ** ((model1_rating - model2_rating) / 400))
+        ratings[player1] = model1_rating + k_factor * (score1 - model_1_expected_score)
+        ratings[player2] = model2_rating + k_factor * (
+            (1 - score1) - model_2_expected_score
+        )
+    return ratings
+
+
+def bradley_terry(wins, prior=0.1, max_iter=10_000, tol=1e-9, strengths=None):
+    """
+    Maximum-likelihood Bradley–Terry strengths from a wins matrix, using the
+    minorization–maximization updates of Hunter (2004).
+
+    Unlike Elo the fit only depends on how often each model beat each other
+    model, not on match order. `wins` may have leading batch dimensions
+    (e.g. (rounds, models, models) for bootstrap samples), which are all fitted
+    at once. `prior` adds that many pseudo-wins each way to every pair, which
+    keeps strengths finite for a model that never won or never lost.
+    `strengths` is an optional starting point, such as the previous fit when
+    only a few matches were added.
+
+    Returns strengths with geometric mean 1, shaped like `wins` minus its last
+    dimension.
+    """
+    wins = np.asarray(wins, dtype=np.float64)
+    num_models = wins.shape[-1]
+    off_diagonal = 1 - np.eye(num_models)
+    wins = wins * off_diagonal + prior * off_diagonal
+    games = wins + np.swapaxes(wins, -1, -2)
+    total_wins = wins.sum(axis=-1)
+
+    if strengths is None:
+        strengths = np.ones(wins.shape[:-1])
+    for _ in range(max_iter):
+        pair_sums = strengths[..., :, None] + strengths[..., None, :]
+        updated = total_wins / (games / pair_sums).sum(axis=-1)
+        updated /= np.exp(np.log(updated).mean(axis=-1, keepdims=True))
+        converged = np.abs(updated - strengths).max() <= tol * updated.max()
+        strengths = updated
+        if converged:
+            break
+    return strengths
+
+
+def to_elo_scale(strengths, base=1000):
+    """Bradley–Terry strengths as Elo-scale ratings averaging `base`."""
+    ratings = 400 * np.log10(strengths)
+    return ratings - ratings.mean(axis=-1, keepdims=True) + base
+
+
+def bootstrap_intervals(wins, rounds=1000, confidence=0.95, prior=0.1, seed=None):
+    """
+    Percentile bootstrap confidence intervals of the Bradley–Terry ratings, on
+    the Elo scale.
+
+    Resampling matches with replacement only changes the wins matrix, so each
+    round is drawn directly as a multinomial sample of the observed (winner,
+    loser) counts, and all rounds are fitted together in one batched
+    `bradley_terry` call. The cost does not depend on the number of matches.
+
+    Returns (low, high) arrays with one entry per model.
+    """
+    wins = np.asarray(wins)
+    num_models = wins.shape[0]
+    total = int(wins.sum())
+    if total == 0:
+        ratings = to_elo_scale(np.ones(num_models))
+        return ratings, ratings
+    rng = np.random.default_rng(seed)
+    samples = rng.multinomial(total, wins.ravel() / total, size=rounds)
+    ratings = to_elo_scale(
+        bradley_terry(samples.reshape(rounds, num_models, num_models), prior)
+    )
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(ratings, [tail, 100 - tail], axis=0)
+    return low, high
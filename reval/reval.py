@@ -3,7 +3,24 @@ import pandas as pd
 from tqdm import tqdm
 import random
 import argparse
-from .language_models import LanguageModel
+import asyncio
+import functools
+import os
+import warnings
+from .language_models import GENERATION_METRICS, LanguageModel
+from .engine import Engine
+from .batch import batch_model, run_batch
+from .dedup import DuplicateFanOut, TaskDeduplicator
+from .criteria_store import CriteriaStore, criteria_store_path, fill_criteria
+from .checkpoint import Checkpoint, MISSING
+from .buffers import ResultBuffer
+from .sampling import release_row, sample_models
+from .scoring import RunningScores, SampleScores
+from .scheduler import PairScheduler
+from .sharding import shard_tasks
+from .stopping import EarlyStopping
+from .streaming import ResultWriter, file_format, iter_task_chunks
+from .tracing import disable_tracing, enable_tracing, span
 import json
 import numpy as np
 from .functions import binary_judge, criteria_generator
@@ -19,6 +36,23 @@ def Reval(
     mode="single",
     processed_tasks_path="processed_tasks.csv",
     results_path="results.json",
+    concurrency=None,
+    provider_limits=None,
+    checkpoint_path=None,
+    resume=False,
+    chunksize=None,
+    batch=False,
+    batch_poll_interval=60,
+    criteria_store=True,
+    k_factor=32,
+    pair_scheduler=None,
+    early_stopping=None,
+    record_metrics=False,
+    trace_path=None,
+    shard_index=None,
+    num_shards=None,
+    dedup=None,
+    samples_per_task=None,
 ) -> Dict[str, Any]:
     """
     Evaluate models on tasks specified in a CSV file.
@@ -27,9 +61,96 @@ def Reval(
         task_path (str): Path to the CSV file containing tasks to evaluate.
         models (List[Callable]): List of model functions to be evaluated.
         mode (Literal["single", "arena"]): Evaluation mode, either "single" or "arena".
-        processed_tasks_path (str): Path to save processed tasks.
-        results_path (str): Path to save evaluation results.
+        processed_tasks_path (str): Path to save processed tasks. A `.parquet`
+            path stores them compressed, column by column, so results can be
+            rescored from the grades alone with `score_results` or read in part
+            with `read_results` (see streaming.py), and `export_results`
+            converts them to CSV.
+        results_path (str): Path to save evaluation results. Judges with a
+            `report()`, like GradingCascade and TieredJudge, have it written
+            next to them as `<results_path stem>.judge.json`.
         raw_data_path (str): Path to save raw evaluation data.
+        concurrency (int): If set, run independent criteria, generation and judge
+            calls concurrently with at most this many in flight (see `areval`).
+        provider_limits (Dict[str, int]): Per-provider in-flight caps used together
+            with `concurrency`, e.g. {"openai": 32, "claude": 8}.
+        checkpoint_path (str): If set, every completed criteria, generation and
+            judge call is appended to this log as it finishes, so a crashed or
+            interrupted run loses at most about a second of work. An existing
+            log is never overwritten: pass `resume=True` or delete it first.
+        resume (bool): Reuse the cells already in `checkpoint_path` instead of
+            calling the models again, and only run what is missing.
+        chunksize (int): If set, stream tasks from a CSV, JSONL or Parquet file in
+            chunks of this many rows. Each chunk is evaluated, appended to
+            `processed_tasks_path` (CSV, JSONL or Parquet by extension) and
+            dropped, and scores are kept as running totals, so memory use does
+            not grow with the number of tasks.
+        batch (bool): Send the calls through the provider batch APIs (OpenAI
+            Batch, Anthropic Message Batches) instead of one request at a time.
+            Criteria and generations for a frame of tasks go out as one set of
+            batches, then all judge calls as another, and the results are joined
+            back into the tasks. Slower to finish but much cheaper for large runs.
+        batch_poll_interval (float): Seconds between batch status checks.
+        criteria_store (bool | str): Look criteria up in, and save new ones to, a
+            criteria store (see `compile_criteria`). On by default: True uses a
+            sidecar next to `processed_tasks_path`, e.g.
+            `processed_tasks.criteria.sqlite` (plus its SQLite `-wal`/`-shm`
+            files), a string is the store's path, and False generates criteria
+            inline on every run and writes no store.
+        k_factor (float): Elo K-factor in arena mode. Arena results also report
+            an order-independent Bradley–Terry rating (`bt_elo`) and the
+            bootstrap 95% interval of the rating on the Elo scale (`elo_ci_low`,
+            `elo_ci_high`, also as `bt_elo_ci_low`, `bt_elo_ci_high`), see
+            ratings.py.
+        pair_scheduler (str | PairScheduler): In arena mode, "adaptive" picks
+            each task's pair from the results so far and stops making calls once
+            the ranking is stable, see scheduler.py. Pass a PairScheduler to set
+            its confidence or match budget. By default pairs are drawn uniformly
+            at random.
+        early_stopping (bool | EarlyStopping): In single mode, visit tasks in a
+            random order and stop giving a model tasks once its pass rate is
+            known to the target precision or its comparison with a reference
+            model is decided, see stopping.py. True uses the defaults. Results
+            then also report each model's pass rate, its interval and the
+            number of tasks used.
+        record_metrics (bool): Add latency columns for every generation:
+            `{model}.ttft_ms`, `.latency_ms`, `.output_tokens`, `.tokens_per_s`
+            and `.retries` (see LanguageModel.generate_with_metrics; TTFT needs
+            a model created with stream=True). Not filled in batch mode.
+        trace_path (str): If set, time every stage of the run (criteria,
+            generation, judge, parse, bookkeeping and each provider call, with
+            its queue wait, token usage and estimated cost) and write the spans
+            to this JSONL file, plus a table of p50/p95/p99 times per stage and
+            provider next to it (`<trace_path stem>.summary.csv`), see tracing.py.
+            Tracing is off, and costs next to nothing, by default.
+        shard_index (int): With `num_shards`, only evaluate the tasks whose
+            stable text hash falls in this shard, so workers or machines can
+            each take a slice of a suite. Processed tasks then carry a
+            `task_index` column, and `merge_shards` combines the shards' outputs
+            and recomputes the scores, see sharding.py (`run_sharded` splits a
+            run across local processes).
+        num_shards (int): Number of shards the tasks are split into.
+        dedup (bool | float | TaskDeduplicator): Evaluate one representative per
+            group of exact or near-duplicate tasks (MinHash/LSH over the task
+            text, see dedup.py) and copy its criteria, outputs and grades to
+            the other tasks in the group, which are marked in a `duplicate_of`
+            column and count in the scores like any other task. A float is the
+            similarity threshold, True uses 0.9. Reads the tasks twice, and
+            writes how many tasks and calls were saved to
+            `<results_path stem>.dedup.json`.
+        samples_per_task (int): In single mode, generate this many samples per
+            task for every model and grade each of them, for pass@k and for how
+            much the scores vary between samples. The samples of a task come
+            from one request with the provider's `n` parameter where it has one
+            (OpenAI, Together), so the prompt is only sent and billed once, and
+            from concurrent requests otherwise (Anthropic), see
+            LanguageModel.get_generations; use a temperature above 0. Processed
+            tasks get `{model}#1.output` and `.grade` to `{model}#k`, a
+            multi-output judge grades all of a task's samples in one call, and
+            results report each model's mean `score` per sample, its
+            `score_std` across samples, `pass@1` to `pass@k` and
+            `within_task_variance`, see SampleScores. Can't be used with
+            early_stopping; pass it to `merge_shards` as well.
 
     Returns:
         Dict[str, Any]: A dictionary containing evaluation results. The structure of this
@@ -41,8 +162,785 @@ def Reval(
     independently) or "arena" mode (comparing models against each other).
     """
 
+    if batch and concurrency is not None:
+        raise ValueError("batch=True and concurrency can't be used together")
+
+    if concurrency is not None:
+        return asyncio.run(
+            areval(
+                task_location,
+                models_to_eval,
+                judging_model,
+                criteria_model,
+                mode=mode,
+                processed_tasks_path=processed_tasks_path,
+                results_path=results_path,
+                concurrency=concurrency,
+                provider_limits=provider_limits,
+                checkpoint_path=checkpoint_path,
+                resume=resume,
+                chunksize=chunksize,
+                criteria_store=criteria_store,
+                k_factor=k_factor,
+                pair_scheduler=pair_scheduler,
+                early_stopping=early_stopping,
+                record_metrics=record_metrics,
+                trace_path=trace_path,
+                shard_index=shard_index,
+                num_shards=num_shards,
+                dedup=dedup,
+                samples_per_task=samples_per_task,
+            )
+        )
+
+    scores = _scores(models_to_eval, mode, k_factor, samples_per_task)
+    models_to_eval = _sampled(models_to_eval, mode, early_stopping, samples_per_task)
+    scheduler = _pair_scheduler(pair_scheduler, models_to_eval, mode)
+    stopping = _early_stopping(early_stopping, models_to_eval, mode)
+    if batch and (scheduler is not None or stopping is not None):
+        raise ValueError(
+            "pair_scheduler and early_stopping need each judge result before "
+            "choosing the next task, so they can't be used with batch=True"
+        )
+    shard = _shard(shard_index, num_shards, scheduler, stopping)
+
+    checkpoint = _open_checkpoint(checkpoint_path, resume)
+    store = _open_criteria_store(criteria_store, processed_tasks_path, criteria_model)
+    tracer = enable_tracing() if trace_path is not None else None
+    progress = tqdm()
+    _reset_judge_stats(judging_model)
+
+    try:
+        fan_out = _dedup(
+            dedup,
+            task_location,
+            models_to_eval,
+            chunksize,
+            progress,
+            record_metrics,
+            shard,
+        )
+        with ResultWriter(processed_tasks_path) as writer:
+            for tasks in _task_frames(
+                task_location,
+                models_to_eval,
+                chunksize,
+                progress,
+                record_metrics,
+                shard,
+            ):
+                _set_references(judging_model, tasks)
+                evaluated = tasks if fan_out is None else fan_out.select(tasks)
+                if batch:
+                    if store is not None:
+                        fill_criteria(
+                            evaluated,
+                            criteria_model,
+                            store,
+                            poll_interval=batch_poll_interval,
+                        )
+                    _batch_evaluate_tasks(
+                        evaluated,
+                        models_to_eval,
+                        judging_model,
+                        criteria_model,
+                        mode,
+                        checkpoint,
+                        progress,
+                        batch_poll_interval,
+                    )
+                else:
+                    _evaluate_tasks(
+                        evaluated,
+                        models_to_eval,
+                        judging_model,
+                        _stored(store, criteria_model),
+                        mode,
+                        checkpoint,
+                        progress,
+                        scheduler,
+                        stopping,
+                        record_metrics,
+                    )
+                if fan_out is not None:
+                    tasks = fan_out.fan_out(tasks, evaluated)
+                    progress.update(len(tasks) - len(evaluated))
+                with span("bookkeeping", rows=len(tasks)):
+                    writer.write(tasks)
+                    scores.update(tasks)
+    finally:
+        progress.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        if store is not None:
+            store.close()
+        if tracer is not None:
+            disable_tracing()
+            _write_trace(tracer, trace_path)
+
+    _write_judge_report(judging_model, results_path)
+    if fan_out is not None:
+        _write_dedup_report(fan_out, models_to_eval, judging_model, mode, results_path)
+    return _write_results(_results(scores, stopping), results_path)
+
+
+def _evaluate_tasks(
+    tasks,
+    models_to_eval,
+    judging_model,
+    criteria_model,
+    mode,
+    checkpoint,
+    progress,
+    scheduler=None,
+    stopping=None,
+    metrics=False,
+):
+    results = ResultBuffer(tasks, models_to_eval, metrics)
+    order = None if stopping is None else stopping.order(results.size)
+    for row in results.rows(order):
+        i, idx, task, success_criteria, failure_criteria, good_output, bad_output = row
+        progress.update(1)
+        if pd.isna(task):
+            warnings.warn(f"Skipping row {idx} as it has no tasks")
+            continue
+        if scheduler is not None and scheduler.stable():
+            # the ranking is settled, the remaining tasks aren't needed
+            continue
+        models = models_to_eval
+        if stopping is not None:
+            models = stopping.active_models(models_to_eval)
+            if not models:
+                continue
+
+        success_criteria, failure_criteria = _cached(
+            checkpoint,
+            idx,
+            task,
+            "criteria",
+            None,
+            lambda: criteria_model(
+                task, success_criteria, failure_criteria, good_output, bad_output
+            ),
+        )
+
+        results.set(i, "success_criteria", success_criteria)
+        results.set(i, "failure_criteria", failure_criteria)
+        judge = _row_judge(judging_model, idx)
+
+        if mode == "single" and getattr(judging_model, "multi_output", False):
+            model_outputs = {}
+            for model in models:
+                model_outputs[model.name], cells = _generate(
+                    checkpoint, idx, task, model, metrics
+                )
+                results.update(i, cells)
+                results.set(i, f"{model.name}.output", model_outputs[model.name])
+
+            grades = _judge_outputs(
+                checkpoint,
+                idx,
+                task,
+                judge,
+                success_criteria,
+                failure_criteria,
+                model_outputs,
+            )
+            for model in models:
+                results.set(i, f"{model.name}.grade", grades[model.name])
+                if stopping is not None:
+                    stopping.record(model, idx, grades[model.name])
+
+        elif mode == "single":
+            for model in models:
+                model_output, cells = _generate(checkpoint, idx, task, model, metrics)
+                results.update(i, cells)
+
+                results.set(i, f"{model.name}.output", model_output)
+
+                grading_result = _cached(
+                    checkpoint,
+                    idx,
+                    task,
+                    "grade",
+                    model.name,
+                    lambda: judge(
+                        task, success_criteria, failure_criteria, model_output
+                    ),
+                )
+
+                results.set(i, f"{model.name}.grade", grading_result)
+                if stopping is not None:
+                    stopping.record(model, idx, grading_result)
+
+        elif mode == "arena":
+            model1, model2 = _arena_pair(
+                checkpoint, idx, task, models_to_eval, scheduler
+            )
+
+            model1_output, cells = _generate(checkpoint, idx, task, model1, metrics)
+            results.update(i, cells)
+            model2_output, cells = _generate(checkpoint, idx, task, model2, metrics)
+            results.update(i, cells)
+
+            results.set(i, f"{model1.name}.output", model1_output)
+            results.set(i, f"{model2.name}.output", model2_output)
+
+            arena_result = _cached(
+                checkpoint,
+                idx,
+                task,
+                "grade",
+                None,
+                lambda: judge(
+                    task,
+                    success_criteria,
+                    failure_criteria,
+                    model1_output,
+                    model2_output,
+                ),
+            )  # either 1 or 2 depending on which model won
+
+            results.update(i, _arena_grades(model1, model2, arena_result))
+            if scheduler is not None:
+                scheduler.record(model1, model2, arena_result == 1)
+
+        release_row(models, idx, task)
+
+    with span("bookkeeping"):
+        results.materialize()
+
+
+async def areval(
+    task_location,
+    models_to_eval,
+    judging_model,
+    criteria_model,
+    mode="single",
+    processed_tasks_path="processed_tasks.csv",
+    results_path="results.json",
+    concurrency=64,
+    provider_limits=None,
+    checkpoint_path=None,
+    resume=False,
+    chunksize=None,
+    criteria_store=True,
+    k_factor=32,
+    pair_scheduler=None,
+    early_stopping=None,
+    record_metrics=False,
+    trace_path=None,
+    shard_index=None,
+    num_shards=None,
+    dedup=None,
+    samples_per_task=None,
+) -> Dict[str, Any]:
+    """
+    Concurrent version of `Reval`, taking the same arguments.
+
+    Each row is a small dependency graph: the criteria call and the generation
+    calls for every model are independent and start together, and each judge call
+    starts as soon as its criteria and its model output are both available.
+    Independent rows run at the same time, with at most `concurrency` calls in
+    flight overall and at most `provider_limits[provider]` per provider.
+
+    The criteria, generation and judge callables are the same blocking ones that
+    `Reval` uses; they are run on a thread pool. Arena pairs are drawn in row
+    order before any call is made, so for the same random state the processed
+    tasks and results match the sequential path.
+    """
+
+    scores = _scores(models_to_eval, mode, k_factor, samples_per_task)
+    models_to_eval = _sampled(models_to_eval, mode, early_stopping, samples_per_task)
+    scheduler = _pair_scheduler(pair_scheduler, models_to_eval, mode)
+    stopping = _early_stopping(early_stopping, models_to_eval, mode)
+    shard = _shard(shard_index, num_shards, scheduler, stopping)
+    checkpoint = _open_checkpoint(checkpoint_path, resume)
+    store = _open_criteria_store(criteria_store, processed_tasks_path, criteria_model)
+    engine = Engine(concurrency, provider_limits)
+    tracer = enable_tracing() if trace_path is not None else None
+    progress = tqdm()
+    _reset_judge_stats(judging_model)
+
+    try:
+        fan_out = _dedup(
+            dedup,
+            task_location,
+            models_to_eval,
+            chunksize,
+            progress,
+            record_metrics,
+            shard,
+        )
+        with ResultWriter(processed_tasks_path) as writer:
+            for tasks in _task_frames(
+                task_location,
+                models_to_eval,
+                chunksize,
+                progress,
+                record_metrics,
+                shard,
+            ):
+                _set_references(judging_model, tasks)
+                evaluated = tasks if fan_out is None else fan_out.select(tasks)
+                await _aevaluate_tasks(
+                    evaluated,
+                    models_to_eval,
+                    judging_model,
+                    _stored(store, criteria_model),
+                    mode,
+                    checkpoint,
+                    progress,
+                    engine,
+                    scheduler,
+                    stopping,
+                    record_metrics,
+                )
+                if fan_out is not None:
+                    tasks = fan_out.fan_out(tasks, evaluated)
+                    progress.update(len(tasks) - len(evaluated))
+                with span("bookkeeping", rows=len(tasks)):
+                    writer.write(tasks)
+                    scores.update(tasks)
+    finally:
+        progress.close()
+        engine.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        if store is not None:
+            store.close()
+        if tracer is not None:
+            disable_tracing()
+            _write_trace(tracer, trace_path)
+
+    _write_judge_report(judging_model, results_path)
+    if fan_out is not None:
+        _write_dedup_report(fan_out, models_to_eval, judging_model, mode, results_path)
+    return _write_results(_results(scores, stopping), results_path)
+
+
+async def _aevaluate_tasks(
+    tasks,
+    models_to_eval,
+    judging_model,
+    criteria_model,
+    mode,
+    checkpoint,
+    progress,
+    engine,
+    scheduler=None,
+    stopping=None,
+    metrics=False,
+):
+    async def evaluate_row(i, row):
+        _, idx, task, success_criteria, failure_criteria, good_output, bad_output = row
+        judge = _row_judge(judging_model, idx)
+        models = models_to_eval
+        if stopping is not None:
+            # decided as rows start, from the grades in so far
+            models = stopping.active_models(models_to_eval)
+            if not models:
+                return {}
+        if scheduler is not None:
+            # pairs are chosen as rows start, from the results in so far
+            if scheduler.stable():
+                return {}
+            pairs[idx] = _arena_pair(checkpoint, idx, task, models_to_eval, scheduler)
+        criteria = asyncio.ensure_future(
+            _acached(
+                checkpoint,
+                idx,
+                task,
+                "criteria",
+                None,
+                lambda: engine.run(
+                    criteria_model,
+                    task,
+                    success_criteria,
+                    failure_criteria,
+                    good_output,
+                    bad_output,
+                ),
+            )
+        )
+
+        metric_cells = {}
+
+        async def generate(model):
+            output, cells = await engine.run(
+                _generate, checkpoint, idx, task, model, metrics
+            )
+            metric_cells.update(cells)
+            return output
+
+        async def single_cell(model):
+            model_output = await generate(model)
+            success_criteria, failure_criteria = await criteria
+            grading_result = await _acached(
+                checkpoint,
+                idx,
+                task,
+                "grade",
+                model.name,
+                lambda: engine.run(
+                    judge,
+                    task,
+                    success_criteria,
+                    failure_criteria,
+                    model_output,
+                ),
+            )
+            if stopping is not None:
+                stopping.record(model, idx, grading_result)
+            return {
+                f"{model.name}.output": model_output,
+                f"{model.name}.grade": grading_result,
+            }
+
+        try:
+            if mode == "single" and getattr(judging_model, "multi_output", False):
+                outputs = await asyncio.gather(*(generate(model) for model in models))
+                model_outputs = {
+                    model.name: output for model, output in zip(models, outputs)
+                }
+                success_criteria, failure_criteria = await criteria
+                grades = await engine.run(
+                    _judge_outputs,
+                    checkpoint,
+                    idx,
+                    task,
+                    judge,
+                    success_criteria,
+                    failure_criteria,
+                    model_outputs,
+                )
+                updates = {}
+                for model in models:
+                    updates[f"{model.name}.output"] = model_outputs[model.name]
+                    updates[f"{model.name}.grade"] = grades[model.name]
+                    if stopping is not None:
+                        stopping.record(model, idx, grades[model.name])
+
+            elif mode == "single":
+                cells = await asyncio.gather(*(single_cell(model) for model in models))
+                updates = {}
+                for cell in cells:
+                    updates.update(cell)
+
+            elif mode == "arena":
+                model1, model2 = pairs[idx]
+                model1_output, model2_output = await asyncio.gather(
+                    generate(model1), generate(model2)
+                )
+                success_criteria, failure_criteria = await criteria
+                arena_result = await _acached(
+                    checkpoint,
+                    idx,
+                    task,
+                    "grade",
+                    None,
+                    lambda: engine.run(
+                        judge,
+                        task,
+                        success_criteria,
+                        failure_criteria,
+                        model1_output,
+                        model2_output,
+                    ),
+                )
+                updates = {
+                    f"{model1.name}.output": model1_output,
+                    f"{model2.name}.output": model2_output,
+                }
+                updates.update(_arena_grades(model1, model2, arena_result))
+                if scheduler is not None:
+                    scheduler.record(model1, model2, arena_result == 1)
+
+            success_criteria, failure_criteria = await criteria
+        finally:
+            criteria.cancel()
+            release_row(models, idx, task)
+
+        updates["success_criteria"] = success_criteria
+        updates["failure_criteria"] = failure_criteria
+        updates.update(metric_cells)
+        return updates
+
+    results = ResultBuffer(tasks, models_to_eval, metrics)
+    rows = []
+    pairs = {}
+    order = None if stopping is None else stopping.order(results.size)
+    for row in results.rows(order):
+        i, idx, task = row[:3]
+        if pd.isna(task):
+            warnings.warn(f"Skipping row {idx} as it has no tasks")
+            continue
+        if mode == "arena" and scheduler is None:
+            # drawn up front and in order so the pairs match the sequential path
+            pairs[idx] = _arena_pair(checkpoint, idx, task, models_to_eval)
+        rows.append((i, row))
+
+    progress.update(tasks.shape[0] - len(rows))
+
+    def on_done(i, updates):
+        results.update(i, updates)
+        progress.update(1)
+
+    await engine.map_rows(rows, evaluate_row, on_done)
+    with span("bookkeeping"):
+        results.materialize()
+
+
+def _batch_evaluate_tasks(
+    tasks,
+    models_to_eval,
+    judging_model,
+    criteria_model,
+    mode,
+    checkpoint,
+    progress,
+    poll_interval,
+):
+    results = ResultBuffer(tasks, models_to_eval)
+    rows = []
+    for row in results.rows():
+        i, idx, task = row[:3]
+        if pd.isna(task):
+            warnings.warn(f"Skipping row {idx} as it has no tasks")
+            continue
+        rows.append(row)
+
+    pairs = {}
+    if mode == "arena":
+        for i, idx, task, *_ in rows:
+            pairs[i] = _arena_pair(checkpoint, idx, task, models_to_eval)
+
+    # step one: criteria and generations don't depend on each other
+    stage = _BatchStage(checkpoint)
+    for i, idx, task, success_criteria, failure_criteria, good, bad in rows:
+        stage.add_call(
+            (i, "criteria"),
+            idx,
+            task,
+            "criteria",
+            None,
+            criteria_model,
+            (task, success_criteria, failure_criteria, good, bad),
+            parse_args=(success_criteria, failure_criteria),
+        )
+        models = pairs[i] if mode == "arena" else models_to_eval
+        for model in models:
+            fn = model
+            if hasattr(model, "sample"):
+                # called directly, see sampling.py
+                fn = functools.partial(model.sample, idx)
+            stage.add_call(
+                (i, model.name), idx, task, "output", model.name, fn, (task,)
+            )
+    first = stage.run(poll_interval)
+    for i, idx, task, *_ in rows:
+        release_row(models_to_eval, idx, task)
+
+    # step two: every judge call, now that criteria and outputs are known
+    stage = _BatchStage(checkpoint)
+    grades = {}
+    for i, idx, task, *_ in rows:
+        judge = _row_judge(judging_model, idx)
+        success_criteria, failure_criteria = first[(i, "criteria")]
+        results.set(i, "success_criteria", success_criteria)
+        results.set(i, "failure_criteria", failure_criteria)
+        if mode == "single" and getattr(judging_model, "multi_output", False):
+            model_outputs = {}
+            for model in models_to_eval:
+                model_outputs[model.name] = first[(i, model.name)]
+                results.set(i, f"{model.name}.output", model_outputs[model.name])
+            grades[i] = _judged_outputs(checkpoint, idx, task, model_outputs)
+            todo = [name for name in model_outputs if name not in grades[i]]
+            if todo:
+                outputs = [model_outputs[name] for name in todo]
+                stage.add_call(
+                    (i, tuple(todo)),
+                    idx,
+                    task,
+                    None,  # each grade is logged below, not the list
+                    None,
+                    judge,
+                    (task, success_criteria, failure_criteria, outputs),
+                    parse_args=(len(outputs),),
+                )
+        elif mode == "single":
+            for model in models_to_eval:
+                model_output = first[(i, model.name)]
+                results.set(i, f"{model.name}.output", model_output)
+                stage.add_call(
+                    (i, model.name),
+                    idx,
+                    task,
+                    "grade",
+                    model.name,
+                    judge,
+                    (task, success_criteria, failure_criteria, model_output),
+                )
+        elif mode == "arena":
+            model1, model2 = pairs[i]
+            model1_output = first[(i, model1.name)]
+            model2_output = first[(i, model2.name)]
+            results.set(i, f"{model1.name}.output", model1_output)
+            results.set(i, f"{model2.name}.output", model2_output)
+            stage.add_call(
+                (i, None),
+                idx,
+                task,
+                "grade",
+                None,
+                judge,
+                (
+                    task,
+                    success_criteria,
+                    failure_criteria,
+                    model1_output,
+                    model2_output,
+                ),
+            )
+    second = stage.run(poll_interval)
+    rows_by_position = {i: (idx, task) for i, idx, task, *_ in rows}
+
+    for key, value in second.items():
+        i, names = key
+        if isinstance(names, tuple):
+            idx, task = rows_by_position[i]
+            for name, grade in zip(names, value):
+                if checkpoint is not None:
+                    checkpoint.record(idx, task, "grade", grade, name)
+                grades[i][name] = grade
+
+    for i, *_ in rows:
+        if i in grades:
+            for name, grade in grades[i].items():
+                results.set(i, f"{name}.grade", grade)
+        elif mode == "single":
+            for model in models_to_eval:
+                results.set(i, f"{model.name}.grade", second[(i, model.name)])
+        elif mode == "arena":
+            model1, model2 = pairs[i]
+            results.update(i, _arena_grades(model1, model2, second[(i, None)]))
+        progress.update(1)
+
+    progress.update(tasks.shape[0] - len(rows))
+    with span("bookkeeping"):
+        results.materialize()
+
+
+class _BatchStage:
+    """
+    One round of batch mode. Each cell comes from the checkpoint if it's already
+    there, from a provider batch if its callable can be batched (a LanguageModel,
+    a function with `prompt`, `parse` and `model_name` like binary_judge, or
+    one with a `batch_request` returning the prompt and its parser for a call,
+    like GradingCascade), and from calling it directly otherwise, including
+    when `prompt` or `batch_request` gives no prompt.
+    """
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        self.values = {}
+        self.requests = []
+        self.pending = {}
+
+    def add_call(self, key, idx, task, stage, model_name, fn, args, parse_args=()):
+        # cells with stage None are neither looked up in nor logged to the
+        # checkpoint; the caller takes care of that
+        if self.checkpoint is not None and stage is not None:
+            value = self.checkpoint.get(idx, task, stage, model_name)
+            if value is not MISSING:
+                self.values[key] = value
+                return
+
+        if hasattr(fn, "get_generation"):
+            model, prompt, parse = fn, args[0], None
+        elif hasattr(fn, "batch_request"):
+            prompt, parse = fn.batch_request(*args)
+            model = None if prompt is None else batch_model(fn)
+        elif all(hasattr(fn, name) for name in ("prompt", "parse", "model_name")):
+            model, prompt = batch_model(fn), fn.prompt(*args)
+            parse = lambda raw: fn.parse(raw, *parse_args)
+        else:
+            model = prompt = None
+
+        if prompt is None:
+            self._done(key, idx, task, stage, model_name, fn(*args))
+            return
+
+        custom_id = f"request-{len(self.requests)}"
+        self.requests.append((custom_id, model, prompt))
+        self.pending[custom_id] = (key, idx, task, stage, model_name, fn, args, parse)
+
+    def run(self, poll_interval):
+        responses = run_batch(self.requests, poll_interval)
+        for custom_id, pending in self.pending.items():
+            key, idx, task, stage, model_name, fn, args, parse = pending
+            value = responses[custom_id]
+            if parse is not None:
+                try:
+                    value = parse(value)
+                except ValueError:
+                    # e.g. a multi-output judge that didn't grade every output
+                    value = getattr(fn, "fallback", fn)(*args)
+            self._done(key, idx, task, stage, model_name, value)
+        return self.values
+
+    def _done(self, key, idx, task, stage, model_name, value):
+        if self.checkpoint is not None and stage is not None:
+            self.checkpoint.record(idx, task, stage, value, model_name)
+        self.values[key] = value
+
+
+def _task_frames(
+    task_location, models_to_eval, chunksize, progress, metrics=False, shard=None
+):
+    if chunksize is None:
+        tasks = _load_tasks(task_location, models_to_eval, metrics)
+        if shard is not None:
+            tasks = shard_tasks(tasks, *shard)
+        progress.total = tasks.shape[0]
+        progress.refresh()
+        yield tasks
+        return
+    for chunk in iter_task_chunks(task_location, chunksize):
+        tasks = _load_tasks(chunk, models_to_eval, metrics)
+        if shard is not None:
+            tasks = shard_tasks(tasks, *shard)
+            if tasks.empty:
+                continue
+        yield tasks
+
+
+def _shard(shard_index, num_shards, scheduler, stopping):
+    if shard_index is None and num_shards is None:
+        return None
+    if shard_index is None or num_shards is None:
+        raise ValueError("shard_index and num_shards must be given together")
+    if scheduler is not None or stopping is not None:
+        raise ValueError(
+            "pair_scheduler and early_stopping decide from all results so far, "
+            "so they can't be used with sharding"
+        )
+    return shard_index, num_shards
+
+
+def _read_tasks(path):
+    kind = file_format(path)
+    if kind == "csv":
+        return pd.read_csv(path)
+    elif kind == "jsonl":
+        return pd.read_json(path, lines=True)
+    elif kind == "parquet":
+        return pd.read_parquet(path)
+
+
+def _load_tasks(task_location, models_to_eval, metrics=False):
     if isinstance(task_location, str):
-        tasks = pd.read_csv(task_location)
+        tasks = _read_tasks(task_location)
     elif isinstance(task_location, pd.DataFrame):
         tasks = task_location
 
@@ -62,149 +960,289 @@ def Reval(
             tasks[f"{model.name}.output"] = None
         if f"{model.name}.grade" not in columns:
             tasks[f"{model.name}.grade"] = None
+        if metrics:
+            for metric in GENERATION_METRICS:
+                if f"{model.name}.{metric}" not in columns:
+                    tasks[f"{model.name}.{metric}"] = None
 
-    print(tasks.shape[0])
-    for idx, row in tqdm(tasks.iterrows(), total=tasks.shape[0]):
-        if row.get("tasks") is None:
-            Warning(f"Skipping row {idx} as it has no tasks")
-            continue
+    return tasks
 
-        task = row.get("tasks")
-        success_criteria = row.get("success_criteria")
-        failure_criteria = row.get("failure_criteria")
-        good_output = row.get("good_output")
-        bad_output = row.get("bad_output")
 
-        success_criteria, failure_criteria = criteria_model(
-            task, success_criteria, failure_criteria, good_output, bad_output
+def _reset_judge_stats(judging_model):
+    # so the judge report written next to the results covers just this run
+    if hasattr(judging_model, "reset_stats"):
+        judging_model.reset_stats()
+
+
+def _set_references(judging_model, tasks):
+    # judges like GradingCascade check outputs against the tasks' reference columns
+    if hasattr(judging_model, "set_references"):
+        judging_model.set_references(tasks)
+
+
+def _row_judge(judging_model, idx):
+    # the judge for one task row, bound to that row's references if it has any
+    if hasattr(judging_model, "for_row"):
+        return judging_model.for_row(idx)
+    return judging_model
+
+
+def _open_checkpoint(checkpoint_path, resume):
+    if checkpoint_path is None:
+        if resume:
+            raise ValueError("resume=True needs a checkpoint_path to resume from")
+        return None
+    return Checkpoint(checkpoint_path, resume=resume)
+
+
+def _open_criteria_store(criteria_store, processed_tasks_path, criteria_model):
+    if criteria_store is False or criteria_store is None:
+        return None
+    if not CriteriaStore.can_store(criteria_model):
+        warnings.warn(
+            f"Not storing criteria: {criteria_model!r} has no code to identify "
+            "it by, so criteria are generated on every run"
         )
+        return None
+    if criteria_store is True:
+        criteria_store = criteria_store_path(processed_tasks_path)
+    return CriteriaStore(criteria_store)
 
-        row["success_criteria"] = success_criteria
-        row["failure_criteria"] = failure_criteria
 
-        if mode == "single":
-            for models in models_to_eval:
-                model_output = model.get_generation(task)
+def _stored(store, criteria_model):
+    return criteria_model if store is None else store.wrap(criteria_model)
 
-                row[f"{model.name}.output"] = model_output
 
-                grading_result = judging_model(
-                    tasks, success_criteria, failure_criteria, model_output
-                )
+def _judged_outputs(checkpoint, idx, task, model_outputs):
+    # grades already in the checkpoint, by model name
+    grades = {}
+    if checkpoint is not None:
+        for name in model_outputs:
+            grade = checkpoint.get(idx, task, "grade", name)
+            if grade is not MISSING:
+                grades[name] = grade
+    return grades
 
-                row[f"{model.name}.grade"] = grading_result
 
-        elif mode == "arena":
-            model1, model2 = random.sample(models_to_eval, 2)
+def _judge_outputs(
+    checkpoint,
+    idx,
+    task,
+    judging_model,
+    success_criteria,
+    failure_criteria,
+    model_outputs,
+):
+    # grade every output a multi-output judge hasn't graded yet in one call
+    grades = _judged_outputs(checkpoint, idx, task, model_outputs)
+    todo = [name for name in model_outputs if name not in grades]
+    if todo:
+        new_grades = judging_model(
+            task,
+            success_criteria,
+            failure_criteria,
+            [model_outputs[name] for name in todo],
+        )
+        for name, grade in zip(todo, new_grades):
+            if checkpoint is not None:
+                checkpoint.record(idx, task, "grade", grade, name)
+            grades[name] = grade
+    return {name: grades[name] for name in model_outputs}
 
-            model1_output = model1.get_generation(task)
-            model2_output = model2.get_generation(task)
 
-            row[f"{model1.name}.output"] = model1_output
-            row[f"{model2.name}.output"] = model2_output
+def _generate(checkpoint, idx, task, model, metrics):
+    """
+    `model`'s output for a task, and with `metrics` its latency columns. Both
+    go through the checkpoint, metrics as a stage of their own.
+    """
+    with span(
+        "generation",
+        provider=getattr(model, "model_provider", None),
+        model=model.name,
+    ):
+        if not metrics or not hasattr(model, "generate_with_metrics"):
+            output = _cached(
+                checkpoint,
+                idx,
+                task,
+                "output",
+                model.name,
+                lambda: _generation(model, idx, task),
+            )
+            return output, {}
 
-            arena_result = judging_model(
-                task, success_criteria, failure_criteria, model1_output, model2_output
-            )  # either 1 or 2 depending on which model won
+        output = values = MISSING
+        if checkpoint is not None:
+            output = checkpoint.get(idx, task, "output", model.name)
+            values = checkpoint.get(idx, task, "metrics", model.name)
+        if output is MISSING or values is MISSING:
+            output, values = model.generate_with_metrics(task)
+            if checkpoint is not None:
+                checkpoint.record(idx, task, "output", output, model.name)
+                checkpoint.record(idx, task, "metrics", values, model.name)
+        return output, {f"{model.name}.{metric}": values[metric] for metric in values}
 
-            if arena_result == 1:
-                # then we make it so that the model1 = 1 and model2 = -1
-                row[f"{model1.name}.grade"] = 1
-                row[f"{model2.name}.grade"] = -1
 
-            elif arena_result == 2:
-                row[f"{model1.name}.grade"] = -1
-                row[f"{model2.name}.grade"] = 1
+def _generation(model, idx, task):
+    # sample models share one multi-sample request per row, see sampling.py
+    if hasattr(model, "sample"):
+        return model.sample(idx, task)
+    return model.get_generation(task)
 
-            else:
-                # raise error
-                raise ValueError(f"Invalid arena result: {arena_result}")
 
-        print("")
+def _cached(checkpoint, idx, task, stage, model_name, compute):
+    # look the cell up in the checkpoint, or compute it and log it
+    if checkpoint is None:
+        return compute()
+    value = checkpoint.get(idx, task, stage, model_name)
+    if value is MISSING:
+        value = compute()
+        checkpoint.record(idx, task, stage, value, model_name)
+    return value
 
-        # we then patch back the row
-        tasks.loc[idx] = row
 
-        # we need to then return the result
+async def _acached(checkpoint, idx, task, stage, model_name, compute):
+    if checkpoint is None:
+        return await compute()
+    value = checkpoint.get(idx, task, stage, model_name)
+    if value is MISSING:
+        value = await compute()
+        checkpoint.record(idx, task, stage, value, model_name)
+    return value
 
-    results = []
-    tasks.to_csv(processed_tasks_path, index=False)
 
-    if mode == "single":
-        # we can just take the sum of model_results per model
-        """
-            [
-                {
-                    "model": model_name<str>, 
-                    "score": score<int>
-                }
-            ]
-        """
-        for model in models_to_eval:
-            model_results = tasks[f"{model.name}.grade"]
-            score = model_results.sum()
-            results.append({"model": model.name, "score": score})
-
-    elif mode == "arena":
-        ratings = {model.name: 1000 for model in models_to_eval}
-        k_factor = 32
-
-        for idx, row in tasks.iterrows():
-            # get non-zero columns that end with ".grade"
-            non_zero_columns = [
-                column
-                for column in row.index
-                if column.endswith(".grade") and row[column] != 0
-            ]
-
-            if len(non_zero_columns) != 2:
-                raise ValueError(
-                    f"Invalid number of non-zero columns: {len(non_zero_columns)}"
-                )
+def _early_stopping(early_stopping, models_to_eval, mode):
+    if early_stopping is None or early_stopping is False:
+        return None
+    if mode != "single":
+        raise ValueError("early_stopping is only used in single mode")
+    if early_stopping is True:
+        return EarlyStopping(models_to_eval)
+    return early_stopping
 
-            model1, model2 = non_zero_columns
-            # remove the grade
-            model1 = model1[:-6]
-            model2 = model2[:-6]
 
-            model1_rating = ratings[model1]
-            model2_rating = ratings[model2]
+def _scores(models_to_eval, mode, k_factor, samples_per_task):
+    if samples_per_task is not None:
+        return SampleScores(models_to_eval, samples_per_task)
+    return RunningScores(models_to_eval, mode, k_factor)
 
-            model_1_expected_score = 1 / (
-                1 + 10 ** ((model2_rating - model1_rating) / 400)
-            )
 
-            model_2_expected_score = 1 / (
-                1 + 10 ** ((model1_rating - model2_rating) / 400)
-            )
+def _sampled(models_to_eval, mode, early_stopping, samples_per_task):
+    # the models to evaluate, each replaced by its samples when sampling
+    if samples_per_task is None:
+        return models_to_eval
+    if mode != "single":
+        raise ValueError("samples_per_task is only used in single mode")
+    if early_stopping is not None and early_stopping is not False:
+        raise ValueError("samples_per_task can't be used with early_stopping")
+    return sample_models(models_to_eval, samples_per_task)
 
-            model1_score = max(row[f"{model1}.grade"], 0)
-            model2_score = max(row[f"{model2}.grade"], 0)
 
-            model1_new_rating = model1_rating + k_factor * (
-                model1_score - model_1_expected_score
-            )
+def _results(scores, stopping):
+    results = scores.results()
+    if stopping is not None:
+        for result in results:
+            result.update(stopping.summary(result["model"]))
+    return results
 
-            model2_new_rating = model2_rating + k_factor * (
-                model2_score - model_2_expected_score
-            )
 
-            ratings[model1] = model1_new_rating
-            ratings[model2] = model2_new_rating
-
-        for model in models_to_eval:
-            model_results = tasks[f"{model.name}.grade"]
-            results.append(
-                {
-                    "model": model.name,
-                    "score": model_results.sum(),
-                    "elo": ratings[model.name],
-                    "num_matches": np.count_nonzero(
-                        model_results
-                    ),  # number of nonzero elements
-                }
-            )
+def _pair_scheduler(pair_scheduler, models_to_eval, mode):
+    if pair_scheduler is None:
+        return None
+    if mode != "arena":
+        raise ValueError("pair_scheduler is only used in arena mode")
+    if pair_scheduler == "adaptive":
+        return PairScheduler(models_to_eval)
+    if isinstance(pair_scheduler, PairScheduler):
+        return pair_scheduler
+    raise ValueError(f"Unknown pair_scheduler: {pair_scheduler!r}")
+
+
+def _arena_pair(checkpoint, idx, task, models_to_eval, scheduler=None):
+    models = {model.name: model for model in models_to_eval}
+    if scheduler is None:
+        draw = lambda: random.sample(models_to_eval, 2)
+    else:
+        draw = scheduler.next_pair
+    names = _cached(
+        checkpoint,
+        idx,
+        task,
+        "pair",
+        None,
+        lambda: [model.name for model in draw()],
+    )
+    return models[names[0]], models[names[1]]
+
+
+def _arena_grades(model1, model2, arena_result):
+    if arena_result == 1:
+        # then we make it so that the model1 = 1 and model2 = -1
+        return {f"{model1.name}.grade": 1, f"{model2.name}.grade": -1}
+
+    elif arena_result == 2:
+        return {f"{model1.name}.grade": -1, f"{model2.name}.grade": 1}
+
+    else:
+        # raise error
+        raise ValueError(f"Invalid arena result: {arena_result}")
+
+
+def _write_trace(tracer, trace_path):
+    # the spans as JSONL, and the per-stage percentile table beside them
+    tracer.export(trace_path)
+    summary_path = os.path.splitext(trace_path)[0] + ".summary.csv"
+    tracer.summary().to_csv(summary_path, index=False)
+
+
+def _dedup(dedup, task_location, models_to_eval, chunksize, progress, metrics, shard):
+    # a first pass over the task text, to find each row's representative
+    if dedup is None or dedup is False:
+        return None
+    if dedup is True:
+        dedup = TaskDeduplicator()
+    elif not isinstance(dedup, TaskDeduplicator):
+        dedup = TaskDeduplicator(dedup)
+    labels = []
+    for tasks in _task_frames(
+        task_location, models_to_eval, chunksize, progress, metrics, shard
+    ):
+        dedup.add(tasks["tasks"].tolist())
+        labels.append(tasks.index.to_numpy())
+    labels = np.concatenate(labels) if labels else np.array([], dtype=np.int64)
+    result_columns = ["success_criteria", "failure_criteria"] + [
+        f"{model.name}.{column}"
+        for model in models_to_eval
+        for column in ("output", "grade", *GENERATION_METRICS)
+    ]
+    return DuplicateFanOut(dedup, dedup.representatives(), labels, result_columns)
+
+
+def _write_dedup_report(fan_out, models_to_eval, judging_model, mode, results_path):
+    # the calls a duplicate would have made: criteria, generations and judging
+    if mode == "arena":
+        calls = 1 + 2 + 1
+    elif getattr(judging_model, "multi_output", False):
+        calls = 1 + len(models_to_eval) + 1
+    else:
+        calls = 1 + 2 * len(models_to_eval)
+    report = fan_out.deduplicator.report()
+    duplicates = report["exact_duplicates"] + report["near_duplicates"]
+    report["calls_saved"] = duplicates * calls
+    report_path = os.path.splitext(results_path)[0] + ".dedup.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f)
+
+
+def _write_judge_report(judging_model, results_path):
+    # judge call counts and the like for this run, see GradingCascade.report
+    if hasattr(judging_model, "report"):
+        report_path = os.path.splitext(results_path)[0] + ".judge.json"
+        with open(report_path, "w") as f:
+            json.dump(judging_model.report(), f)
+
 
+def _write_results(results, results_path):
     # write results
     with open(results_path, "w") as f:
         json.dump(results, f)
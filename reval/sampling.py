@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import Future
+
+# separates a model's name from the sample number in its sample models' names,
+# and so in their processed task columns, e.g. "gpt-4o#2.grade"
+SAMPLE_SEPARATOR = "#"
+
+
+def sample_models(models_to_eval, k):
+    """
+    Stand-ins for `k` samples of each model, named "<model>#1" to "<model>#k",
+    which Reval evaluates like any other models so every sample is checkpointed
+    and graded on its own.
+
+    A model's k samples for a task row come from one call to its
+    `get_generations(task, k)`, which for most providers is a single request
+    (see LanguageModel.get_generations); the first sample model asked for a row
+    makes the call and the others wait for it. Models without
+    `get_generations` are called k times with `get_generation`, which only
+    gives different samples if they aren't cached.
+    """
+    if k < 1:
+        raise ValueError(f"samples_per_task must be at least 1, got {k}")
+    models = []
+    for model in models_to_eval:
+        generations = _SampledGenerations(model, k)
+        models.extend(_SampleModel(generations, j) for j in range(k))
+    return models
+
+
+def release_row(models_to_eval, row, task):
+    """Drop what sample models still hold for a task row that is done."""
+    for model in models_to_eval:
+        if isinstance(model, _SampleModel) and model.j == 0:
+            model.generations.release(row, task)
+
+
+def sample_name(name):
+    """The model name of a sample model's name, e.g. "gpt-4o" for "gpt-4o#2"."""
+    return name.rsplit(SAMPLE_SEPARATOR, 1)[0]
+
+
+class _SampledGenerations:
+    """
+    The k samples of one model, per task row, shared by its sample models. A
+    row's samples are dropped once each sample model has taken its one, or
+    when Reval is done with the row (see release_row), as on resume some
+    samples come from the checkpoint instead.
+    """
+
+    def __init__(self, model, k):
+        self.model = model
+        self.k = k
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks don't pickle, e.g. into run_sharded workers
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_pending"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def take(self, row, task, j):
+        key = (row, task)
+        with self._lock:
+            entry = self._pending.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._pending[key] = (Future(), set())
+            future, taken = entry
+
+        if owner:
+            try:
+                future.set_result(self._generate(task))
+            except BaseException as e:
+                self._drop(key, entry)
+                future.set_exception(e)
+        samples = future.result()
+
+        with self._lock:
+            taken.add(j)
+            done = len(taken) == self.k
+        if done:
+            self._drop(key, entry)
+        return samples[j]
+
+    def release(self, row, task):
+        with self._lock:
+            self._pending.pop((row, task), None)
+
+    def _drop(self, key, entry):
+        with self._lock:
+            if self._pending.get(key) is entry:
+                del self._pending[key]
+
+    def _generate(self, task):
+        if hasattr(self.model, "get_generations"):
+            return self.model.get_generations(task, self.k)
+        return [self.model.get_generation(task) for _ in range(self.k)]
+
+
+class _SampleModel:
+    """The `j`th sample of a model, see sample_models."""
+
+    def __init__(self, generations, j):
+        self.generations = generations
+        self.j = j
+        model = generations.model
+        self.name = f"{model.name}{SAMPLE_SEPARATOR}{j + 1}"
+        self.model_provider = getattr(model, "model_provider", None)
+
+    def sample(self, row, task):
+        """This sample of the task in row `row` (its index label)."""
+        return self.generations.take(row, task, self.j)
+
+    def get_generation(self, task):
+        return self.sample(None, task)
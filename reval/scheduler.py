@@ -0,0 +1,146 @@
+from statistics import NormalDist
+
+import numpy as np
+
+from .ratings import bradley_terry
+
+
+class PairScheduler:
+    """
+    Chooses arena opponents from the matches played so far, instead of drawing
+    every pair uniformly at random.
+
+    After a warm-up in which every model plays `min_matches` matches, each new
+    match goes to the pair whose order is least certain under the current
+    Bradley–Terry fit: the pair with the highest probability that its two
+    models are ranked the wrong way round, given the fitted ratings and their
+    standard errors (from the Fisher information of the fit). Pairs whose order
+    is already clear stop getting matches.
+
+    The ranking is `stable` once every two neighbouring models in it are
+    separated, jointly at the given `confidence`, or once `max_matches` matches have been
+    played. Reval then skips the remaining tasks, so no generation or judge
+    calls are spent on them.
+
+    Args:
+        models_to_eval (List[LanguageModel]): The models in the arena.
+        confidence (float): Confidence at which all neighbouring models must be
+            separated for the ranking to count as stable.
+        min_matches (int): Matches every model plays before pairs are chosen
+            adaptively.
+        max_matches (int): Optional cap on the total number of matches.
+        seed (int): Seed for tie-breaking and for the order of the two models.
+    """
+
+    def __init__(
+        self,
+        models_to_eval,
+        confidence=0.95,
+        min_matches=5,
+        max_matches=None,
+        seed=0,
+        prior=0.1,
+    ):
+        if len(models_to_eval) < 2:
+            raise ValueError("An arena needs at least two models")
+        self.models = list(models_to_eval)
+        self._positions = {model.name: i for i, model in enumerate(self.models)}
+        self.confidence = confidence
+        self.min_matches = min_matches
+        self.max_matches = max_matches
+        self.prior = prior
+        # Bonferroni over the len(models) - 1 neighbouring pairs, so that the
+        # whole ranking holds at `confidence`, not each comparison on its own
+        alpha = (1 - confidence) / (len(self.models) - 1)
+        self.z = NormalDist().inv_cdf(1 - alpha / 2)
+        self.rng = np.random.default_rng(seed)
+        num_models = len(self.models)
+        self.wins = np.zeros((num_models, num_models), dtype=np.int64)
+        self.num_matches = 0
+        self._fit = None
+        self._strengths = None
+
+    def record(self, model1, model2, model1_won):
+        """Add the outcome of a match between two models."""
+        player1 = self._positions[model1.name]
+        player2 = self._positions[model2.name]
+        if model1_won:
+            self.wins[player1, player2] += 1
+        else:
+            self.wins[player2, player1] += 1
+        self.num_matches += 1
+        self._fit = None
+
+    def next_pair(self):
+        """The (model1, model2) pair to play next, in random order."""
+        played = self.wins.sum(axis=0) + self.wins.sum(axis=1)
+        if played.min() < self.min_matches:
+            # warm-up: the least played model against a random opponent
+            player1 = self.rng.choice(np.flatnonzero(played == played.min()))
+            others = np.delete(np.arange(len(self.models)), player1)
+            player2 = self.rng.choice(others)
+        else:
+            ambiguity = self._ambiguity()
+            # random noise only breaks ties between equally ambiguous pairs
+            ambiguity += self.rng.random(ambiguity.shape) * 1e-9
+            ambiguity[np.tril_indices(len(self.models))] = -1
+            player1, player2 = np.unravel_index(np.argmax(ambiguity), ambiguity.shape)
+
+        if self.rng.random() < 0.5:
+            player1, player2 = player2, player1
+        return self.models[player1], self.models[player2]
+
+    def stable(self):
+        """Whether the current ranking is settled and no more matches are needed."""
+        if self.max_matches is not None and self.num_matches >= self.max_matches:
+            return True
+        played = self.wins.sum(axis=0) + self.wins.sum(axis=1)
+        if played.min() < self.min_matches:
+            return False
+        ratings, covariance = self._fitted()
+        order = np.argsort(ratings)
+        for lower, upper in zip(order[:-1], order[1:]):
+            gap = ratings[upper] - ratings[lower]
+            if gap <= self.z * _difference_sd(covariance, lower, upper):
+                return False
+        return True
+
+    def ranking(self):
+        """Model names from best to worst under the current fit."""
+        ratings, _ = self._fitted()
+        return [self.models[i].name for i in np.argsort(-ratings)]
+
+    def _ambiguity(self):
+        # probability that each pair is ordered the wrong way round
+        ratings, covariance = self._fitted()
+        variances = np.diag(covariance)
+        sd = np.sqrt(
+            np.maximum(variances[:, None] + variances[None, :] - 2 * covariance, 1e-12)
+        )
+        gap = np.abs(ratings[:, None] - ratings[None, :])
+        cdf = np.vectorize(NormalDist().cdf)
+        return cdf(-gap / sd)
+
+    def _fitted(self):
+        # log-strengths of the Bradley–Terry fit and their covariance, the
+        # pseudo-inverse of the Fisher information
+        if self._fit is None:
+            # warm-started from the last fit, which is only a match or so off
+            self._strengths = bradley_terry(
+                self.wins, self.prior, tol=1e-6, strengths=self._strengths
+            )
+            ratings = np.log(self._strengths)
+            num_models = len(self.models)
+            off_diagonal = 1 - np.eye(num_models)
+            games = (self.wins + self.wins.T + 2 * self.prior) * off_diagonal
+            p = 1 / (1 + np.exp(ratings[None, :] - ratings[:, None]))
+            weights = games * p * (1 - p)
+            information = np.diag(weights.sum(axis=1)) - weights
+            self._fit = (ratings, np.linalg.pinv(information))
+        return self._fit
+
+
+def _difference_sd(covariance, i, j):
+    return np.sqrt(
+        max(covariance[i, i] + covariance[j, j] - 2 * covariance[i, j], 1e-12)
+    )
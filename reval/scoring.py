@@ -0,0 +1,192 @@
+import math
+
+import numpy as np
+
+from .ratings import bootstrap_intervals, bradley_terry, elo, pair_counts, to_elo_scale
+from .sampling import SAMPLE_SEPARATOR
+
+
+class RunningScores:
+    """
+    Scores accumulated chunk by chunk, so a run never needs the full tasks frame.
+
+    In "single" mode this is the sum of each model's grades. In "arena" mode it
+    also keeps Elo ratings (updated in row order, exactly as if the rows had been
+    scored in one pass), the number of matches each model played, and a wins
+    matrix from which order-independent Bradley–Terry ratings and bootstrap
+    confidence intervals are computed at the end (see ratings.py).
+    """
+
+    def __init__(
+        self,
+        models_to_eval,
+        mode="single",
+        k_factor=32,
+        bootstrap_rounds=1000,
+        seed=0,
+    ):
+        self.names = [model.name for model in models_to_eval]
+        self.mode = mode
+        self.k_factor = k_factor
+        self.bootstrap_rounds = bootstrap_rounds
+        self.seed = seed
+        self.scores = {name: 0 for name in self.names}
+        self.num_matches = {name: 0 for name in self.names}
+        self.ratings = {name: 1000 for name in self.names}
+        self.wins = np.zeros((len(self.names), len(self.names)), dtype=np.int64)
+
+    def update(self, tasks):
+        # (rows, models) matrix of grades, with missing grades as 0
+        grades = np.column_stack(
+            [
+                tasks[f"{name}.grade"].to_numpy(dtype=np.float64, na_value=0)
+                for name in self.names
+            ]
+        )
+        for name, score, matches in zip(
+            self.names, grades.sum(axis=0), np.count_nonzero(grades, axis=0)
+        ):
+            self.scores[name] += int(score)
+            self.num_matches[name] += int(matches)
+
+        if self.mode == "arena":
+            self._update_elo(grades)
+
+    def _update_elo(self, grades):
+        # every arena row has exactly two non-zero grades: the two models that
+        # played, +1 for the winner and -1 for the loser
+        # drop rows nobody played, such as tasks skipped once the ranking was
+        # stable
+        grades = grades[(grades != 0).any(axis=1)]
+        played = grades != 0
+        per_row = played.sum(axis=1)
+        if (per_row != 2).any():
+            raise ValueError(
+                f"Invalid number of non-zero columns: {per_row[per_row != 2][0]}"
+            )
+        # column positions of the two players, in column order like the old loop
+        players = np.nonzero(played)[1].reshape(-1, 2)
+        model1_won = grades[np.arange(len(grades)), players[:, 0]] > 0
+
+        ratings = elo(
+            players[:, 0],
+            players[:, 1],
+            model1_won,
+            [self.ratings[name] for name in self.names],
+            self.k_factor,
+        )
+        self.ratings = dict(zip(self.names, ratings))
+
+        winners = np.where(model1_won, players[:, 0], players[:, 1])
+        losers = np.where(model1_won, players[:, 1], players[:, 0])
+        self.wins += pair_counts(winners, losers, len(self.names))
+
+    def results(self):
+        results = []
+        if self.mode == "single":
+            # we can just take the sum of model_results per model
+            """
+            [
+                {
+                    "model": model_name<str>,
+                    "score": score<int>
+                }
+            ]
+            """
+            for name in self.names:
+                results.append({"model": name, "score": self.scores[name]})
+
+        elif self.mode == "arena":
+            # elo is the sequential rating; bt_elo is the Bradley–Terry fit on
+            # the same scale, and elo_ci_low/high the bootstrap 95% interval of
+            # the rating on the Elo scale (from the fit, so order-independent),
+            # also given as bt_elo_ci_low/high to say which rating it brackets
+            bt_elo = to_elo_scale(bradley_terry(self.wins))
+            ci_low, ci_high = bootstrap_intervals(
+                self.wins, self.bootstrap_rounds, seed=self.seed
+            )
+            for i, name in enumerate(self.names):
+                results.append(
+                    {
+                        "model": name,
+                        "score": self.scores[name],
+                        "elo": self.ratings[name],
+                        "bt_elo": float(bt_elo[i]),
+                        "elo_ci_low": float(ci_low[i]),
+                        "elo_ci_high": float(ci_high[i]),
+                        "bt_elo_ci_low": float(ci_low[i]),
+                        "bt_elo_ci_high": float(ci_high[i]),
+                        "num_matches": self.num_matches[name],
+                    }
+                )
+        return results
+
+
+class SampleScores:
+    """
+    Scores for single mode runs with `k` samples per task (see sampling.py),
+    accumulated chunk by chunk like RunningScores.
+
+    For each model, over the tasks on which all k of its samples were graded:
+    `score` is the mean score of one sample and `score_std` its standard
+    deviation across the k samples; `pass@1` to `pass@k` are the unbiased
+    pass@j estimates (the chance that at least one of j samples passes), and
+    `within_task_variance` is the mean of p * (1 - p) over tasks, where p is the
+    share of a task's samples that passed, so how much a model's answers to the
+    same task disagree.
+    """
+
+    def __init__(self, models_to_eval, k):
+        self.names = [model.name for model in models_to_eval]
+        self.k = k
+        self.tasks = {name: 0 for name in self.names}
+        self.sample_scores = {name: np.zeros(k) for name in self.names}
+        # tasks by number of passing samples, 0 to k
+        self.passes = {name: np.zeros(k + 1, dtype=np.int64) for name in self.names}
+
+    def update(self, tasks):
+        for name in self.names:
+            grades = np.column_stack(
+                [
+                    tasks[f"{name}{SAMPLE_SEPARATOR}{j + 1}.grade"].to_numpy(
+                        dtype=np.float64, na_value=np.nan
+                    )
+                    for j in range(self.k)
+                ]
+            )
+            grades = grades[~np.isnan(grades).any(axis=1)]
+            self.tasks[name] += len(grades)
+            self.sample_scores[name] += grades.sum(axis=0)
+            self.passes[name] += np.bincount(
+                (grades > 0).sum(axis=1), minlength=self.k + 1
+            )
+
+    def results(self):
+        results = []
+        for name in self.names:
+            tasks = self.tasks[name]
+            scores = self.sample_scores[name]
+            passes = self.passes[name]
+            result = {
+                "model": name,
+                "score": float(scores.mean()),
+                "score_std": float(scores.std(ddof=1)) if self.k > 1 else 0.0,
+                "samples_per_task": self.k,
+                "tasks": tasks,
+            }
+            for j in range(1, self.k + 1):
+                result[f"pass@{j}"] = (
+                    float(passes @ _pass_at(self.k, j)) / tasks if tasks else None
+                )
+            p = np.arange(self.k + 1) / self.k
+            result["within_task_variance"] = (
+                float(passes @ (p * (1 - p))) / tasks if tasks else None
+            )
+            results.append(result)
+        return results
+
+
+def _pass_at(n, k):
+    # the pass@k estimate for a task with c of n samples passing, for c = 0..n:
+    # 1 - C(n - c, k) / C(n, k)
+    return np.array([1 - math.comb(n - c, k) / math.comb(n, k) for c in range(n + 1)])
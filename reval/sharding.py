@@ -0,0 +1,207 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .sampling import SAMPLE_SEPARATOR
+from .scoring import RunningScores, SampleScores
+from .streaming import ResultWriter, iter_task_chunks
+
+# column sharded runs add to their processed tasks: the row's position in the
+# full task file, so merge_shards can put the rows back in order
+TASK_INDEX_COLUMN = "task_index"
+
+
+def shard_of(task, num_shards):
+    """The shard a task belongs to: a stable hash of its text modulo `num_shards`."""
+    digest = hashlib.blake2b(str(task).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def shard_tasks(tasks, shard_index, num_shards):
+    """
+    The rows of a task frame that belong to shard `shard_index`, with their row
+    index saved in TASK_INDEX_COLUMN. Shards depend only on the task text, so
+    every worker and machine splits a suite the same way.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+    shards = np.fromiter(
+        (shard_of(task, num_shards) for task in tasks["tasks"]),
+        dtype=np.int64,
+        count=len(tasks),
+    )
+    tasks = tasks[shards == shard_index].copy()
+    tasks.insert(0, TASK_INDEX_COLUMN, tasks.index)
+    return tasks
+
+
+def shard_path(path, shard_index, num_shards):
+    """`results.csv` -> `results.shard-0-of-4.csv`"""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.shard-{shard_index}-of-{num_shards}{extension}"
+
+
+def merge_shards(
+    shard_paths,
+    models_to_eval,
+    mode="single",
+    processed_tasks_path="processed_tasks.csv",
+    results_path="results.json",
+    k_factor=32,
+    chunksize=10_000,
+    samples_per_task=None,
+):
+    """
+    Combine the processed tasks of sharded runs into one file, in the original
+    row order and without TASK_INDEX_COLUMN, and recompute the scores from it.
+
+    Each shard is streamed in chunks of `chunksize` rows and merged on the row
+    index, so memory use doesn't grow with the size of the run. As the rows are
+    scored in their original order, single-mode sums, Elo ratings and the
+    Bradley–Terry fit are exactly those a single process would have computed from
+    the same processed tasks. Pass the shards' `samples_per_task` to recompute
+    the pass@k results of sampled runs.
+
+    Returns the results, which are also written to `results_path`.
+    """
+    from .reval import _write_results
+
+    if samples_per_task is None:
+        scores = RunningScores(models_to_eval, mode, k_factor)
+        names = [model.name for model in models_to_eval]
+    else:
+        scores = SampleScores(models_to_eval, samples_per_task)
+        names = [
+            f"{model.name}{SAMPLE_SEPARATOR}{j + 1}"
+            for model in models_to_eval
+            for j in range(samples_per_task)
+        ]
+    streams = [
+        iter_task_chunks(path, chunksize)
+        for path in shard_paths
+        # shards that got no tasks may have written nothing
+        if os.path.exists(path) and os.path.getsize(path) > 0
+    ]
+    # grades come back as floats from files with missing grades
+    grades = {f"{name}.grade": "Int8" for name in names}
+    with ResultWriter(processed_tasks_path) as writer:
+        for tasks in _merge_sorted(streams):
+            tasks = tasks.drop(columns=TASK_INDEX_COLUMN).astype(grades)
+            writer.write(tasks)
+            scores.update(tasks)
+    return _write_results(scores.results(), results_path)
+
+
+def _merge_sorted(streams):
+    # k-way merge of chunk streams that are each sorted by TASK_INDEX_COLUMN:
+    # every round emits the rows no unread chunk can come before
+    streams = list(streams)
+    buffers = [None] * len(streams)
+    while True:
+        for i, stream in enumerate(streams):
+            while stream is not None and (buffers[i] is None or buffers[i].empty):
+                buffers[i] = next(stream, None)
+                if buffers[i] is None:
+                    streams[i] = stream = None
+        buffered = [buffer for buffer in buffers if buffer is not None]
+        if not any(len(buffer) for buffer in buffered):
+            return
+        # every shard still being read has rows buffered; the rows up to the
+        # smallest of their last indices are complete
+        last = [
+            buffer[TASK_INDEX_COLUMN].iloc[-1]
+            for buffer, stream in zip(buffers, streams)
+            if stream is not None
+        ]
+        ready = []
+        for i, buffer in enumerate(buffers):
+            if buffer is None or buffer.empty:
+                continue
+            done = buffer[TASK_INDEX_COLUMN].to_numpy() <= min(last, default=np.inf)
+            ready.append(buffer[done])
+            buffers[i] = buffer[~done]
+        merged = pd.concat(ready).sort_values(TASK_INDEX_COLUMN, kind="stable")
+        yield merged.reset_index(drop=True)
+
+
+def run_sharded(
+    num_workers,
+    task_location,
+    models_to_eval,
+    judging_model,
+    criteria_model,
+    mode="single",
+    processed_tasks_path="processed_tasks.csv",
+    results_path="results.json",
+    checkpoint_path=None,
+    criteria_store=True,
+    k_factor=32,
+    **kwargs,
+):
+    """
+    Split a Reval run across `num_workers` local processes, one shard each, then
+    merge their outputs into `processed_tasks_path` and `results_path`.
+
+    Each worker writes its own `*.shard-i-of-n.*` processed tasks, results and
+    checkpoint (so a crashed shard can be resumed on its own), and all workers
+    share one criteria store. Other keyword arguments are passed to Reval, e.g.
+    `concurrency` to also overlap calls within each worker. The models and
+    judges are pickled into the workers, so they must be importable functions
+    or LanguageModels. On other machines, run Reval with the same `num_shards`
+    and each `shard_index`, and call merge_shards on the outputs.
+    """
+    if criteria_store is True:
+        from .criteria_store import criteria_store_path
+
+        criteria_store = criteria_store_path(processed_tasks_path)
+
+    shards = []
+    for shard_index in range(num_workers):
+        shard = dict(
+            kwargs,
+            task_location=task_location,
+            models_to_eval=models_to_eval,
+            judging_model=judging_model,
+            criteria_model=criteria_model,
+            mode=mode,
+            processed_tasks_path=shard_path(
+                processed_tasks_path, shard_index, num_workers
+            ),
+            results_path=shard_path(results_path, shard_index, num_workers),
+            checkpoint_path=(
+                None
+                if checkpoint_path is None
+                else shard_path(checkpoint_path, shard_index, num_workers)
+            ),
+            criteria_store=criteria_store,
+            k_factor=k_factor,
+            shard_index=shard_index,
+            num_shards=num_workers,
+        )
+        shards.append(shard)
+
+    # spawn rather than fork: the parent may have live client and pool threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(num_workers, mp_context=context) as pool:
+        # surface the first failed shard's exception
+        list(pool.map(_run_shard, shards))
+
+    return merge_shards(
+        [shard["processed_tasks_path"] for shard in shards],
+        models_to_eval,
+        mode,
+        processed_tasks_path,
+        results_path,
+        k_factor,
+        samples_per_task=kwargs.get("samples_per_task"),
+    )
+
+
+def _run_shard(kwargs):
+    from .reval import Reval
+
+    return Reval(**kwargs)
@@ -0,0 +1,158 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+
+class EarlyStopping:
+    """
+    Sequential testing for single mode: each model stops getting tasks once its
+    pass rate is known well enough.
+
+    Tasks are visited in a random order, so any prefix of them is a random
+    sample of the suite. A model stops once it has had at least `min_tasks`
+    tasks and either its pass-rate confidence interval (Wilson) is at most
+    `ci_width` wide, or, with a `reference` model, the confidence interval of
+    its paired pass-rate difference to the reference on the tasks both were
+    graded on excludes zero. The reference keeps getting tasks while any other
+    model still needs it.
+
+    The intervals are recomputed after every task and are not widened for
+    that, so treat `confidence` as nominal.
+
+    Args:
+        models_to_eval (List[LanguageModel]): The models being evaluated.
+        ci_width (float): Target width of the pass-rate interval, e.g. 0.05 for
+            a pass rate to within about ±2.5 points.
+        confidence (float): Confidence level of the intervals.
+        reference (LanguageModel | str): Optional baseline to compare against.
+        min_tasks (int): Tasks every model gets before it may stop.
+        seed (int): Seed for the task order.
+    """
+
+    def __init__(
+        self,
+        models_to_eval,
+        ci_width=0.05,
+        confidence=0.95,
+        reference=None,
+        min_tasks=30,
+        seed=0,
+    ):
+        self.names = [model.name for model in models_to_eval]
+        self.reference = getattr(reference, "name", reference)
+        if self.reference is not None and self.reference not in self.names:
+            raise ValueError(f"Reference model {self.reference} is not evaluated")
+        self.ci_width = ci_width
+        self.confidence = confidence
+        self.min_tasks = min_tasks
+        self.z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+        self.rng = np.random.default_rng(seed)
+        self.grades = {name: {} for name in self.names}
+        self.passes = {name: 0 for name in self.names}
+        self.stopped = {name: None for name in self.names}
+        # running sums of the paired differences to the reference
+        self._pairs = {name: [0, 0.0, 0.0] for name in self.names}
+
+    def order(self, num_tasks):
+        """The order in which to visit `num_tasks` tasks."""
+        return self.rng.permutation(num_tasks)
+
+    def active_models(self, models_to_eval):
+        """The models that still need tasks, in their original order."""
+        active = {name: self._active(name) for name in self.names}
+        if self.reference is not None and self.stopped[self.reference] is None:
+            others = any(active[name] for name in self.names if name != self.reference)
+            if not others and self._width(self.reference) <= self.ci_width:
+                self.stopped[self.reference] = "ci_width"
+            active[self.reference] = self.stopped[self.reference] is None
+        return [model for model in models_to_eval if active[model.name]]
+
+    def record(self, model, key, grade):
+        """Add the grade `model` got on the task with row index `key`."""
+        name = model.name
+        if grade is None or pd.isna(grade):
+            return
+        grade = int(grade)
+        if key in self.grades[name]:
+            return
+        self.grades[name][key] = grade
+        self.passes[name] += grade
+        if self.reference is None:
+            return
+        if name == self.reference:
+            for other in self.names:
+                if other != name and key in self.grades[other]:
+                    self._add_pair(other, self.grades[other][key] - grade)
+        elif key in self.grades[self.reference]:
+            self._add_pair(name, grade - self.grades[self.reference][key])
+
+    def summary(self, model_name):
+        """Pass rate, its interval, tasks used and why the model stopped."""
+        grades = self.grades[model_name]
+        low, high = self._interval(model_name)
+        summary = {
+            "pass_rate": self.passes[model_name] / len(grades) if grades else None,
+            "ci_low": low,
+            "ci_high": high,
+            "tasks_used": len(grades),
+            "stopped": self.stopped[model_name],
+        }
+        if self.reference is not None and model_name != self.reference:
+            mean, half = self._difference(model_name)
+            summary["diff_vs_reference"] = mean
+            summary["diff_ci_low"] = None if mean is None else mean - half
+            summary["diff_ci_high"] = None if mean is None else mean + half
+        return summary
+
+    def _active(self, name):
+        if self.stopped[name] is not None:
+            return False
+        if len(self.grades[name]) < self.min_tasks:
+            return True
+        if name == self.reference:
+            # decided in active_models, once the others are done with it
+            return True
+        if self._width(name) <= self.ci_width:
+            self.stopped[name] = "ci_width"
+        elif self.reference is not None and self._decided(name):
+            self.stopped[name] = "reference"
+        return self.stopped[name] is None
+
+    def _interval(self, name):
+        # Wilson score interval of the pass rate
+        n = len(self.grades[name])
+        if n == 0:
+            return 0.0, 1.0
+        p = self.passes[name] / n
+        z2 = self.z**2
+        center = (p + z2 / (2 * n)) / (1 + z2 / n)
+        half = self.z * math.sqrt(p * (1 - p) / n + z2 / (4 * n**2)) / (1 + z2 / n)
+        return center - half, center + half
+
+    def _width(self, name):
+        low, high = self._interval(name)
+        return high - low
+
+    def _add_pair(self, name, difference):
+        pair = self._pairs[name]
+        pair[0] += 1
+        pair[1] += difference
+        pair[2] += difference * difference
+
+    def _difference(self, name):
+        # mean paired difference to the reference and its normal half-width
+        n, total, squares = self._pairs[name]
+        if n == 0:
+            return None, None
+        mean = total / n
+        variance = max(squares / n - mean * mean, 0.0) * n / max(n - 1, 1)
+        return mean, self.z * math.sqrt(variance / n)
+
+    def _decided(self, name):
+        n = self._pairs[name][0]
+        if n < self.min_tasks:
+            return False
+        mean, half = self._difference(name)
+        return abs(mean) > half
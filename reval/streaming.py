@@ -0,0 +1,244 @@
+import os
+
+import pandas as pd
+
+from .language_models import GENERATION_METRICS
+from .scoring import RunningScores
+
+# file formats we can stream tasks from and results to, by extension
+TASK_FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+}
+
+
+def file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in TASK_FORMATS:
+        raise ValueError(
+            f"Unsupported file type {extension!r} for {path}, "
+            f"expected one of {sorted(TASK_FORMATS)}"
+        )
+    return TASK_FORMATS[extension]
+
+
+def iter_task_chunks(task_location, chunksize):
+    """
+    Yield the tasks in `task_location` as DataFrames of at most `chunksize` rows.
+
+    `task_location` may be a CSV, JSONL or Parquet file, or a DataFrame. Only one
+    chunk is held in memory at a time, and row indices keep counting across
+    chunks so they identify a row in the whole file.
+    """
+    if isinstance(task_location, pd.DataFrame):
+        for start in range(0, len(task_location), chunksize):
+            yield task_location.iloc[start : start + chunksize].copy()
+        return
+
+    offset = 0
+    for chunk in _read_chunks(task_location, chunksize):
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+
+def _read_chunks(path, chunksize):
+    kind = file_format(path)
+    if kind == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize)
+    elif kind == "jsonl":
+        yield from pd.read_json(path, lines=True, chunksize=chunksize)
+    elif kind == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+# Parquet compression for processed tasks; model outputs are long text and
+# compress well
+PARQUET_COMPRESSION = "zstd"
+
+
+class ResultWriter:
+    """
+    Writes processed task frames to a CSV, JSONL or Parquet file one chunk at a
+    time, so the full results never have to be held in memory.
+
+    Parquet files get one compressed row group per frame, and columns are
+    stored apart, each model's output, grade and metrics columns next to each
+    other, so read_results and score_results can read just the grades.
+    """
+
+    def __init__(self, path, compression=PARQUET_COMPRESSION):
+        self.path = path
+        self.kind = file_format(path)
+        self.compression = compression
+        self._started = False
+        self._parquet = None
+        self._schema = None
+        self._text_columns = []
+
+    def write(self, tasks):
+        if self.kind == "csv":
+            tasks.to_csv(
+                self.path,
+                mode="a" if self._started else "w",
+                header=not self._started,
+                index=False,
+            )
+        elif self.kind == "jsonl":
+            with open(self.path, "a" if self._started else "w") as f:
+                tasks.to_json(f, orient="records", lines=True)
+        elif self.kind == "parquet":
+            self._write_parquet(tasks)
+        self._started = True
+
+    def _write_parquet(self, tasks):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._parquet is None:
+            # columns that are still all missing in the first chunk (None, or
+            # NaN, which pandas reads empty cells of a sparse column as) have no
+            # real type yet; grades are small ints, latency metrics are numbers
+            # and everything else is text
+            fields = []
+            self._text_columns = []
+            for field in pa.Schema.from_pandas(tasks, preserve_index=False):
+                if tasks[field.name].isna().all():
+                    field = pa.field(field.name, _missing_column_type(field.name))
+                    if pa.types.is_string(field.type):
+                        self._text_columns.append(field.name)
+                fields.append(field)
+            self._schema = pa.schema(fields)
+            self._parquet = pq.ParquetWriter(
+                self.path, self._schema, compression=self.compression
+            )
+        # a column typed as text may hold numbers in later chunks, e.g. a
+        # sparse reference column
+        numbers = [
+            column
+            for column in self._text_columns
+            if pd.api.types.infer_dtype(tasks[column], skipna=True)
+            not in ("string", "empty")
+        ]
+        if numbers:
+            tasks = tasks.copy()
+            for column in numbers:
+                tasks[column] = tasks[column].map(_as_text)
+        self._parquet.write_table(
+            pa.Table.from_pandas(tasks, schema=self._schema, preserve_index=False)
+        )
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        elif not self._started and self.kind == "csv":
+            open(self.path, "w").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _missing_column_type(name):
+    import pyarrow as pa
+
+    suffix = name.rsplit(".", 1)[-1]
+    if suffix == "grade":
+        return pa.int8()
+    if suffix in GENERATION_METRICS:
+        return pa.float64()
+    return pa.string()
+
+
+def _as_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if pd.isna(value):
+        return None
+    # a sparse CSV column of whole numbers is read as floats
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def result_columns(path):
+    """The column names of a processed tasks file, without reading its rows."""
+    kind = file_format(path)
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    if kind == "csv":
+        return list(pd.read_csv(path, nrows=0).columns)
+    return list(next(_read_chunks(path, 1)).columns)
+
+
+def read_results(path, columns=None):
+    """
+    Read `columns` (default: all) of a processed tasks file.
+
+    Parquet files are memory-mapped and only the requested columns are read, so
+    e.g. `read_results(path, grade_columns(path))` doesn't touch the outputs.
+    CSV files are still parsed in full but only the requested columns are
+    kept, and JSONL files are loaded whole.
+    """
+    kind = file_format(path)
+    if kind == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, columns=columns, memory_map=True)
+        # keep grades as nullable ints rather than floats
+        return table.to_pandas(types_mapper={pa.int8(): pd.Int8Dtype()}.get)
+    if kind == "csv":
+        return pd.read_csv(path, usecols=columns)
+    tasks = pd.read_json(path, lines=True)
+    return tasks if columns is None else tasks[columns]
+
+
+def grade_columns(path):
+    """The `{model}.grade` columns of a processed tasks file."""
+    return [column for column in result_columns(path) if column.endswith(".grade")]
+
+
+def score_results(path, models_to_eval, mode="single", k_factor=32, chunksize=100_000):
+    """
+    Recompute the results (single-mode sums, or arena Elo and Bradley–Terry
+    ratings) of a processed tasks file from its grade columns alone, reading
+    `chunksize` rows at a time. For Parquet files this reads only the grade
+    column chunks, through a memory map.
+    """
+    scores = RunningScores(models_to_eval, mode, k_factor)
+    columns = [f"{model.name}.grade" for model in models_to_eval]
+    if file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(
+            batch_size=chunksize, columns=columns
+        )
+        for batch in batches:
+            scores.update(batch.to_pandas())
+    elif file_format(path) == "csv":
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+            scores.update(chunk)
+    else:
+        for chunk in _read_chunks(path, chunksize):
+            scores.update(chunk[columns])
+    return scores.results()
+
+
+def export_results(path, export_path, chunksize=10_000):
+    """
+    Copy a processed tasks file to another format, e.g. a Parquet run to CSV,
+    `chunksize` rows at a time.
+    """
+    with ResultWriter(export_path) as writer:
+        for chunk in _read_chunks(path, chunksize):
+            writer.write(chunk)
@@ -0,0 +1,200 @@
+import itertools
+import json
+import threading
+import time
+
+# USD per million (input, output) tokens, used for the estimated cost of a call.
+# List prices at the time of writing; override or extend with set_prices().
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-sonnet-20240307": (3.00, 15.00),
+    "claude-3-opus-20240229": (15.00, 75.00),
+    "claude-3-5-sonnet-20240620": (3.00, 15.00),
+}
+
+
+def set_prices(prices):
+    """Add or override per-model prices, {model: (input, output)} in USD/1M tokens."""
+    PRICES.update(prices)
+
+
+# price of cached input tokens as a fraction of the input price: OpenAI bills
+# cache hits at half price, Anthropic cache reads at a tenth
+CACHED_INPUT_PRICE = {"gpt": 0.5, "claude": 0.1}
+
+
+def estimate_cost(model, input_tokens, output_tokens, cached_tokens=None):
+    """
+    Estimated USD cost of a call, or None for models without a price.
+    `input_tokens` includes any `cached_tokens`.
+    """
+    if model not in PRICES or input_tokens is None or output_tokens is None:
+        return None
+    input_price, output_price = PRICES[model]
+    cost = input_tokens * input_price + output_tokens * output_price
+    if cached_tokens:
+        discount = next(
+            (
+                fraction
+                for family, fraction in CACHED_INPUT_PRICE.items()
+                if model.startswith(family)
+            ),
+            1.0,
+        )
+        cost -= cached_tokens * input_price * (1 - discount)
+    return cost / 1e6
+
+
+class Tracer:
+    """
+    Collects spans: one record per timed stage (criteria, generation, judge,
+    parse, bookkeeping, and every provider call), with its wall time and any
+    attributes set on it, such as provider, model, queue wait, token usage and
+    estimated cost. Spans opened inside another span on the same thread record
+    it as their parent.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+
+    def span(self, stage, **attributes):
+        return _Span(self, stage, attributes)
+
+    def export(self, path):
+        """Write the spans to `path` as JSONL."""
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w") as f:
+            for span in spans:
+                f.write(json.dumps(span) + "\n")
+
+    def summary(self):
+        """
+        A table with one row per stage and provider: number of spans, p50, p95
+        and p99 wall time and queue wait, total input, cached input and output
+        tokens, and estimated cost.
+        """
+        # imported here so that importing reval (which imports this module)
+        # stays light
+        import numpy as np
+        import pandas as pd
+
+        with self._lock:
+            spans = pd.DataFrame(self.spans)
+        columns = [
+            "input_tokens",
+            "cached_tokens",
+            "output_tokens",
+            "cost_usd",
+            "queue_ms",
+        ]
+        if spans.empty:
+            return pd.DataFrame()
+        spans = spans.reindex(
+            columns=list(spans.columns)
+            + [column for column in columns + ["provider"] if column not in spans]
+        )
+        spans["provider"] = spans["provider"].fillna("")
+
+        rows = []
+        for (stage, provider), group in spans.groupby(["stage", "provider"]):
+            wall = group["wall_ms"].to_numpy(dtype=np.float64)
+            queue = group["queue_ms"].dropna().to_numpy(dtype=np.float64)
+            row = {"stage": stage, "provider": provider, "count": len(group)}
+            for q in (50, 95, 99):
+                row[f"p{q}_ms"] = float(np.percentile(wall, q))
+            for q in (50, 95, 99):
+                row[f"queue_p{q}_ms"] = (
+                    float(np.percentile(queue, q)) if len(queue) else None
+                )
+            row["total_ms"] = float(wall.sum())
+            for column in (
+                "input_tokens",
+                "cached_tokens",
+                "output_tokens",
+                "cost_usd",
+            ):
+                row[column] = group[column].sum(min_count=1)
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+
+class _Span:
+    def __init__(self, tracer, stage, attributes):
+        self.tracer = tracer
+        self.record = {"stage": stage, **attributes}
+
+    def set(self, **attributes):
+        self.record.update(attributes)
+
+    def __enter__(self):
+        stack = getattr(self.tracer._local, "stack", None)
+        if stack is None:
+            stack = self.tracer._local.stack = []
+        self.record["id"] = next(self.tracer._ids)
+        self.record["parent"] = stack[-1] if stack else None
+        self.record["thread"] = threading.get_ident()
+        stack.append(self.record["id"])
+        self.record["start"] = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record["wall_ms"] = (time.perf_counter() - self._start) * 1000
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        self.tracer._local.stack.pop()
+        self.tracer._record(self.record)
+
+
+class _NoSpan:
+    # what span() hands out while tracing is off: no clock reads, no records
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+# process-wide tracer, None while tracing is off
+_tracer = None
+
+
+def span(stage, **attributes):
+    """
+    Time a stage as a context manager, `with span("judge", model=...) as s:`,
+    and `s.set(...)` attributes on it. Costs one global lookup when tracing is
+    off.
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(stage, **attributes)
+
+
+def enable_tracing():
+    """Start recording spans for everything in the process; returns the Tracer."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable_tracing():
+    global _tracer
+    _tracer = None
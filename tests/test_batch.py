@@ -0,0 +1,22 @@
+from reval.batch import run_batch
+from reval.language_models import LanguageModel
+from reval.language_models.cache import ResponseCache
+
+
+def test_batch_round_trip_through_the_openai_batch_api(tmp_path):
+    from fake_openai_server import FakeOpenAIServer
+
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    with FakeOpenAIServer(respond=lambda prompt: f"re: {prompt}") as server:
+        model = LanguageModel(
+            "gpt-4o-mini", api_key="test", base_url=server.base_url, cache=cache
+        )
+        requests = [(f"id-{i}", model, f"Question {i}") for i in range(3)]
+        responses = run_batch(requests, poll_interval=0)
+        assert responses == {f"id-{i}": f"re: Question {i}" for i in range(3)}
+        assert server.batch_requests == 3 and len(server.batches) == 1
+
+        # answered from the cache the batch results were written to
+        assert run_batch(requests, poll_interval=0) == responses
+        assert server.batch_requests == 3 and len(server.batches) == 1
+    cache.close()
@@ -0,0 +1,97 @@
+import importlib
+
+import pandas as pd
+import pytest
+
+from reval.functions import binary_judge_many
+from reval.functions.binary_judge import parse_grades
+from reval.language_models import FakeClient, LanguageModel
+from reval.reval import Reval
+
+# the module, which the package's binary_judge function shadows
+module = importlib.import_module("reval.functions.binary_judge")
+
+
+def _evaluations(*grades):
+    return "".join(
+        f'<evaluation id="{i}"><reasoning>ok</reasoning><grade>{grade}</grade>'
+        "</evaluation>"
+        for i, grade in grades
+    )
+
+
+def test_parse_grades_in_output_order():
+    assert parse_grades(_evaluations((2, 0), (1, 1), (3, 1)), 3) == [1, 0, 1]
+
+
+@pytest.mark.parametrize(
+    "raw_response",
+    [
+        _evaluations((1, 1)),
+        _evaluations((1, 1), (1, 0), (2, 1)),
+        _evaluations((1, 1), (2, 1), (3, 0)),
+        '<evaluation id="1"><grade>1</grade><grade>0</grade></evaluation>'
+        + _evaluations((2, 1)),
+    ],
+    ids=["missing", "repeated", "extra", "two grades"],
+)
+def test_parse_grades_rejects_malformed_responses(raw_response):
+    with pytest.raises(ValueError):
+        parse_grades(raw_response, 2)
+
+
+def _judge_with(monkeypatch, respond):
+    client = FakeClient(respond=respond)
+    multi = LanguageModel("fake:multi", cache=False)
+    single = LanguageModel("fake:single", cache=False)
+    multi.client = single.client = client
+    monkeypatch.setattr(module, "multi_judge_model", lambda: multi)
+    monkeypatch.setattr(module, "judge_model", lambda: single)
+    return client
+
+
+def test_one_judge_call_grades_every_output(monkeypatch):
+    client = _judge_with(monkeypatch, FakeClient().canned_response)
+    grades = binary_judge_many("Task?", "S.", "F.", ["a", "b", "c"])
+    assert len(grades) == 3 and set(grades) <= {0, 1}
+    assert client.requests == 1
+
+
+def test_malformed_responses_fall_back_to_one_call_per_output(monkeypatch):
+    def respond(prompt):
+        if "<model_outputs>" in prompt:
+            return _evaluations((1, 1))
+        return "<evaluation><reasoning>ok</reasoning><grade>0</grade></evaluation>"
+
+    client = _judge_with(monkeypatch, respond)
+    assert binary_judge_many("Task?", "S.", "F.", ["a", "b"]) == [0, 0]
+    assert client.requests == 3
+
+
+def test_reval_makes_one_judge_call_per_task(tmp_path):
+    calls = []
+
+    def judge(task, success_criteria, failure_criteria, model_outputs):
+        calls.append(list(model_outputs))
+        return [int("a" in output) for output in model_outputs]
+
+    judge.multi_output = True
+
+    class Model:
+        def __init__(self, name):
+            self.name = name
+
+        def get_generation(self, task):
+            return f"{self.name} on {task}"
+
+    results = Reval(
+        pd.DataFrame({"tasks": ["one", "two"]}),
+        [Model("a"), Model("b")],
+        judge,
+        lambda task, success, failure, good, bad: ("1. Yes.", "1. No."),
+        processed_tasks_path=str(tmp_path / "processed.csv"),
+        results_path=str(tmp_path / "results.json"),
+        criteria_store=False,
+    )
+    assert calls == [["a on one", "b on one"], ["a on two", "b on two"]]
+    assert {result["model"]: result["score"] for result in results} == {"a": 2, "b": 0}
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from reval.buffers import ResultBuffer
+
+
+def _frame():
+    return pd.DataFrame(
+        {
+            "tasks": ["a", "b", "c"],
+            "good_output": ["good a", None, None],
+            "success_criteria": ["kept", None, None],
+            "failure_criteria": ["kept", None, None],
+            "m.output": ["earlier output", None, None],
+            "m.grade": pd.array([1, None, None], dtype="Int8"),
+        },
+        index=[7, 8, 9],
+    )
+
+
+def test_rows_read_inputs_in_order():
+    buffer = ResultBuffer(_frame(), [SimpleNamespace(name="m")])
+    rows = list(buffer.rows(order=[2, 0]))
+    assert [row[:3] for row in rows] == [(2, 9, "c"), (0, 7, "a")]
+    assert rows[1][3:6] == ("kept", "kept", "good a")
+    # bad_output isn't a column, so it's None for every row
+    assert rows[0][6] is None
+
+
+def test_materialize_keeps_skipped_rows_and_grade_dtype():
+    buffer = ResultBuffer(_frame(), [SimpleNamespace(name="m")])
+    buffer.update(1, {"m.output": "new output", "m.grade": 0})
+    buffer.set(2, "m.grade", np.nan)
+    tasks = buffer.materialize()
+
+    assert tasks["m.output"].tolist() == ["earlier output", "new output", None]
+    assert tasks["m.grade"].dtype == "Int8"
+    assert tasks["m.grade"].tolist() == [1, 0, pd.NA]
+    assert list(tasks.index) == [7, 8, 9]
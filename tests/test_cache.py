@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+from reval.language_models import cache as cache_module
+from reval.language_models.cache import ResponseCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_size_bytes=100)
+    for key in "abc":
+        clock.now += 1
+        cache.put(key, key * 30)
+    clock.now += 1
+    assert cache.get("a") == "a" * 30
+
+    clock.now += 1
+    cache.put("d", "d" * 30)
+    # over the cap: b, the least recently used, goes, down to 90 bytes
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a" * 30, "c" * 30, "d" * 30]
+    assert cache.stats()["size_bytes"] == 90 and cache.stats()["entries"] == 3
+    cache.close()
+
+
+def test_old_entries_expire(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_age=60)
+    cache.put("old", "response")
+    clock.now += 30
+    cache.put("new", "response")
+    assert cache.get("old") == "response"
+
+    clock.now += 31
+    assert cache.get("old") is None
+    assert cache.get("new") == "response"
+    assert cache.stats()["entries"] == 1 and cache.stats()["size_bytes"] == 8
+    cache.close()
+
+
+def test_read_only_serves_hits_and_writes_nothing(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    writer = ResponseCache(path)
+    writer.put("key", "response")
+    writer.close()
+
+    reader = ResponseCache(path, read_only=True, max_age=10)
+    reader.put("other", "response")
+    reader.clear()
+    assert reader.get("key") == "response"
+    clock.now += 60
+    # expired, but read-only caches don't delete it
+    assert reader.get("key") is None
+    reader.close()
+
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT key FROM responses").fetchall() == [("key",)]
@@ -0,0 +1,97 @@
+import json
+
+import pandas as pd
+
+from reval.functions import GradingCascade, binary_judge_many
+from reval.language_models.language_models import prompt_text
+from reval.language_models import LanguageModel
+from reval.reval import Reval
+
+
+def judge(task, success_criteria, failure_criteria, model_output):
+    return 0
+
+
+def criteria(task, success_criteria, failure_criteria, good_output, bad_output):
+    return "1. Names the capital.", "1. Names another city."
+
+
+def test_multi_output_batch_request_covers_only_undecided_outputs():
+    cascade = GradingCascade(binary_judge_many)
+    tasks = pd.DataFrame({"tasks": ["Capital of France?"], "reference": ["Paris"]})
+    cascade.set_references(tasks)
+    outputs = ["Paris", "Berlin", "Rome"]
+
+    prompt, parse = cascade.for_row(0).batch_request(
+        "Capital of France?", "1. Correct.", "1. Wrong.", outputs
+    )
+
+    text = prompt_text(prompt)
+    assert "Berlin" in text and "Rome" in text and '<model_output id="3">' not in text
+    raw = "".join(
+        f'<evaluation id="{i}"><grade>{grade}</grade></evaluation>'
+        for i, grade in ((1, 0), (2, 1))
+    )
+    assert parse(raw) == [1, 0, 1]
+    assert cascade.stats["exact_match"] == 1 and cascade.stats["judge_calls"] == 1
+
+
+def test_batch_request_is_none_when_the_checkers_decide():
+    cascade = GradingCascade(binary_judge_many)
+    cascade.set_references(
+        pd.DataFrame({"tasks": ["Capital of France?"], "reference": ["Paris"]})
+    )
+    assert cascade.for_row(0).batch_request(
+        "Capital of France?", "", "", ["Paris"]
+    ) == (
+        None,
+        None,
+    )
+
+
+def test_rows_with_the_same_task_use_their_own_references():
+    cascade = GradingCascade(judge)
+    cascade.set_references(
+        pd.DataFrame(
+            {
+                "tasks": ["Name a primary colour.", "Name a primary colour."],
+                "reference_regex": ["(?i)red", "(?i)blue"],
+            },
+            index=[10, 11],
+        )
+    )
+    grade = lambda idx, output: cascade.for_row(idx)(
+        "Name a primary colour.", "", "", output
+    )
+    assert (grade(10, "Red"), grade(10, "Blue")) == (1, 0)
+    assert (grade(11, "Red"), grade(11, "Blue")) == (0, 1)
+    # called directly, references are passed in
+    assert (
+        cascade("Name one.", "", "", "Red", references={"reference_regex": "Red"}) == 1
+    )
+
+
+def test_report_covers_one_run(tmp_path):
+    cascade = GradingCascade(judge)
+    tasks = pd.DataFrame(
+        {
+            "tasks": ["Capital of France?", "Capital of Spain?"],
+            "reference": ["Paris", None],
+        }
+    )
+    models = [LanguageModel("fake:a", cache=False)]
+    results_path = tmp_path / "results.json"
+    reports = []
+    for _ in range(2):
+        Reval(
+            tasks.copy(),
+            models,
+            cascade,
+            criteria,
+            processed_tasks_path=str(tmp_path / "processed.csv"),
+            results_path=str(results_path),
+            criteria_store=False,
+        )
+        reports.append(json.load(open(tmp_path / "results.judge.json")))
+    assert reports[0] == reports[1]
+    assert reports[0]["outputs"] == 2
@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from reval.checkpoint import MISSING, Checkpoint
+from reval.reval import Reval
+
+
+class _Model:
+    name = "model"
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = []
+
+    def get_generation(self, task):
+        if task == self.fail_on:
+            raise RuntimeError("crashed")
+        self.calls.append(task)
+        return f"{task} answered in run {self.run}"
+
+
+def judge(task, success_criteria, failure_criteria, model_output):
+    return 1
+
+
+def criteria(task, success_criteria, failure_criteria, good_output, bad_output):
+    return "1. Answers.", "1. Doesn't answer."
+
+
+def test_resume_after_a_crash_only_runs_what_is_missing(tmp_path):
+    tasks = pd.DataFrame({"tasks": [f"Task {i}" for i in range(5)]})
+    paths = dict(
+        processed_tasks_path=str(tmp_path / "processed.csv"),
+        results_path=str(tmp_path / "results.json"),
+        checkpoint_path=str(tmp_path / "checkpoint.jsonl"),
+        criteria_store=False,
+    )
+    crashing = _Model(fail_on="Task 3")
+    crashing.run = 1
+    with pytest.raises(RuntimeError):
+        Reval(tasks.copy(), [crashing], judge, criteria, **paths)
+
+    resumed = _Model()
+    resumed.run = 2
+    Reval(tasks.copy(), [resumed], judge, criteria, resume=True, **paths)
+
+    assert crashing.calls == ["Task 0", "Task 1", "Task 2"]
+    assert resumed.calls == ["Task 3", "Task 4"]
+    processed = pd.read_csv(tmp_path / "processed.csv")
+    assert list(processed["model.output"]) == [
+        f"Task {i} answered in run {1 if i < 3 else 2}" for i in range(5)
+    ]
+
+
+def test_torn_lines_and_changed_tasks_are_not_reused(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = Checkpoint(str(path))
+    checkpoint.record(0, "Task 0", "output", "kept", model="model")
+    checkpoint.record(1, "Task 1", "output", "changed", model="model")
+    checkpoint.close()
+    with open(path, "a") as f:
+        f.write('{"row": 2, "task": "')  # a crash mid-write
+
+    resumed = Checkpoint(str(path), resume=True)
+    try:
+        assert resumed.get(0, "Task 0", "output", "model") == "kept"
+        assert resumed.get(1, "Task 1, edited", "output", "model") is MISSING
+        assert resumed.get(2, "Task 2", "output", "model") is MISSING
+        resumed.record(2, "Task 2", "output", "new", model="model")
+    finally:
+        resumed.close()
+    reread = Checkpoint(str(path), resume=True)
+    reread.close()
+    assert reread.get(2, "Task 2", "output", "model") == "new"
+
+
+def test_an_existing_log_is_not_overwritten_without_resume(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = Checkpoint(str(path))
+    checkpoint.record(0, "Task 0", "output", "paid for", model="model")
+    checkpoint.close()
+
+    with pytest.raises(FileExistsError):
+        Checkpoint(str(path))
+    assert path.read_text().count("paid for") == 1
+
+    fresh = Checkpoint(str(path), overwrite=True)
+    fresh.close()
+    assert path.read_text() == ""
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from reval.language_models import LanguageModel, clients
+from reval.language_models.clients import (
+    get_client,
+    load_sdk,
+    register_provider,
+    set_pool_size,
+)
+
+
+def test_models_share_a_client_per_credentials_and_endpoint():
+    pytest.importorskip("openai")
+    first = LanguageModel("gpt-4o-mini", api_key="key-1", cache=False)
+    second = LanguageModel("gpt-4o", api_key="key-1", cache=False)
+    other_key = LanguageModel("gpt-4o-mini", api_key="key-2", cache=False)
+    other_url = LanguageModel(
+        "gpt-4o-mini", api_key="key-1", base_url="http://127.0.0.1:1/v1", cache=False
+    )
+    assert first.client is second.client
+    assert first.client is not other_key.client
+    assert first.client is not other_url.client
+    # the SDK's own retries are off; the RateLimiter retries
+    assert first.client.max_retries == 0
+
+
+def test_set_pool_size_builds_new_clients(monkeypatch):
+    pytest.importorskip("openai")
+    monkeypatch.setattr(clients, "_pool_size", clients._pool_size)
+    before = get_client("openai", "pool-key")
+    set_pool_size(8)
+    after = get_client("openai", "pool-key")
+    assert after is not before and after is get_client("openai", "pool-key")
+
+
+def test_unknown_and_missing_providers(monkeypatch):
+    with pytest.raises(NameError):
+        get_client("nope")
+    monkeypatch.setitem(clients._PROVIDERS, "local", None)
+    register_provider("local", "reval_missing_sdk", "Client", "LOCAL_API_KEY")
+    with pytest.raises(ImportError, match="pip install reval_missing_sdk"):
+        load_sdk("local")
+
+
+def test_importing_reval_loads_no_provider_sdk():
+    # in a fresh interpreter, since this one may have loaded them already
+    code = (
+        "import sys, reval, reval.language_models; "
+        "print(sorted({'openai', 'anthropic', 'together', 'httpx'} & set(sys.modules)))"
+    )
+    root = os.path.join(os.path.dirname(__file__), "..")
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == "[]"
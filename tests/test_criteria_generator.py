@@ -0,0 +1,60 @@
+import importlib
+
+import pandas as pd
+
+from reval.functions.criteria_generator import (
+    criteria_generator,
+    criteria_prompt_parts,
+)
+from reval.language_models import LanguageModel
+
+# the module, which the package's criteria_generator function shadows
+module = importlib.import_module("reval.functions.criteria_generator")
+
+NAN = float("nan")
+
+
+def test_nan_examples_count_as_missing():
+    assert criteria_prompt_parts("Task?", NAN, NAN, NAN, NAN) == (
+        criteria_prompt_parts("Task?")
+    )
+    assert criteria_prompt_parts("Task?", None, None, "Good.", NAN) == (
+        criteria_prompt_parts("Task?", good_example="Good.")
+    )
+
+
+def test_both_examples_are_in_the_query():
+    instructions, query = criteria_prompt_parts(
+        "Task?", good_example="Good.", bad_example="Bad."
+    )
+    assert "a good and a bad example" in instructions
+    assert "Good." in query and "Bad." in query
+
+
+def test_none_only_when_both_criteria_are_given():
+    assert criteria_prompt_parts("Task?", "Success.", "Failure.") is None
+    instructions, query = criteria_prompt_parts("Task?", "Success.", NAN)
+    assert "generating failure criteria" in instructions and "Success." in query
+
+
+def test_sparse_csv_rows_get_generated_criteria(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        module, "criteria_model", lambda: LanguageModel("fake:criteria", cache=False)
+    )
+    path = tmp_path / "tasks.csv"
+    path.write_text("tasks,good_output,bad_output\nTask one?,Good.,\nTask two?,,\n")
+    tasks = pd.read_csv(path)
+
+    for row in tasks.itertuples():
+        success, failure = criteria_generator(
+            row.tasks, NAN, NAN, row.good_output, row.bad_output
+        )
+        assert isinstance(success, str) and "completes the task" in success
+        assert isinstance(failure, str) and "ignores the task" in failure
+
+
+def test_given_criteria_are_passed_through():
+    assert criteria_generator("Task?", "Success.", "Failure.") == (
+        "Success.",
+        "Failure.",
+    )
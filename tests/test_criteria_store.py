@@ -0,0 +1,81 @@
+import functools
+
+import pandas as pd
+import pytest
+
+from reval.criteria_store import CriteriaStore, fill_criteria
+from reval.functions.criteria_generator import parse_criteria
+
+
+class _Model:
+    def get_generation(self, prompt):
+        if "Berlin" in prompt:
+            return "I can't write criteria for this."
+        return (
+            "<success_criteria>1. Names Paris.</success_criteria>"
+            "<failure_criteria>1. Names another city.</failure_criteria>"
+        )
+
+
+def criteria(task, success_criteria, failure_criteria, good_output, bad_output):
+    criteria.calls.append(task)
+    return "1. Direct.", "1. Direct failure."
+
+
+criteria.calls = []
+criteria.model_name = "fake:criteria"
+criteria.prompt = lambda task, *args: task
+criteria.parse = parse_criteria
+criteria.language_model = _Model
+
+
+def test_batched_criteria_fall_back_on_malformed_responses(tmp_path):
+    tasks = pd.DataFrame(
+        {"tasks": ["Capital of France?", "Capital of Germany? (Berlin)"]}
+    )
+    with CriteriaStore(tmp_path / "criteria.sqlite") as store:
+        generated = fill_criteria(tasks, criteria, store, poll_interval=0)
+
+    assert generated == 2
+    assert criteria.calls == ["Capital of Germany? (Berlin)"]
+    assert list(tasks["success_criteria"]) == ["1. Names Paris.", "1. Direct."]
+    assert list(tasks["failure_criteria"]) == [
+        "1. Names another city.",
+        "1. Direct failure.",
+    ]
+
+
+def test_missing_criteria_are_not_stored(tmp_path):
+    results = iter([(None, None), ("1. Kept.", "1. Kept failure.")])
+    calls = []
+
+    def flaky(task, success_criteria, failure_criteria, good, bad):
+        calls.append((success_criteria, good, bad))
+        return next(results)
+
+    with CriteriaStore(tmp_path / "criteria.sqlite") as store:
+        stored = store.wrap(flaky)
+        nan = float("nan")
+        assert stored("Task?", nan, nan, nan, None) == (None, None)
+        assert stored("Task?", nan, nan, nan, None) == ("1. Kept.", "1. Kept failure.")
+        assert stored("Task?", None, None, None, None) == (
+            "1. Kept.",
+            "1. Kept failure.",
+        )
+    # NaN inputs reach the generator as None
+    assert calls == [(None, None, None), (None, None, None)]
+
+
+def test_generators_with_the_same_name_get_their_own_entries(tmp_path):
+    first = lambda *args: ("1. First.", "1. First failure.")
+    second = lambda *args: ("1. Second.", "1. Second failure.")
+    with CriteriaStore(tmp_path / "criteria.sqlite") as store:
+        assert store.wrap(first)("Task?", None, None, None, None)[0] == "1. First."
+        assert store.wrap(second)("Task?", None, None, None, None)[0] == "1. Second."
+
+
+def test_generators_without_code_are_not_stored():
+    generator = functools.partial(criteria, success_criteria=None)
+    assert not CriteriaStore.can_store(generator)
+    with pytest.raises(ValueError):
+        CriteriaStore.key(generator, "Task?", None, None, None, None)
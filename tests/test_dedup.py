@@ -0,0 +1,133 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reval.dedup import DUPLICATE_OF_COLUMN, DuplicateFanOut, TaskDeduplicator
+from reval.reval import Reval
+
+FRANCE = "What is the capital of France? Answer in one word."
+
+
+def _representatives(texts, **kwargs):
+    deduplicator = TaskDeduplicator(**kwargs)
+    deduplicator.add(texts)
+    return deduplicator, list(deduplicator.representatives())
+
+
+def test_exact_and_near_duplicates_are_grouped():
+    texts = [
+        FRANCE,
+        "Name a prime number larger than one hundred.",
+        "  what is the CAPITAL of france?   Answer in one word.",
+        "What is the capital of France? Answer in one word!",
+        None,
+        "Name a prime number larger than one hundred.",
+    ]
+    deduplicator, representatives = _representatives(texts)
+    assert representatives == [0, 1, 0, 0, 4, 1]
+    assert deduplicator.exact_duplicates == 2
+    assert deduplicator.near_duplicates == 1
+    assert deduplicator.report()["rows"] == 6
+
+
+def test_threshold_boundary():
+    edited = "What is the capital of France? Answer in a single word."
+    deduplicator = TaskDeduplicator()
+    similarity = np.mean(
+        deduplicator.signature(" ".join(FRANCE.casefold().split()))
+        == deduplicator.signature(" ".join(edited.casefold().split()))
+    )
+    assert 0.3 < similarity < 1
+
+    # LSH finds pairs comfortably above the threshold, and the signature
+    # comparison rejects every pair below it
+    _, below = _representatives([FRANCE, edited], threshold=similarity - 0.1)
+    _, above = _representatives([FRANCE, edited], threshold=similarity + 1 / 64)
+    assert below == [0, 0] and above == [0, 1]
+    # exact duplicates only
+    _, exact = _representatives([FRANCE, edited, FRANCE.upper()], threshold=1.0)
+    assert exact == [0, 1, 0]
+
+
+def test_invalid_threshold():
+    with pytest.raises(ValueError):
+        TaskDeduplicator(threshold=0)
+
+
+def _evaluated(tasks):
+    # what Reval gives fan_out for the rows it evaluated
+    evaluated = tasks.copy()
+    evaluated["m.output"] = [f"answer to {task}" for task in tasks["tasks"]]
+    evaluated["m.grade"] = pd.array(
+        [len(task) % 2 for task in tasks["tasks"]], dtype="Int8"
+    )
+    return evaluated
+
+
+def test_fan_out_across_frames():
+    texts = [FRANCE, "Name a colour.", FRANCE, "Name a colour.", FRANCE]
+    tasks = pd.DataFrame({"tasks": texts}, index=[10, 11, 12, 13, 14])
+    frames = [tasks.iloc[:2], tasks.iloc[2:4], tasks.iloc[4:]]
+    deduplicator = TaskDeduplicator()
+    for frame in frames:
+        deduplicator.add(frame["tasks"].tolist())
+    fan_out = DuplicateFanOut(
+        deduplicator,
+        deduplicator.representatives(),
+        tasks.index.to_numpy(),
+        ["m.output", "m.grade"],
+    )
+
+    outputs = []
+    for frame in frames:
+        frame = frame.assign(
+            **{"m.output": None, "m.grade": pd.array([None] * len(frame), "Int8")}
+        )
+        selected = fan_out.select(frame)
+        outputs.append(fan_out.fan_out(frame, _evaluated(selected)))
+    processed = pd.concat(outputs)
+
+    assert list(processed["m.output"]) == [f"answer to {text}" for text in texts]
+    assert processed["m.grade"].dtype == "Int8"
+    assert list(processed["m.grade"]) == [len(text) % 2 for text in texts]
+    assert processed[DUPLICATE_OF_COLUMN].dtype == "Int64"
+    assert processed[DUPLICATE_OF_COLUMN].tolist() == [pd.NA, pd.NA, 10, 11, 10]
+    # nothing is held once the last duplicate has been filled in
+    assert fan_out._saved == {}
+
+
+class _Model:
+    name = "m"
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_generation(self, task):
+        self.calls += 1
+        return f"answer to {task}"
+
+
+def test_reval_evaluates_each_group_once(tmp_path):
+    near = "What is the capital of France? Answer in one word!"
+    texts = [FRANCE, "Name a colour.", FRANCE.lower(), "Name a colour.", near]
+    pd.DataFrame({"tasks": texts}).to_csv(tmp_path / "tasks.csv", index=False)
+    model = _Model()
+    Reval(
+        str(tmp_path / "tasks.csv"),
+        [model],
+        lambda task, success, failure, output: 1,
+        lambda task, success, failure, good, bad: ("1. Answers.", "1. Doesn't."),
+        processed_tasks_path=str(tmp_path / "processed.csv"),
+        results_path=str(tmp_path / "results.json"),
+        chunksize=2,
+        dedup=True,
+        criteria_store=False,
+    )
+
+    assert model.calls == 2
+    processed = pd.read_csv(tmp_path / "processed.csv")
+    assert processed[DUPLICATE_OF_COLUMN].tolist()[2:] == [0, 1, 0]
+    report = json.load(open(tmp_path / "results.dedup.json"))
+    assert (report["exact_duplicates"], report["near_duplicates"]) == (2, 1)
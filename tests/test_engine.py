@@ -0,0 +1,140 @@
+import asyncio
+import gc
+import json
+import random
+
+import pandas as pd
+import pytest
+
+from reval.engine import Engine
+from reval.functions.binary_judge import (
+    judge_prompt_parts,
+    multi_judge_prompt_parts,
+    parse_grade,
+    parse_grades,
+)
+from reval.functions.criteria_generator import criteria_prompt_parts, parse_criteria
+from reval.language_models import (
+    LanguageModel,
+    get_model,
+    rate_limit,
+    set_inflight_limits,
+)
+from reval.reval import Reval
+
+JUDGE = "fake:judge"
+
+
+# binary_judge, binary_judge_many and criteria_generator pointed at the fake
+# provider, like benchmarks/bench_pipeline.py
+def judge(task, success_criteria, failure_criteria, model_output):
+    query = judge_prompt_parts(task, success_criteria, failure_criteria, model_output)
+    return parse_grade(get_model(JUDGE, role="judge").get_generation(query))
+
+
+def judge_many(task, success_criteria, failure_criteria, model_outputs):
+    query = multi_judge_prompt_parts(
+        task, success_criteria, failure_criteria, model_outputs
+    )
+    model = get_model(JUDGE, role="judge", stop=("</evaluations>",))
+    return parse_grades(model.get_generation(query), len(model_outputs))
+
+
+judge_many.multi_output = True
+
+
+def arena_judge(task, success_criteria, failure_criteria, output1, output2):
+    output = f"Response 1:\n{output1}\n\nResponse 2:\n{output2}"
+    query = judge_prompt_parts(task, success_criteria, failure_criteria, output)
+    raw_response = get_model(JUDGE, role="judge").get_generation(query)
+    return 1 if parse_grade(raw_response) else 2
+
+
+def criteria(task, success_criteria, failure_criteria, good_example, bad_example):
+    query = criteria_prompt_parts(
+        task, success_criteria, failure_criteria, good_example, bad_example
+    )
+    if query is None:
+        return success_criteria, failure_criteria
+    raw_response = get_model(JUDGE, role="criteria").get_generation(query)
+    return parse_criteria(raw_response, success_criteria, failure_criteria)
+
+
+@pytest.mark.parametrize(
+    "mode, judging_model",
+    [("single", judge), ("arena", arena_judge), ("single", judge_many)],
+    ids=["single", "arena", "multi-output"],
+)
+def test_concurrent_runs_match_the_sequential_path(tmp_path, mode, judging_model):
+    tasks = pd.DataFrame({"tasks": [f"Write a haiku about {i}." for i in range(24)]})
+    models = [LanguageModel(f"fake:model-{i}", cache=False) for i in range(3)]
+    runs = []
+    for concurrency in (None, 1, 8):
+        paths = {
+            "processed_tasks_path": str(tmp_path / f"processed-{concurrency}.csv"),
+            "results_path": str(tmp_path / f"results-{concurrency}.json"),
+        }
+        # arena pairs are drawn in row order on both paths
+        random.seed(0)
+        Reval(
+            tasks.copy(),
+            models,
+            judging_model,
+            criteria,
+            mode=mode,
+            concurrency=concurrency,
+            criteria_store=False,
+            **paths,
+        )
+        runs.append(
+            (
+                pd.read_csv(paths["processed_tasks_path"]),
+                json.load(open(paths["results_path"])),
+            )
+        )
+
+    sequential_tasks, sequential_results = runs[0]
+    for processed, results in runs[1:]:
+        pd.testing.assert_frame_equal(processed, sequential_tasks)
+        assert results == sequential_results
+
+
+def test_close_restores_the_previous_inflight_limits():
+    previous = set_inflight_limits({"openai": 4})
+    try:
+        outer = rate_limit._inflight_limits["openai"]
+        engine = Engine(2, {"claude": 1})
+        assert set(rate_limit._inflight_limits) == {"claude"}
+        engine.close()
+        assert rate_limit._inflight_limits == {"openai": outer}
+    finally:
+        set_inflight_limits(previous)
+
+
+def test_failed_rows_are_retrieved_and_siblings_cancelled():
+    engine = Engine(4)
+    cancelled = []
+    unretrieved = []
+
+    async def evaluate_row(idx, row):
+        if idx < 2:
+            raise RuntimeError(f"row {idx}")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(idx)
+            raise
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda loop, context: unretrieved.append(context))
+        with pytest.raises(RuntimeError):
+            await engine.map_rows(((i, None) for i in range(4)), evaluate_row)
+
+    try:
+        asyncio.run(main())
+        gc.collect()
+    finally:
+        engine.close()
+    assert sorted(cancelled) == [2, 3]
+    assert unretrieved == []
@@ -0,0 +1,79 @@
+import pytest
+
+from reval.functions.binary_judge import parse_grade, parse_grades
+from reval.functions.criteria_generator import parse_criteria
+from reval.language_models import LanguageModel, fake
+from reval.language_models.fake import (
+    FakeClient,
+    FakeProviderError,
+    configure_fake_provider,
+)
+
+
+def _ask(client, prompt, **params):
+    raw = client.chat.completions.with_raw_response.create(
+        model="model", messages=[{"role": "user", "content": prompt}], **params
+    )
+    return raw.parse().choices[0].message.content, raw.headers
+
+
+def test_responses_depend_only_on_the_prompt():
+    first, second = FakeClient(), FakeClient(seed=7)
+    for prompt in ("Explain hashing.", "Grade it. <grade>"):
+        assert _ask(first, prompt, temperature=0) == _ask(second, prompt, temperature=0)
+    answer, _ = _ask(first, "Explain hashing.")
+    assert len(answer.split()) == first.output_tokens
+    assert _ask(first, "Explain sorting.")[0] != answer
+
+
+def test_canned_responses_parse():
+    client = FakeClient()
+    assert parse_grade(_ask(client, "Grade it. <grade>", temperature=0)[0]) in (0, 1)
+    multi = 'Grade each. <model_output id="1">a</model_output><model_output id="2">b'
+    assert len(parse_grades(_ask(client, multi, temperature=0)[0], 2)) == 2
+    success, failure = parse_criteria(
+        _ask(client, "Write <success_criteria> and <failure_criteria>.")[0],
+        None,
+        None,
+    )
+    assert success and failure
+
+
+def test_pass_rate_sets_the_share_of_passing_grades():
+    client = FakeClient(pass_rate=0.8)
+    grades = [
+        parse_grade(_ask(client, f"Grade answer {i}. <grade>", temperature=0)[0])
+        for i in range(400)
+    ]
+    assert 0.7 < sum(grades) / len(grades) < 0.9
+
+
+def test_injected_errors():
+    with pytest.raises(FakeProviderError) as error:
+        _ask(FakeClient(error_rate=1.0), "Explain hashing.")
+    assert error.value.status_code == 500
+
+    with pytest.raises(FakeProviderError) as error:
+        _ask(FakeClient(rate_limit_rate=1.0, retry_after=2), "Explain hashing.")
+    assert error.value.status_code == 429
+    assert error.value.response.headers["retry-after-ms"] == "2000"
+
+
+def test_requests_per_minute_is_enforced():
+    client = FakeClient(requests_per_minute=60)
+    _, headers = _ask(client, "Explain hashing.")
+    assert headers["x-ratelimit-limit-requests"] == "60"
+    with pytest.raises(FakeProviderError) as error:
+        _ask(client, "Explain hashing.")
+    assert error.value.status_code == 429
+    assert 0 < int(error.value.response.headers["retry-after-ms"]) <= 1000
+    assert (client.requests, client.rate_limited) == (2, 1)
+
+
+def test_configure_fake_provider_applies_to_new_models(monkeypatch):
+    monkeypatch.setattr(fake, "_fake_client", fake._fake_client)
+    before = LanguageModel("fake:configured", cache=False)
+    client = configure_fake_provider(respond=lambda prompt: "configured")
+    after = LanguageModel("fake:configured", cache=False)
+    assert after.client is client and before.client is not client
+    assert after.get_generation("Explain hashing.") == "configured"
@@ -0,0 +1,203 @@
+import inspect
+from types import SimpleNamespace
+
+import pytest
+
+from reval.language_models import (
+    LOGPROB_PROVIDERS,
+    ROLE_PARAMS,
+    LanguageModel,
+    get_model,
+    set_role_params,
+)
+from reval.language_models.cache import ResponseCache
+from reval.functions.binary_judge import parse_grade
+from reval.language_models.fake import FakeClient
+from reval.language_models.language_models import GENERATION_METRICS, _logprobs
+
+MODEL_NAMES = {
+    "openai": "gpt-4o-mini",
+    "together": "meta-llama/Llama-3-8b-chat-hf",
+    "fake": "fake:model",
+}
+
+
+def _sdk_create(provider):
+    # the provider SDK's chat completions create(), for its signature
+    if provider == "fake":
+        return FakeClient()._create
+    sdk = pytest.importorskip(provider)
+    client_class = {"openai": "OpenAI", "together": "Together"}[provider]
+    return getattr(sdk, client_class)(api_key="test").chat.completions.create
+
+
+class _RecordingClient:
+    # records the keyword arguments of one chat completions request
+    def __init__(self, completion):
+        self.params = None
+        self._completion = completion
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(
+                with_raw_response=SimpleNamespace(create=self._create)
+            )
+        )
+
+    def _create(self, **params):
+        self.params = params
+        return SimpleNamespace(headers={}, parse=lambda: self._completion)
+
+
+@pytest.mark.parametrize("provider", LOGPROB_PROVIDERS)
+def test_logprob_request_params_fit_the_provider_sdk(provider):
+    model = LanguageModel(MODEL_NAMES[provider], api_key="test", cache=False)
+    choice = SimpleNamespace(message=SimpleNamespace(content="<grade>1"))
+    completion = SimpleNamespace(choices=[choice], usage=None)
+    model.client = _RecordingClient(completion)
+
+    model.generate_with_logprobs("Grade this.", top_logprobs=5)
+
+    params = model.client.params
+    # raises TypeError on a keyword the SDK doesn't take
+    inspect.signature(_sdk_create(provider)).bind(**params)
+    if provider == "together":
+        assert params["logprobs"] == 5 and "top_logprobs" not in params
+    else:
+        assert params["logprobs"] is True and params["top_logprobs"] == 5
+
+
+def test_together_logprobs_are_read_from_parallel_lists():
+    logprobs = SimpleNamespace(
+        tokens=["<grade>", "1"],
+        token_logprobs=[0.0, -0.1],
+        top_logprobs=[{"<grade>": 0.0}, {"1": -0.1, "0": -2.4}],
+    )
+    entries = _logprobs(SimpleNamespace(logprobs=logprobs))
+    assert entries == [
+        ("<grade>", 0.0, {"<grade>": 0.0}),
+        ("1", -0.1, {"1": -0.1, "0": -2.4}),
+    ]
+
+
+def test_fake_provider_grades_with_logprobs():
+    model = LanguageModel("fake:judge", cache=False)
+    text, logprobs = model.generate_with_logprobs("Grade it. <grade>")
+    assert "<grade>" in text
+    assert any(token in ("0", "1") for token, _, _ in logprobs)
+
+
+def test_get_generations_uses_one_request_with_n():
+    model = LanguageModel("fake:sampler", cache=False)
+    before = model.client.requests
+    samples = model.get_generations("Explain sampling.", 4)
+    assert len(samples) == 4 and len(set(samples)) == 4
+    assert model.client.requests - before == 1
+
+
+def test_get_generations_tops_up_when_n_is_ignored():
+    from fake_openai_server import FakeOpenAIServer
+
+    answers = iter(range(100))
+    with FakeOpenAIServer(respond=lambda prompt: f"answer {next(answers)}") as server:
+        model = LanguageModel(
+            "gpt-4o-mini", api_key="test", base_url=server.base_url, cache=False
+        )
+        samples = model.get_generations("Explain sampling.", 3)
+    # the server answers one choice whatever `n` is
+    assert server.requests == 3
+    assert sorted(samples) == ["answer 0", "answer 1", "answer 2"]
+
+
+def test_streaming_measures_time_to_first_token():
+    streamed = LanguageModel("fake:streamed", stream=True, cache=False)
+    text, metrics = streamed.generate_with_metrics("Explain streaming.")
+    assert set(metrics) == set(GENERATION_METRICS)
+    assert metrics["ttft_ms"] is not None and metrics["ttft_ms"] >= 0
+    assert metrics["output_tokens"] > 0
+
+    plain = LanguageModel("fake:plain", cache=False)
+    plain_text, plain_metrics = plain.generate_with_metrics("Explain streaming.")
+    assert plain_text == text
+    assert plain_metrics["ttft_ms"] is None
+
+
+def test_stop_when_cuts_a_stream_short_and_skips_the_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    model = LanguageModel("fake:streamed", stream=True, cache=cache)
+    prompt = "Explain early stopping."
+    full = LanguageModel("fake:plain", cache=False).get_generation(prompt)
+
+    text = model.get_generation(prompt, stop_when=lambda text: len(text.split()) >= 2)
+    assert len(text.split()) == 2 and full.startswith(text)
+    assert model.cached_generation(prompt) is None
+
+    assert model.get_generation(prompt) == full
+    assert model.cached_generation(prompt) == full
+
+
+def test_claude_prompt_parts_get_cache_breakpoints():
+    model = LanguageModel(
+        "claude-3-haiku-20240307",
+        api_key="test",
+        cache=False,
+        system_prompt="Be brief.",
+    )
+    params = model.request_params(["instructions ", "criteria ", "output"])
+    assert params["system"] == "Be brief."
+    blocks = params["messages"][0]["content"]
+    assert [block["text"] for block in blocks] == [
+        "instructions ",
+        "criteria ",
+        "output",
+    ]
+    assert [block.get("cache_control") for block in blocks] == [
+        {"type": "ephemeral"},
+        {"type": "ephemeral"},
+        None,
+    ]
+
+
+def test_claude_gets_at_most_four_cache_breakpoints():
+    model = LanguageModel("claude-3-haiku-20240307", api_key="test", cache=False)
+    blocks = model.request_params([f"part {i} " for i in range(7)])["messages"][0][
+        "content"
+    ]
+    assert sum("cache_control" in block for block in blocks) == 4
+    assert "cache_control" not in blocks[-1]
+
+
+def test_openai_prompt_parts_are_joined():
+    model = LanguageModel(
+        "gpt-4o-mini", api_key="test", cache=False, system_prompt="Be brief."
+    )
+    params = model.request_params(["instructions ", "output"])
+    assert params["messages"] == [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "instructions output"},
+    ]
+    assert model.request_params("instructions output") == params
+
+
+def test_role_params_are_defaults_for_get_model(monkeypatch):
+    judge = get_model("fake:roles", role="judge")
+    assert (judge.temperature, judge.max_tokens, judge.stop) == (0, 1024, ("</grade>",))
+    assert get_model("fake:roles", role="judge") is judge
+    # explicit keyword arguments win over the role's
+    warm = get_model("fake:roles", role="judge", temperature=0.7)
+    assert warm is not judge and warm.temperature == 0.7 and warm.max_tokens == 1024
+    candidate = get_model("fake:roles", role="candidate")
+    assert (candidate.temperature, candidate.stop) == (1, None)
+    with pytest.raises(ValueError, match="Unknown role"):
+        get_model("fake:roles", role="grader")
+
+    monkeypatch.setitem(ROLE_PARAMS, "judge", ROLE_PARAMS["judge"])
+    set_role_params("judge", max_tokens=256)
+    short = get_model("fake:roles", role="judge")
+    assert short is not judge
+    assert (short.max_tokens, short.temperature, short.stop) == (256, 0, ("</grade>",))
+
+
+def test_judge_role_stops_after_the_grade():
+    text = get_model("fake:roles", role="judge").get_generation("Grade it. <grade>")
+    # like providers, the fake ends the text before the stop sequence
+    assert text.endswith(("<grade>0", "<grade>1"))
+    assert parse_grade(text) in (0, 1)
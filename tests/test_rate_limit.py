@@ -0,0 +1,89 @@
+import pytest
+
+from reval.language_models import (
+    LanguageModel,
+    RateLimiter,
+    rate_limit,
+    set_inflight_limits,
+)
+from reval.language_models import language_models
+from reval.language_models.fake import FakeClient, FakeProviderError
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(rate_limit.time, "sleep", slept.append)
+    return slept
+
+
+def _throttled_once(result="ok", headers=None):
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) == 1:
+            raise FakeProviderError(429, headers)
+        return result, {}
+
+    return request
+
+
+def test_429_backs_off_for_retry_after_and_slows_the_model(sleeps):
+    limiter = RateLimiter(limits={("fake", "model"): {"requests_per_minute": 600}})
+    request = _throttled_once(headers={"retry-after-ms": "1500"})
+
+    assert limiter.call("fake", "model", 10, request) == "ok"
+
+    assert limiter.throttled == 1 and limiter.retries == 1
+    assert max(sleeps) >= 1.5
+    assert limiter._get(("fake", "model")).requests.rate < 600
+
+
+def test_429_without_headers_uses_jittered_backoff(sleeps):
+    limiter = RateLimiter(base_delay=2.0, max_delay=60.0)
+    assert limiter.call("fake", "model", 10, _throttled_once()) == "ok"
+    # the backoff, then any wait for the slowed bucket
+    assert 0 <= sleeps[0] <= 2.0
+
+
+def test_non_transient_errors_are_not_retried(sleeps):
+    limiter = RateLimiter()
+
+    def request():
+        raise FakeProviderError(400)
+
+    with pytest.raises(FakeProviderError):
+        limiter.call("fake", "model", 10, request)
+    assert limiter.retries == 0 and sleeps == []
+
+
+class _ThrottledOnceClient(FakeClient):
+    def _create(self, **params):
+        if self.requests == 0:
+            self.requests += 1
+            raise FakeProviderError(429)
+        return super()._create(**params)
+
+
+def test_retry_backoff_does_not_hold_the_inflight_slot(monkeypatch):
+    previous_limits = set_inflight_limits({"fake": 1})
+    monkeypatch.setattr(language_models, "_rate_limiter", RateLimiter())
+    slot_free = []
+
+    def sleep(seconds):
+        semaphore = rate_limit._inflight_limits["fake"]
+        slot_free.append(semaphore.acquire(blocking=False))
+        if slot_free[-1]:
+            semaphore.release()
+
+    monkeypatch.setattr(rate_limit.time, "sleep", sleep)
+    try:
+        model = LanguageModel("fake:model", cache=False)
+        model.client = _ThrottledOnceClient()
+        text, metrics = model.generate_with_metrics("Say something.")
+    finally:
+        set_inflight_limits(previous_limits)
+
+    assert text and metrics["retries"] == 1
+    assert slot_free and all(slot_free)
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from reval.ratings import bootstrap_intervals, bradley_terry, to_elo_scale
+from reval.scoring import RunningScores
+
+
+def _expected_wins(strengths, games=10_000):
+    strengths = np.asarray(strengths, dtype=float)
+    share = strengths[:, None] / (strengths[:, None] + strengths[None, :])
+    return games * share * (1 - np.eye(len(strengths)))
+
+
+def test_bradley_terry_recovers_the_strengths():
+    truth = np.array([4.0, 2.0, 1.0])
+    fitted = bradley_terry(_expected_wins(truth), prior=0)
+    assert np.allclose(fitted, truth / np.exp(np.log(truth).mean()), rtol=1e-6)
+    # a model twice as strong is 400 * log10(2) Elo points ahead
+    ratings = to_elo_scale(fitted)
+    assert np.isclose(ratings.mean(), 1000)
+    assert np.isclose(ratings[0] - ratings[1], 400 * np.log10(2))
+
+
+def test_batched_fits_match_single_fits():
+    wins = np.stack([_expected_wins([3, 1, 1], 20), _expected_wins([1, 1, 5], 20)])
+    batched = bradley_terry(wins)
+    for i in range(len(wins)):
+        assert np.allclose(batched[i], bradley_terry(wins[i]), rtol=1e-6)
+
+
+def test_prior_keeps_a_winless_model_finite():
+    wins = np.array([[0, 5], [0, 0]])
+    strengths = bradley_terry(wins)
+    assert np.all(np.isfinite(strengths)) and strengths[0] > strengths[1]
+
+
+def test_bootstrap_interval_brackets_the_fit():
+    wins = np.round(_expected_wins([3.0, 1.5, 1.0], 200))
+    point = to_elo_scale(bradley_terry(wins))
+    low, high = bootstrap_intervals(wins, rounds=500, seed=0)
+    assert np.all(low <= point) and np.all(point <= high)
+    again = bootstrap_intervals(wins, rounds=500, seed=0)
+    assert np.array_equal(low, again[0]) and np.array_equal(high, again[1])
+
+
+def test_arena_results_report_the_bradley_terry_interval():
+    models = [SimpleNamespace(name=name) for name in ("a", "b")]
+    scores = RunningScores(models, mode="arena", bootstrap_rounds=50)
+    scores.update(pd.DataFrame({"a.grade": [1, 1, -1], "b.grade": [-1, -1, 1]}))
+    a, b = scores.results()
+    assert {"elo_ci_low", "elo_ci_high", "bt_elo_ci_low", "bt_elo_ci_high"} <= set(a)
+    assert (a["elo_ci_low"], a["elo_ci_high"]) == (
+        a["bt_elo_ci_low"],
+        a["bt_elo_ci_high"],
+    )
+    assert a["bt_elo"] > b["bt_elo"]
+    assert a["bt_elo_ci_low"] <= a["bt_elo"] <= a["bt_elo_ci_high"]
@@ -0,0 +1,69 @@
+import threading
+
+from reval.sampling import release_row, sample_models
+
+
+class _CountingModel:
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_generations(self, task, n):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        return [f"{task} call {call} sample {j}" for j in range(n)]
+
+
+def test_sample_models_share_one_call_per_row():
+    model = _CountingModel()
+    samples = sample_models([model], 3)
+    assert [sample.name for sample in samples] == [
+        "counting#1",
+        "counting#2",
+        "counting#3",
+    ]
+    outputs = [sample.sample(0, "task") for sample in samples]
+    assert model.calls == 1
+    assert outputs == [f"task call 1 sample {j}" for j in range(3)]
+    # every sample taken, so nothing is held
+    assert samples[0].generations._pending == {}
+
+
+def test_duplicate_task_rows_get_their_own_samples():
+    model = _CountingModel()
+    first, second = sample_models([model], 2)
+    # interleaved, as concurrent rows with the same task text would be
+    row_0 = first.sample(0, "same task")
+    row_1 = first.sample(1, "same task")
+    assert second.sample(1, "same task").endswith("call 2 sample 1")
+    assert second.sample(0, "same task").endswith("call 1 sample 1")
+    assert (row_0, row_1) == ("same task call 1 sample 0", "same task call 2 sample 0")
+
+
+def test_released_rows_are_dropped():
+    # on resume some samples come from the checkpoint and are never taken
+    model = _CountingModel()
+    samples = sample_models([model], 3)
+    samples[1].sample(7, "task")
+    assert samples[0].generations._pending
+    release_row(samples, 7, "task")
+    assert samples[0].generations._pending == {}
+
+
+def test_concurrent_samples_make_one_call():
+    model = _CountingModel()
+    samples = sample_models([model], 8)
+    outputs = {}
+    threads = [
+        threading.Thread(target=lambda s=s: outputs.update({s.j: s.sample(0, "t")}))
+        for s in samples
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert model.calls == 1
+    assert len(set(outputs.values())) == 8
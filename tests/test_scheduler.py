@@ -0,0 +1,101 @@
+import random
+from types import SimpleNamespace
+
+import pandas as pd
+
+from reval.reval import Reval
+from reval.scheduler import PairScheduler
+
+
+def _models(*names):
+    return [SimpleNamespace(name=name) for name in names]
+
+
+def _play(scheduler, winner, loser, times):
+    for _ in range(times):
+        scheduler.record(winner, loser, True)
+
+
+def test_warm_up_picks_the_least_played_model():
+    a, b, c = models = _models("a", "b", "c")
+    scheduler = PairScheduler(models, min_matches=5)
+    _play(scheduler, a, b, 5)
+    for _ in range(10):
+        assert c in scheduler.next_pair()
+
+
+def test_under_sampled_pairs_are_preferred():
+    # a beats b and b beats c at the same rate, but a and b have met far less
+    a, b, c = models = _models("a", "b", "c")
+    scheduler = PairScheduler(models, min_matches=0)
+    _play(scheduler, a, b, 6)
+    _play(scheduler, b, a, 4)
+    _play(scheduler, b, c, 600)
+    _play(scheduler, c, b, 400)
+    assert {model.name for model in scheduler.next_pair()} == {"a", "b"}
+
+
+def test_stable_once_the_order_is_clear():
+    a, b, c = models = _models("a", "b", "c")
+    scheduler = PairScheduler(models, min_matches=5)
+    for winner, loser in ((a, b), (b, c), (a, c)):
+        _play(scheduler, winner, loser, 40)
+        _play(scheduler, loser, winner, 10)
+    assert scheduler.stable()
+    assert scheduler.ranking() == ["a", "b", "c"]
+
+    tied = PairScheduler(models, min_matches=5)
+    for winner, loser in ((a, b), (b, a), (b, c), (c, b), (a, c), (c, a)):
+        _play(tied, winner, loser, 15)
+    assert not tied.stable()
+
+
+def test_max_matches_ends_scheduling():
+    a, b = models = _models("a", "b")
+    scheduler = PairScheduler(models, min_matches=5, max_matches=4)
+    _play(scheduler, a, b, 3)
+    assert not scheduler.stable()
+    scheduler.record(b, a, True)
+    assert scheduler.stable()
+
+
+class _Model:
+    def __init__(self, name):
+        self.name = name
+
+    def get_generation(self, task):
+        return f"{self.name}: {task}"
+
+
+def test_reval_stops_judging_once_the_ranking_is_stable(tmp_path):
+    judged = []
+
+    def judge(task, success_criteria, failure_criteria, output1, output2):
+        # "strong" always wins, then "middle"
+        judged.append(task)
+        rank = {"strong": 0, "middle": 1, "weak": 2}
+        first, second = output1.split(":")[0], output2.split(":")[0]
+        return 1 if rank[first] < rank[second] else 2
+
+    def criteria(task, success_criteria, failure_criteria, good, bad):
+        return "1. Answers.", "1. Doesn't answer."
+
+    tasks = pd.DataFrame({"tasks": [f"Task {i}" for i in range(500)]})
+    random.seed(0)
+    results = Reval(
+        tasks,
+        [_Model("strong"), _Model("middle"), _Model("weak")],
+        judge,
+        criteria,
+        mode="arena",
+        pair_scheduler=PairScheduler(
+            [_Model("strong"), _Model("middle"), _Model("weak")], min_matches=5
+        ),
+        processed_tasks_path=str(tmp_path / "processed.csv"),
+        results_path=str(tmp_path / "results.json"),
+        criteria_store=False,
+    )
+    # every model's warm-up, then only until the order is settled
+    assert 8 <= len(judged) < 100
+    assert [result["model"] for result in results] == ["strong", "middle", "weak"]
+    assert results[0]["bt_elo"] > results[1]["bt_elo"] > results[2]["bt_elo"]
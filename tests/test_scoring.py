@@ -0,0 +1,38 @@
+from itertools import combinations
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reval.scoring import SampleScores, _pass_at
+
+
+@pytest.mark.parametrize("n, k", [(1, 1), (4, 1), (4, 2), (5, 3), (5, 5)])
+def test_pass_at_is_the_chance_a_k_subset_has_a_pass(n, k):
+    # every way to draw k of n samples, for each number c of passing samples
+    expected = [
+        np.mean([any(i < c for i in subset) for subset in combinations(range(n), k)])
+        for c in range(n + 1)
+    ]
+    assert np.allclose(_pass_at(n, k), expected)
+
+
+def test_sample_scores_pass_at_k():
+    models = [SimpleNamespace(name="m")]
+    scores = SampleScores(models, 3)
+    scores.update(
+        pd.DataFrame(
+            {
+                "m#1.grade": [1, 0, 0, 1],
+                "m#2.grade": [1, 0, 1, None],
+                "m#3.grade": [0, 0, 0, 1],
+            }
+        )
+    )
+    (result,) = scores.results()
+    # the last row is missing a grade, so only three tasks count
+    assert result["tasks"] == 3
+    assert result["pass@1"] == pytest.approx((2 / 3 + 0 + 1 / 3) / 3)
+    assert result["pass@3"] == pytest.approx(2 / 3)
+    assert result["score"] == pytest.approx(1)
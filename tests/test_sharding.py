@@ -0,0 +1,97 @@
+import json
+
+import pandas as pd
+import pytest
+
+from reval.language_models import LanguageModel
+from reval.reval import Reval
+from reval.sharding import merge_shards, run_sharded, shard_path, shard_tasks
+
+
+# module level, so spawned shard workers can unpickle them
+def judge(task, success_criteria, failure_criteria, model_output):
+    return len(model_output) % 2
+
+
+def criteria(task, success_criteria, failure_criteria, good_output, bad_output):
+    return "1. Answers the task.", "1. Ignores the task."
+
+
+def test_run_sharded_with_samples_merges_pass_at_k(tmp_path):
+    tasks = pd.DataFrame({"tasks": [f"Explain topic {i}." for i in range(12)]})
+    models = [LanguageModel("fake:a", cache=False)]
+    results = run_sharded(
+        2,
+        tasks,
+        models,
+        judge,
+        criteria,
+        processed_tasks_path=str(tmp_path / "processed.csv"),
+        results_path=str(tmp_path / "results.json"),
+        criteria_store=False,
+        samples_per_task=3,
+    )
+
+    (result,) = results
+    assert result["tasks"] == 12
+    assert {"pass@1", "pass@2", "pass@3", "score_std"} <= set(result)
+    processed = pd.read_csv(tmp_path / "processed.csv")
+    assert processed["tasks"].tolist() == tasks["tasks"].tolist()
+    grades = processed[[f"fake:a#{j}.grade" for j in (1, 2, 3)]]
+    assert result["score"] == grades.sum().mean()
+    assert json.load(open(tmp_path / "results.json")) == results
+
+
+def test_shards_partition_the_tasks():
+    tasks = pd.DataFrame({"tasks": [f"Explain topic {i}." for i in range(40)]})
+    shards = [shard_tasks(tasks, i, 3) for i in range(3)]
+    assert sorted(sum((shard["task_index"].tolist() for shard in shards), [])) == list(
+        range(40)
+    )
+    for shard in shards:
+        assert (tasks.loc[shard["task_index"], "tasks"] == shard["tasks"]).all()
+    with pytest.raises(ValueError):
+        shard_tasks(tasks, 3, 3)
+
+
+def test_merged_shards_match_a_single_process_run(tmp_path):
+    tasks = pd.DataFrame({"tasks": [f"Explain topic {i}." for i in range(15)]})
+    models = [
+        LanguageModel("fake:a", cache=False),
+        LanguageModel("fake:b", cache=False),
+    ]
+    whole = Reval(
+        tasks,
+        models,
+        judge,
+        criteria,
+        processed_tasks_path=str(tmp_path / "whole.csv"),
+        results_path=str(tmp_path / "whole.json"),
+        criteria_store=False,
+    )
+
+    paths = []
+    for i in range(3):
+        paths.append(shard_path(str(tmp_path / "processed.csv"), i, 3))
+        Reval(
+            tasks,
+            models,
+            judge,
+            criteria,
+            processed_tasks_path=paths[-1],
+            results_path=shard_path(str(tmp_path / "results.json"), i, 3),
+            shard_index=i,
+            num_shards=3,
+            criteria_store=False,
+        )
+    merged = merge_shards(
+        paths,
+        models,
+        processed_tasks_path=str(tmp_path / "processed.csv"),
+        results_path=str(tmp_path / "results.json"),
+    )
+
+    assert merged == whole
+    assert (tmp_path / "processed.csv").read_bytes() == (
+        tmp_path / "whole.csv"
+    ).read_bytes()
@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+from reval.functions.binary_judge import judge_prompt_parts, parse_grade
+from reval.language_models import LanguageModel, get_model
+from reval.reval import Reval
+from reval.stopping import EarlyStopping
+
+
+def fake_judge(task, success_criteria, failure_criteria, model_output):
+    query = judge_prompt_parts(task, success_criteria, failure_criteria, model_output)
+    return parse_grade(get_model("fake:judge", role="judge").get_generation(query))
+
+
+def answer_judge(task, success_criteria, failure_criteria, model_output):
+    return int(model_output.startswith("correct"))
+
+
+def criteria(task, success_criteria, failure_criteria, good, bad):
+    return "1. Answers.", "1. Doesn't answer."
+
+
+class _Model:
+    def __init__(self, name, answer):
+        self.name = name
+        self.answer = answer
+
+    def get_generation(self, task):
+        return f"{self.answer}: {task}"
+
+
+def _run(tmp_path, models, judge, stopping, num_tasks):
+    tasks = pd.DataFrame({"tasks": [f"Task {i}" for i in range(num_tasks)]})
+    results = Reval(
+        tasks,
+        models,
+        judge,
+        criteria,
+        early_stopping=stopping,
+        processed_tasks_path=str(tmp_path / "processed.csv"),
+        results_path=str(tmp_path / "results.json"),
+        criteria_store=False,
+    )
+    return {result["model"]: result for result in results}
+
+
+def test_a_clear_winner_stops_early(tmp_path):
+    strong, weak = _Model("strong", "correct"), _Model("weak", "wrong")
+    stopping = EarlyStopping([strong, weak], reference=weak, min_tasks=30)
+    results = _run(tmp_path, [strong, weak], answer_judge, stopping, 200)
+
+    assert results["strong"]["stopped"] == "reference"
+    assert results["strong"]["tasks_used"] == 30
+    assert results["strong"]["diff_vs_reference"] == 1.0
+    # the reference then runs until its own interval is narrow enough
+    assert results["weak"]["stopped"] == "ci_width"
+    assert 30 < results["weak"]["tasks_used"] < 200
+
+
+def test_a_tie_runs_to_the_end(tmp_path):
+    # the fake provider answers both models alike, so every paired difference is 0
+    models = [
+        LanguageModel("fake:a", cache=False),
+        LanguageModel("fake:b", cache=False),
+    ]
+    stopping = EarlyStopping(models, ci_width=0.01, reference="fake:a", min_tasks=10)
+    results = _run(tmp_path, models, fake_judge, stopping, 60)
+
+    for name in ("fake:a", "fake:b"):
+        assert results[name]["stopped"] is None
+        assert results[name]["tasks_used"] == 60
+    assert results["fake:b"]["diff_vs_reference"] == 0.0
+    assert results["fake:a"]["pass_rate"] == results["fake:b"]["pass_rate"]
+
+
+def test_summary_contents():
+    model, reference = _Model("model", ""), _Model("reference", "")
+    stopping = EarlyStopping([model, reference], reference=reference, min_tasks=2)
+    for key, (grade, reference_grade) in enumerate([(1, 0), (1, 1), (0, 0), (1, 0)]):
+        stopping.record(model, key, grade)
+        stopping.record(reference, key, reference_grade)
+    stopping.record(model, 4, None)
+
+    summary = stopping.summary("model")
+    assert set(summary) == {
+        "pass_rate",
+        "ci_low",
+        "ci_high",
+        "tasks_used",
+        "stopped",
+        "diff_vs_reference",
+        "diff_ci_low",
+        "diff_ci_high",
+    }
+    assert summary["tasks_used"] == 4 and summary["pass_rate"] == 0.75
+    assert summary["ci_low"] < 0.75 < summary["ci_high"]
+    assert summary["diff_vs_reference"] == 0.5
+    assert summary["diff_ci_low"] < 0.5 < summary["diff_ci_high"]
+    assert "diff_vs_reference" not in stopping.summary("reference")
+
+
+def test_unknown_reference():
+    with pytest.raises(ValueError):
+        EarlyStopping([_Model("model", "")], reference="other")
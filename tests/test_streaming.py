@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from test_sharding import criteria, judge
+
+from reval.language_models import LanguageModel
+from reval.reval import Reval
+from reval.streaming import (
+    ResultWriter,
+    export_results,
+    grade_columns,
+    iter_task_chunks,
+    read_results,
+    result_columns,
+    score_results,
+)
+
+
+def test_parquet_sparse_columns_typed_from_later_chunks(tmp_path):
+    # good_output and reference are empty in the first chunk, as pandas reads
+    # a sparse CSV column (all NaN, so float64)
+    source = tmp_path / "tasks.csv"
+    pd.DataFrame(
+        {
+            "tasks": [f"task {i}" for i in range(6)],
+            "good_output": [None, None, "good answer", None, "another", None],
+            "reference": [None, None, None, "42", None, 7],
+            "model.grade": [None, None, 1, 0, None, 1],
+        }
+    ).to_csv(source, index=False)
+
+    path = tmp_path / "processed.parquet"
+    with ResultWriter(str(path)) as writer:
+        for chunk in iter_task_chunks(str(source), 2):
+            writer.write(chunk)
+
+    results = read_results(str(path))
+    assert results["good_output"].tolist() == [
+        None,
+        None,
+        "good answer",
+        None,
+        "another",
+        None,
+    ]
+    assert results["reference"].tolist() == [None, None, None, "42", None, "7"]
+    assert results["model.grade"].tolist() == [pd.NA, pd.NA, 1, 0, pd.NA, 1]
+
+
+def test_parquet_writer_keeps_typed_columns(tmp_path):
+    path = tmp_path / "processed.parquet"
+    frames = [
+        pd.DataFrame({"tasks": ["a", "b"], "model.latency_ms": [np.nan, np.nan]}),
+        pd.DataFrame({"tasks": ["c"], "model.latency_ms": [12.5]}),
+    ]
+    with ResultWriter(str(path)) as writer:
+        for frame in frames:
+            writer.write(frame)
+    results = read_results(str(path))
+    assert results["tasks"].tolist() == ["a", "b", "c"]
+    assert results["model.latency_ms"].iloc[2] == 12.5
+
+
+def test_grade_reads_and_rescoring_match_the_run(tmp_path):
+    import pyarrow.parquet as pq
+
+    tasks = pd.DataFrame({"tasks": [f"Explain topic {i}." for i in range(9)]})
+    models = [
+        LanguageModel("fake:a", cache=False),
+        LanguageModel("fake:b", cache=False),
+    ]
+    path = str(tmp_path / "processed.parquet")
+    results = Reval(
+        tasks,
+        models,
+        judge,
+        criteria,
+        processed_tasks_path=path,
+        results_path=str(tmp_path / "results.json"),
+        criteria_store=False,
+    )
+
+    assert grade_columns(path) == ["fake:a.grade", "fake:b.grade"]
+    columns = result_columns(path)
+    # each model's columns are stored together
+    assert columns[-4:] == [
+        "fake:a.output",
+        "fake:a.grade",
+        "fake:b.output",
+        "fake:b.grade",
+    ]
+    assert pq.ParquetFile(path).metadata.row_group(0).column(0).compression == "ZSTD"
+
+    grades = read_results(path, grade_columns(path))
+    assert list(grades.columns) == ["fake:a.grade", "fake:b.grade"]
+    assert (grades.dtypes == "Int8").all()
+    assert score_results(path, models, chunksize=4) == results
+
+    csv_path = str(tmp_path / "processed.csv")
+    export_results(path, csv_path, chunksize=4)
+    assert read_results(csv_path)["tasks"].tolist() == tasks["tasks"].tolist()
+    assert score_results(csv_path, models, chunksize=4) == results
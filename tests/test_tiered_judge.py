@@ -0,0 +1,60 @@
+import random
+
+from reval.functions.binary_judge import judge_prompt_parts
+from reval.functions.tiered_judge import TieredJudge
+from reval.language_models import get_model
+
+TASK = "Name the largest planet."
+OUTPUTS = [f"Jupiter, answer {i}." for i in range(40)]
+
+
+def _confidences(model_name):
+    # the fake provider's probability of the grade it gives each output
+    model = get_model(model_name, role="judge")
+    return [
+        model.client.confidence(
+            model.request_params(judge_prompt_parts(TASK, "S.", "F.", output))[
+                "messages"
+            ][-1]["content"]
+        )
+        for output in OUTPUTS
+    ]
+
+
+def test_low_confidence_grades_escalate():
+    judge = TieredJudge("fake:cheap", "fake:strong", threshold=0.75)
+    escalated = []
+    for output in OUTPUTS:
+        before = judge.stats["strong_calls"]
+        judge(TASK, "S.", "F.", output)
+        escalated.append(judge.stats["strong_calls"] > before)
+
+    expected = [confidence < 0.75 for confidence in _confidences("fake:cheap")]
+    assert escalated == expected and 0 < sum(expected) < len(OUTPUTS)
+    report = judge.report()
+    assert report["escalated"] == sum(expected)
+    assert report["accepted"] == len(OUTPUTS) - sum(expected)
+    assert report["cheap_calls"] == len(OUTPUTS)
+    assert report["strong_calls"] == sum(expected)
+    # the fake provider grades a prompt the same whichever model is asked
+    assert report["escalated_agreement"] == 1.0
+
+
+def test_audits_sample_accepted_grades():
+    judge = TieredJudge("fake:cheap", "fake:strong", threshold=0.75, audit_rate=0.5)
+    for output in OUTPUTS:
+        judge(TASK, "S.", "F.", output)
+
+    # an audit draw is made for every confident grade, in order
+    rng = random.Random(0)
+    confident = [c >= 0.75 for c in _confidences("fake:cheap")]
+    audited = sum(rng.random() < 0.5 for is_confident in confident if is_confident)
+    report = judge.report()
+    assert 0 < report["audited"] == audited < sum(confident)
+    assert report["accepted"] == sum(confident) - audited
+    assert report["escalated"] == len(OUTPUTS) - sum(confident)
+    assert report["strong_calls"] == report["audited"] + report["escalated"]
+    assert report["audit_agreement"] == 1.0
+
+    judge.reset_stats()
+    assert judge.report()["outputs"] == 0
@@ -0,0 +1,77 @@
+import json
+
+import pandas as pd
+import pytest
+from test_engine import criteria, judge
+
+from reval import tracing
+from reval.language_models import LanguageModel
+from reval.reval import Reval
+from reval.tracing import Tracer, estimate_cost
+
+
+def test_estimate_cost_discounts_cached_input():
+    # gpt-4o-mini: $0.15 in, $0.60 out per 1M tokens, cache hits at half price
+    assert estimate_cost("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert estimate_cost(
+        "gpt-4o-mini", 1_000_000, 0, cached_tokens=400_000
+    ) == pytest.approx(0.12)
+    # Anthropic cache reads cost a tenth
+    assert estimate_cost(
+        "claude-3-haiku-20240307", 1_000_000, 0, cached_tokens=1_000_000
+    ) == pytest.approx(0.025)
+    assert estimate_cost("unpriced-model", 10, 10) is None
+    assert estimate_cost("gpt-4o-mini", None, 10) is None
+
+
+def test_spans_record_their_parent_and_errors():
+    tracer = Tracer()
+    with tracer.span("outer") as outer:
+        with tracer.span("inner", model="m") as inner:
+            inner.set(cost_usd=0.5)
+    with pytest.raises(KeyError):
+        with tracer.span("failing"):
+            raise KeyError
+
+    inner_record, outer_record, failing = tracer.spans
+    assert inner_record["parent"] == outer_record["id"]
+    assert outer_record["parent"] is None
+    assert inner_record["model"] == "m" and inner_record["cost_usd"] == 0.5
+    assert failing["error"] == "KeyError"
+    assert tracer.summary().set_index("stage").loc["inner", "count"] == 1
+
+
+def test_spans_are_free_while_tracing_is_off():
+    tracing.disable_tracing()
+    with tracing.span("judge") as s:
+        s.set(model="m")
+    assert s is tracing._NO_SPAN
+
+
+def test_reval_writes_the_trace_and_its_summary(tmp_path):
+    trace_path = tmp_path / "trace.jsonl"
+    Reval(
+        pd.DataFrame({"tasks": ["Name a prime.", "Name a colour."]}),
+        [LanguageModel("fake:model", cache=False)],
+        judge,
+        criteria,
+        processed_tasks_path=str(tmp_path / "processed.csv"),
+        results_path=str(tmp_path / "results.json"),
+        criteria_store=False,
+        trace_path=str(trace_path),
+    )
+    spans = [json.loads(line) for line in trace_path.read_text().splitlines()]
+    stages = {span["stage"] for span in spans}
+    assert {"generation", "bookkeeping", "llm"} <= stages
+    llm = [span for span in spans if span["stage"] == "llm"]
+    generations = {span["id"] for span in spans if span["stage"] == "generation"}
+    # each model call nests in its generation span
+    assert sum(span["parent"] in generations for span in llm) == 2
+    assert all(span["provider"] == "fake" for span in llm)
+    assert all(span["output_tokens"] > 0 for span in llm)
+
+    summary = pd.read_csv(tmp_path / "trace.summary.csv")
+    assert set(summary["stage"]) == stages
+    assert summary.loc[summary["stage"] == "llm", "count"].sum() == len(llm)
+    # the run turns tracing back off
+    assert tracing._tracer is None